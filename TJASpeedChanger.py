@@ -2,6 +2,13 @@ import argparse
 import os
 import locale
 import sys
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_lookup import default_audio_index
+from tja_io import write_tja_lines, detect_file_encoding
+from run_report import RunReport, stage
+from tja_variants import speed_wave_filename, variant_tja_path, provenance_line, is_provenance_line, resolve_source
 # 多語言支援
 LANGUAGES = {
     'en': {
@@ -12,6 +19,7 @@ Usage Examples:
   python tja_speed_changer.py song.tja 0.9
   python tja_speed_changer.py "Central Dogma Pt.1.tja" 0.8
   python tja_speed_changer.py song.tja 1.2
+  python tja_speed_changer.py --watch incoming --speeds 0.8,0.9,1.1
 Notes:
   - FFmpeg is required to process audio files
   - Speed range: 0.5 ~ 2.0
@@ -26,6 +34,7 @@ Notes:
         'error_file_encoding': '❌ Error: Unable to read TJA file. Please check file encoding.',
         'start_processing': '🎵 Start processing: {} (Speed: {}x)',
         'tja_processed': '✅ TJA file processed: {}',
+        'variant_source': '🔁 {} is a speed variant; rendering from the original {} ({}x × requested = {}x)',
         'warning_no_wave': '⚠️  Warning: WAVE tag not found in TJA file, only processing score file',
         'warning_audio_not_found': '⚠️  Warning: Audio file not found: {}',
         'manual_audio_note': 'Only TJA file processed, please handle audio file manually',
@@ -39,7 +48,46 @@ Notes:
         'error_occurred': '❌ Error occurred: {}',
         'ffmpeg_not_found': 'FFmpeg not found, please ensure FFmpeg is installed and added to system PATH',
         'ffmpeg_error': 'FFmpeg error: {}',
-        'audio_processing_error': 'Error occurred while processing audio: {}'
+        'audio_processing_error': 'Error occurred while processing audio: {}',
+        'watch_help': 'Watch a directory and process new or changed charts automatically',
+        'speeds_help': 'Comma-separated speed ladder, e.g. 0.8,0.9,1.1',
+        'workers_help': 'Maximum number of concurrent jobs',
+        'debounce_help': 'Seconds a file must stay unchanged before it is processed (watch mode)',
+        'error_missing_args': 'a TJA file and a speed (or --watch/--batch DIR or --zip PACK with --speeds) are required',
+        'error_debounce': '--debounce must be greater than 0',
+        'watch_started': '👀 Watching {} ({}) for speeds: {}',
+        'watch_queued': '📥 Queued: {} ({}x)',
+        'watch_stopped': '🛑 Watch mode stopped',
+        'watch_skipped': '⚠️  Skipped {} (changed while reading): {}',
+        'serve_help': 'Run a localhost daemon that accepts JSON jobs over HTTP',
+        'port_help': 'Daemon listen port',
+        'segments_help': 'Split one long audio file into N segments rendered in parallel',
+        'stretch_help': 'atempo keeps the pitch; resample is much faster but pitch follows speed',
+        'audio_profile_help': 'Audio encoding profile (default/draft/high)',
+        'batch_help': 'Process every chart under a directory for the given --speeds',
+        'budget_help': 'Time budget in seconds for batch mode; jobs that would overrun it are skipped',
+        'batch_plan': '📋 {} jobs planned, estimated time {} ({} in parallel)',
+        'batch_refused': '⏭️  Skipped (over time budget): {} ({}x, est. {:.1f}s)',
+        'batch_progress': '[{}/{}] {} ({}x) done - remaining {}',
+        'batch_complete': '\n🎉 Batch complete: {} succeeded, {} failed, {} skipped',
+        'resume_help': 'Resume an interrupted batch, skipping jobs whose outputs are complete and intact',
+        'journal_help': 'Batch journal path (default: .tja_batch_journal.jsonl in the batch folder)',
+        'batch_resumed': '⏩ Resuming: {} jobs already completed',
+        'index_help': 'Library index database used to plan batches (default: library.db in the user cache folder)',
+        'skip_current_help': 'Skip speeds whose variants the library index records as present and up to date',
+        'batch_current': '⏩ {} variants are already up to date in the library index',
+        'batch_dedup': '♻️  {} jobs reuse audio rendered for identical sources',
+        'batch_shared': '🔗 {} (same audio as {})',
+        'report_help': 'Write per-file and aggregate stage timings to this JSON file',
+        'report_written': '⏱ Timing report written to {}',
+        'profile_help': 'Profile the run with cProfile and write BASE.pstats and a BASE.txt summary',
+        'profile_memory_help': 'With --profile, also trace memory allocations (slower)',
+        'profile_written': '📊 Profile written to {} (summary: {})',
+        'batch_redo': '🔁 Redoing interrupted job: {} ({}x)',
+        'zip_help': 'Process every chart in a zip song pack without extracting it, for the given --speeds',
+        'zip_output_help': 'Output folder, or a .zip file (default: <pack>_variants next to the pack)',
+        'zip_plan': '📦 {} charts rewritten, {} audio files to render from {}',
+        'zip_complete': '\n🎉 Zip pack complete: {} charts and {} audio files written to {} ({} failed)'
     },
     'zh-tw': {
         'title': 'TJA速度修改器 - 修改TJA檔案與音源速度',
@@ -49,6 +97,7 @@ Notes:
   python tja_speed_changer.py song.tja 0.9
   python tja_speed_changer.py "Central Dogma Pt.1.tja" 0.8
   python tja_speed_changer.py song.tja 1.2
+  python tja_speed_changer.py --watch incoming --speeds 0.8,0.9,1.1
 注意事項:
   - 需要安裝FFmpeg來處理音源檔案
   - 速度倍率範圍: 0.5 ~ 2.0
@@ -63,6 +112,7 @@ Notes:
         'error_file_encoding': '❌ 錯誤: 無法讀取TJA檔案，請檢查檔案編碼',
         'start_processing': '🎵 開始處理: {} (速度: {}x)',
         'tja_processed': '✅ TJA檔案已處理: {}',
+        'variant_source': '🔁 {} 是變速輸出，改為從原始譜面 {} 產生（{}x × 指定速度 = {}x）',
         'warning_no_wave': '⚠️  警告: TJA檔案中找不到WAVE標籤，僅處理譜面檔案',
         'warning_audio_not_found': '⚠️  警告: 找不到音源檔案: {}',
         'manual_audio_note': '僅處理了TJA檔案，請手動處理音源檔案',
@@ -76,7 +126,46 @@ Notes:
         'error_occurred': '❌ 發生錯誤: {}',
         'ffmpeg_not_found': '找不到FFmpeg，請確保已安裝FFmpeg並加入系統PATH',
         'ffmpeg_error': 'FFmpeg錯誤: {}',
-        'audio_processing_error': '處理音源時發生錯誤: {}'
+        'audio_processing_error': '處理音源時發生錯誤: {}',
+        'watch_help': '監看資料夾並自動處理新增或變更的譜面',
+        'speeds_help': '以逗號分隔的速度列表，例如 0.8,0.9,1.1',
+        'workers_help': '同時處理的最大工作數',
+        'debounce_help': '檔案需保持不變多少秒後才處理（監看模式）',
+        'error_missing_args': '需要指定TJA檔案與速度（或使用 --watch/--batch DIR 或 --zip 歌曲包 搭配 --speeds）',
+        'error_debounce': '--debounce 必須大於0',
+        'watch_started': '👀 監看中: {} ({})，速度: {}',
+        'watch_queued': '📥 已排入: {} ({}x)',
+        'watch_stopped': '🛑 已停止監看',
+        'watch_skipped': '⚠️  略過 {}（讀取時已變動）: {}',
+        'serve_help': '啟動本機常駐服務，以HTTP接收JSON工作',
+        'port_help': '常駐服務的連接埠',
+        'segments_help': '將單一長音源切成N段平行處理',
+        'stretch_help': 'atempo 保持音調；resample 速度快得多但音調隨速度改變',
+        'audio_profile_help': '音源編碼設定檔 (default/draft/high)',
+        'batch_help': '以 --speeds 批次處理資料夾下的所有譜面',
+        'budget_help': '批次模式的時間預算（秒），超出預算的工作會被略過',
+        'batch_plan': '📋 已規劃 {} 個工作，預估時間 {}（同時 {} 個）',
+        'batch_refused': '⏭️  略過（超出時間預算）: {} ({}x, 預估 {:.1f}秒)',
+        'batch_progress': '[{}/{}] {} ({}x) 完成 - 剩餘 {}',
+        'batch_complete': '\n🎉 批次完成: 成功 {}，失敗 {}，略過 {}',
+        'resume_help': '續傳中斷的批次，略過輸出完整的已完成工作',
+        'journal_help': '批次日誌路徑（預設為批次資料夾中的 .tja_batch_journal.jsonl）',
+        'batch_resumed': '⏩ 續傳: 已有 {} 個工作完成',
+        'index_help': '批次規劃使用的歌曲庫索引資料庫（預設為使用者快取資料夾中的 library.db）',
+        'skip_current_help': '略過歌曲庫索引中已存在且為最新的變速輸出',
+        'batch_current': '⏩ 歌曲庫索引中已有 {} 個變速輸出為最新',
+        'batch_dedup': '♻️  {} 個工作沿用相同音源的輸出',
+        'batch_shared': '🔗 {}（與 {} 音源相同）',
+        'report_help': '將每個檔案與總計的各階段耗時寫入此JSON檔案',
+        'report_written': '⏱ 耗時報告已寫入 {}',
+        'profile_help': '以 cProfile 分析此次執行，寫出 BASE.pstats 與 BASE.txt 摘要',
+        'profile_memory_help': '搭配 --profile 同時追蹤記憶體配置（較慢）',
+        'profile_written': '📊 效能分析已寫入 {}（摘要: {}）',
+        'batch_redo': '🔁 重新處理中斷的工作: {} ({}x)',
+        'zip_help': '不解壓縮直接以 --speeds 處理zip歌曲包中的所有譜面',
+        'zip_output_help': '輸出資料夾或 .zip 檔案（預設為歌曲包旁的 <歌曲包>_variants）',
+        'zip_plan': '📦 已改寫 {} 個譜面，需處理 {} 個音源: {}',
+        'zip_complete': '\n🎉 歌曲包處理完成: {} 個譜面與 {} 個音源已寫入 {}（失敗 {}）'
     },
     'ja': {
         'title': 'TJA速度変更ツール - TJAファイルと音源の速度を変更',
@@ -86,6 +175,7 @@ Notes:
   python tja_speed_changer.py song.tja 0.9
   python tja_speed_changer.py "Central Dogma Pt.1.tja" 0.8
   python tja_speed_changer.py song.tja 1.2
+  python tja_speed_changer.py --watch incoming --speeds 0.8,0.9,1.1
 注意事項:
   - 音源ファイルの処理にはFFmpegが必要です
   - 速度倍率範囲: 0.5 ~ 2.0
@@ -100,6 +190,7 @@ Notes:
         'error_file_encoding': '❌ エラー: TJAファイルを読み取れません。ファイルのエンコーディングを確認してください。',
         'start_processing': '🎵 処理開始: {} (速度: {}x)',
         'tja_processed': '✅ TJAファイル処理完了: {}',
+        'variant_source': '🔁 {} は速度変更済みのため、元の譜面 {} から作成します（{}x × 指定速度 = {}x）',
         'warning_no_wave': '⚠️  警告: TJAファイルにWAVEタグが見つかりません、譜面ファイルのみ処理します',
         'warning_audio_not_found': '⚠️  警告: 音源ファイルが見つかりません: {}',
         'manual_audio_note': 'TJAファイルのみ処理されました、音源ファイルは手動で処理してください',
@@ -113,7 +204,46 @@ Notes:
         'error_occurred': '❌ エラーが発生しました: {}',
         'ffmpeg_not_found': 'FFmpegが見つかりません、FFmpegがインストールされ、システムPATHに追加されているか確認してください',
         'ffmpeg_error': 'FFmpegエラー: {}',
-        'audio_processing_error': '音源処理中にエラーが発生しました: {}'
+        'audio_processing_error': '音源処理中にエラーが発生しました: {}',
+        'watch_help': 'フォルダを監視し、新規または変更された譜面を自動処理',
+        'speeds_help': 'カンマ区切りの速度リスト (例: 0.8,0.9,1.1)',
+        'workers_help': '同時に処理する最大ジョブ数',
+        'debounce_help': 'ファイルが変化しなくなってから処理するまでの秒数（監視モード）',
+        'error_missing_args': 'TJAファイルと速度（または --watch/--batch DIR や --zip パックと --speeds）が必要です',
+        'error_debounce': '--debounce は0より大きい値を指定してください',
+        'watch_started': '👀 監視中: {} ({})、速度: {}',
+        'watch_queued': '📥 キューに追加: {} ({}x)',
+        'watch_stopped': '🛑 監視を停止しました',
+        'watch_skipped': '⚠️  スキップ {}（読み込み中に変更されました）: {}',
+        'serve_help': 'HTTPでJSONジョブを受け付けるローカル常駐サービスを起動',
+        'port_help': '常駐サービスのポート番号',
+        'segments_help': '長い音源をN分割して並列処理する',
+        'stretch_help': 'atempo は音程を保持、resample は高速だが音程も速度に合わせて変わる',
+        'audio_profile_help': '音源エンコード設定 (default/draft/high)',
+        'batch_help': '--speeds でフォルダ内のすべての譜面を一括処理',
+        'budget_help': '一括処理の時間予算（秒）、超過するジョブはスキップ',
+        'batch_plan': '📋 {} 件のジョブを計画、推定時間 {}（同時 {} 件）',
+        'batch_refused': '⏭️  スキップ（時間予算超過）: {} ({}x, 推定 {:.1f}秒)',
+        'batch_progress': '[{}/{}] {} ({}x) 完了 - 残り {}',
+        'batch_complete': '\n🎉 一括処理完了: 成功 {}、失敗 {}、スキップ {}',
+        'resume_help': '中断した一括処理を再開し、出力が完全な完了済みジョブをスキップ',
+        'journal_help': '一括処理ログのパス（既定: フォルダ内の .tja_batch_journal.jsonl）',
+        'batch_resumed': '⏩ 再開: {} 件のジョブは完了済み',
+        'index_help': '一括処理の計画に使うライブラリ索引データベース（既定: ユーザーキャッシュフォルダの library.db）',
+        'skip_current_help': 'ライブラリ索引で最新と記録されている速度変更ファイルをスキップ',
+        'batch_current': '⏩ {} 件の速度変更ファイルはライブラリ索引で最新です',
+        'batch_dedup': '♻️  {} 件のジョブは同一音源の出力を再利用',
+        'batch_shared': '🔗 {}（{} と同じ音源）',
+        'report_help': 'ファイルごとと合計の各段階の処理時間をこのJSONファイルに書き出す',
+        'report_written': '⏱ 処理時間レポートを {} に書き出しました',
+        'profile_help': 'cProfile で実行をプロファイルし、BASE.pstats と BASE.txt の概要を書き出す',
+        'profile_memory_help': '--profile と併用してメモリ割り当ても追跡する（低速）',
+        'profile_written': '📊 プロファイルを {} に書き出しました（概要: {}）',
+        'batch_redo': '🔁 中断したジョブを再処理: {} ({}x)',
+        'zip_help': '展開せずに zip 曲パック内のすべての譜面を --speeds で処理',
+        'zip_output_help': '出力フォルダまたは .zip ファイル（既定: パックの隣の <パック>_variants）',
+        'zip_plan': '📦 譜面 {} 件を書き換え、音源 {} 件を処理します: {}',
+        'zip_complete': '\n🎉 曲パック処理完了: 譜面 {} 件と音源 {} 件を {} に書き出しました（失敗 {}）'
     }
 }
 def get_system_language():
@@ -132,37 +262,37 @@ def get_system_language():
 def get_text(key, lang='en'):
     """獲取指定語言的文本"""
     return LANGUAGES.get(lang, LANGUAGES['en']).get(key, LANGUAGES['en'][key])
-def detect_file_encoding(file_path):
-    """檢測檔案編碼"""
-    encodings = ['utf-8', 'utf-8-sig', 'cp950', 'gbk', 'shift_jis', 'iso-8859-1']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as f:
-                f.read()
-            return encoding
-        except UnicodeDecodeError:
-            continue
-    return 'utf-8'  # 預設返回utf-8
-def adjust_tja_speed(tja_path, speed, lang='en'):
-    """調整TJA檔案的速度參數，包含 #DELAY 處理"""
-    
-    # 自動檢測檔案編碼
-    detected_encoding = detect_file_encoding(tja_path)
-    
-    try:
-        with open(tja_path, 'r', encoding=detected_encoding, errors='ignore') as file:
-            lines = file.readlines()
-    except Exception as e:
-        print(get_text('error_file_encoding', lang))
-        raise e
-    new_lines = []
-    wave_filename = None
+def rescale_nextsong(line, speed):
+    """改寫段位道場的 #NEXTSONG 行，返回 (新行, 原音源檔名, 新音源檔名)
+
+    格式為 #NEXTSONG 標題,副標題,類型,音源,SCOREINIT,SCOREDIFF[,難易度,...]；
+    各曲的BPM與時間點由其後的 #BPMCHANGE 與 #DELAY 指定，已由一般規則處理
+    """
+    _, _, args = line.rstrip('\r\n').partition(' ')
+    fields = args.split(',')
+    if len(fields) < 4 or not fields[3].strip():
+        return line, None, None
+    wave_filename = fields[3].strip()
+    new_wave_filename = speed_wave_filename(wave_filename, speed)
+    fields[0] = f'{fields[0]} ({speed:.2f}x)'
+    fields[3] = new_wave_filename
+    return f'#NEXTSONG {",".join(fields)}\n', wave_filename, new_wave_filename
+def rewrite_tja_lines(lines, speed, source=None):
+    """改寫TJA內容，返回 (新內容, WAVE的(原檔名, 新檔名)或None, [#NEXTSONG的(原檔名, 新檔名)])
+
+    source 為原始譜面路徑時在第一行加上來源記錄（取代原有的記錄）
+    """
+    new_lines = [provenance_line(source, speed)] if source else []
+    wave = None
+    nextsongs = []
     original_title = None
     
     for line in lines:
+        # 舊的來源記錄（輸入為變速檔案且找不到原始譜面時）
+        if is_provenance_line(line):
+            continue
         # 修改標題加上速度標記
-        if line.startswith('TITLE:'):
+        elif line.startswith('TITLE:'):
             original_title = line.strip().split(':', 1)[1]
             new_lines.append(f'TITLE:{original_title} ({speed:.2f}x)\n')
         # 解析並修改BPM
@@ -183,10 +313,15 @@ def adjust_tja_speed(tja_path, speed, lang='en'):
         # 修改WAVE檔案名稱 - 始終轉換為OGG格式
         elif line.startswith('WAVE:'):
             wave_filename = line.strip().split(':', 1)[1]
-            file_root, file_ext = os.path.splitext(wave_filename)
-            # 始終轉換為OGG格式
-            new_wave_filename = f'{file_root}_{speed:.2f}x.ogg'
+            new_wave_filename = speed_wave_filename(wave_filename, speed)
+            wave = (wave_filename, new_wave_filename)
             new_lines.append(f'WAVE:{new_wave_filename}\n')
+        # 段位道場的下一首歌曲（各自的音源）
+        elif line.startswith('#NEXTSONG'):
+            new_line, wave_filename, new_wave_filename = rescale_nextsong(line, speed)
+            if wave_filename:
+                nextsongs.append((wave_filename, new_wave_filename))
+            new_lines.append(new_line)
         # 處理譜面中的BPMCHANGE指令
         elif line.startswith('#BPMCHANGE'):
             parts = line.strip().split(' ')
@@ -213,75 +348,128 @@ def adjust_tja_speed(tja_path, speed, lang='en'):
                 new_lines.append(line)
         else:
             new_lines.append(line)
+    return new_lines, wave, nextsongs
+def rewrite_tja_file(tja_path, speed, lang='en', timer=None):
+    """讀取並改寫TJA檔案，返回 (新TJA路徑, WAVE改名, #NEXTSONG改名列表)
+
+    timer 為 run_report.StageTimer 時記錄各階段耗時與讀寫的位元組數
+    """
+    
+    # 自動檢測檔案編碼
+    with stage(timer, 'detect'):
+        detected_encoding = detect_file_encoding(tja_path)
+    
+    try:
+        with stage(timer, 'read'):
+            with open(tja_path, 'r', encoding=detected_encoding, errors='ignore') as file:
+                lines = file.readlines()
+    except Exception as e:
+        print(get_text('error_file_encoding', lang))
+        raise e
+    with stage(timer, 'rewrite'):
+        new_lines, wave, nextsongs = rewrite_tja_lines(lines, speed, tja_path)
     # 儲存新的TJA檔案
-    base, ext = os.path.splitext(tja_path)
-    new_tja_path = f'{base}_{speed:.2f}x{ext}'
+    new_tja_path = variant_tja_path(tja_path, speed)
     
-    # 使用UTF-8編碼儲存，確保相容性
-    with open(new_tja_path, 'w', encoding='utf-8') as f:
-        f.writelines(new_lines)
+    # 使用UTF-8編碼儲存，確保相容性（原子寫入，不留下不完整的檔案）
+    with stage(timer, 'write'):
+        write_tja_lines(new_tja_path, new_lines, 'utf-8')
+    if timer:
+        timer.count('tja_bytes_read', os.path.getsize(tja_path))
+        timer.count('tja_lines', len(lines))
+        timer.count('tja_bytes_written', os.path.getsize(new_tja_path))
+    return new_tja_path, wave, nextsongs
+def adjust_tja_speed(tja_path, speed, lang='en'):
+    """調整TJA檔案的速度參數，包含 #DELAY 處理，返回 (WAVE檔名, 新WAVE檔名, 新TJA路徑)"""
+    new_tja_path, wave, _ = rewrite_tja_file(tja_path, speed, lang)
+    wave_filename, new_wave_filename = wave or (None, None)
     return wave_filename, new_wave_filename, new_tja_path
+def referenced_audio(tja_path, encoding=None):
+    """譜面引用的所有音源檔名（WAVE在前，其次為各 #NEXTSONG，不重複）"""
+    with open(tja_path, 'r', encoding=encoding or detect_file_encoding(tja_path), errors='ignore') as file:
+        _, wave, nextsongs = rewrite_tja_lines(file.readlines(), 1.0)
+    return list(dict.fromkeys(name for name, _ in ([wave] if wave else []) + nextsongs))
 def find_audio_file(base_dir, wave_filename):
-    """尋找各種副檔名的音源檔案 (mp3, wav, ogg, flac, m4a)"""
-    if not wave_filename:
-        return None
-        
-    # 首先嘗試精確的檔案名
-    exact_path = os.path.join(base_dir, wave_filename)
-    if os.path.exists(exact_path):
-        return exact_path
-    
-    # 嘗試不同的副檔名
-    file_root = os.path.splitext(wave_filename)[0]
-    audio_extensions = ['.ogg', '.mp3', '.wav', '.flac', '.m4a', '.aac']
-    
-    for ext in audio_extensions:
-        audio_path = os.path.join(base_dir, file_root + ext)
-        if os.path.exists(audio_path):
-            return audio_path
-    
-    return None
+    """尋找各種副檔名的音源檔案 (mp3, wav, ogg, flac, m4a)，使用目錄清單快取且不分大小寫"""
+    return default_audio_index.find(base_dir, wave_filename)
 
-def adjust_audio_speed_ffmpeg(input_path, output_path, speed, lang='en'):
-    """使用ffmpeg調整音源速度並轉換為OGG格式"""
+# 音源編碼設定檔（皆輸出OGG Vorbis）
+AUDIO_PROFILES = {
+    'default': ['-c:a', 'libvorbis', '-q:a', '5'],  # 品質等級5 (良好平衡)
+    'draft': ['-c:a', 'libvorbis', '-q:a', '2'],    # 快速試聽用
+    'high': ['-c:a', 'libvorbis', '-q:a', '8'],     # 高品質
+}
+def build_atempo_chain(speed):
+    """構建atempo濾鏡鏈（atempo單級範圍為0.5~2.0，超出範圍需串聯）"""
+    if 0.5 <= speed <= 2.0:
+        return f'atempo={speed}'
+    chain = []
+    while speed > 2.0:
+        chain.append('atempo=2.0')
+        speed /= 2.0
+    while speed < 0.5:
+        chain.append('atempo=0.5')
+        speed /= 0.5
+    chain.append(f'atempo={speed}')
+    return ','.join(chain)
+# 變速方式：atempo 保持音調；resample 以重新取樣變速，音調隨速度改變但CPU負擔低得多
+STRETCH_MODES = ('atempo', 'resample')
+# resample 模式不知道來源取樣率時先統一為此取樣率
+RESAMPLE_RATE = 48000
+def build_speed_filter(speed, stretch='atempo', sample_rate=None):
+    """構建變速濾鏡（resample 模式以 asetrate 改變播放速率，再以 aresample 轉回原取樣率）"""
+    if stretch == 'atempo':
+        return build_atempo_chain(speed)
+    if stretch != 'resample':
+        raise ValueError(f'unknown stretch mode: {stretch}')
+    if sample_rate:
+        return f'asetrate={round(sample_rate * speed)},aresample={sample_rate}'
+    return f'aresample={RESAMPLE_RATE},asetrate={round(RESAMPLE_RATE * speed)},aresample={RESAMPLE_RATE}'
+def build_ffmpeg_command(input_path, output_path_ogg, speed, profile='default', ffmpeg='ffmpeg', progress=False,
+                         stretch='atempo', sample_rate=None):
+    """組合調整速度並轉換為OGG的FFmpeg指令（progress=True 時將進度以key=value輸出到stdout）"""
+    cmd = [
+        ffmpeg, '-i', input_path,
+        '-filter:a', build_speed_filter(speed, stretch, sample_rate),  # 預設使用atempo濾鏡調整速度，保持音調
+        *AUDIO_PROFILES[profile],
+    ]
+    if progress:
+        cmd += ['-progress', 'pipe:1', '-nostats']
+    return cmd + ['-y', output_path_ogg]
+def adjust_audio_speed_ffmpeg(input_path, output_path, speed, lang='en', scheduler=None, profile='default',
+                              segments=None, stretch='atempo', timer=None):
+    """使用ffmpeg調整音源速度並轉換為OGG格式（segments > 1 時分段平行處理）"""
     try:
         import subprocess
         
         # 確保輸出為OGG格式，無論輸入格式為何
         output_path_ogg = os.path.splitext(output_path)[0] + '.ogg'
+        if segments and segments > 1:
+            from segment_render import render_segmented, SegmentRenderError
+            try:
+                # 分段處理在內部等待執行名額，只有各FFmpeg程序的時間計入 encode
+                return True, render_segmented(input_path, output_path_ogg, speed, segments, profile,
+                                              scheduler=scheduler, stretch=stretch, timer=timer)
+            except SegmentRenderError as e:
+                print(get_text('ffmpeg_error', lang).format(e))
+                return False, output_path_ogg
+        sample_rate = None
+        if stretch == 'resample':
+            from audio_probe import probe_audio
+            with stage(timer, 'probe'):
+                sample_rate = (probe_audio(input_path) or {}).get('sample_rate')
+        cmd = build_ffmpeg_command(input_path, output_path_ogg, speed, profile, stretch=stretch, sample_rate=sample_rate)
         
-        # 使用atempo濾鏡調整速度，保持音調，並轉換為OGG格式
-        if speed > 2.0:
-            # 如果速度超過2.0，需要串聯多個atempo
-            cmd = [
-                'ffmpeg', '-i', input_path,
-                '-filter:a', f'atempo=2.0,atempo={speed/2.0}',
-                '-c:a', 'libvorbis',  # OGG Vorbis編碼器
-                '-q:a', '5',          # 品質等級5 (良好平衡)
-                '-y', output_path_ogg
-            ]
-        elif speed < 0.5:
-            # 如果速度低於0.5，需要串聯多個atempo
-            cmd = [
-                'ffmpeg', '-i', input_path,
-                '-filter:a', f'atempo=0.5,atempo={speed/0.5}',
-                '-c:a', 'libvorbis',  # OGG Vorbis編碼器
-                '-q:a', '5',          # 品質等級5 (良好平衡)
-                '-y', output_path_ogg
-            ]
-        else:
-            cmd = [
-                'ffmpeg', '-i', input_path,
-                '-filter:a', f'atempo={speed}',
-                '-c:a', 'libvorbis',  # OGG Vorbis編碼器
-                '-q:a', '5',          # 品質等級5 (良好平衡)
-                '-y', output_path_ogg
-            ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # 有排程器時需取得FFmpeg執行名額（等待名額的時間不計入 encode）
+        with (scheduler.ffmpeg_slot() if scheduler else nullcontext()):
+            with stage(timer, 'encode'):
+                result = subprocess.run(cmd, capture_output=True, text=True)
         if result.returncode != 0:
             print(get_text('ffmpeg_error', lang).format(result.stderr))
             return False, output_path_ogg
+        if timer:
+            timer.count('audio_bytes_in', os.path.getsize(input_path))
+            timer.count('audio_bytes_out', os.path.getsize(output_path_ogg))
         return True, output_path_ogg
     except FileNotFoundError:
         print(get_text('ffmpeg_not_found', lang))
@@ -289,6 +477,75 @@ def adjust_audio_speed_ffmpeg(input_path, output_path, speed, lang='en'):
     except Exception as e:
         print(get_text('audio_processing_error', lang).format(e))
         return False, None
+def render_referenced_audio(base_dir, renames, speed, lang='en', scheduler=None, profile='default',
+                            segments=None, stretch='atempo', timer=None):
+    """平行處理譜面引用的所有音源（WAVE與各 #NEXTSONG），返回各自的輸出路徑（失敗時為None）
+
+    有排程器時每個FFmpeg程序仍需取得執行名額，總耗時約等於最長的一首
+    """
+    def render(rename):
+        wave_filename, new_wave_filename = rename
+        with stage(timer, 'find_audio'):
+            input_audio_path = find_audio_file(base_dir, wave_filename)
+        if not input_audio_path:
+            print(get_text('warning_audio_not_found', lang).format(wave_filename))
+            print(get_text('manual_audio_note', lang))
+            return None
+        print(get_text('start_audio_processing', lang))
+        print(f"找到音源檔案: {os.path.basename(input_audio_path)}")
+        success, actual_output_path = adjust_audio_speed_ffmpeg(
+            input_audio_path, os.path.join(base_dir, new_wave_filename), speed, lang,
+            scheduler=scheduler, profile=profile, segments=segments, stretch=stretch, timer=timer)
+        if not success:
+            print(get_text('audio_processing_failed', lang))
+            return None
+        print(get_text('audio_processed', lang).format(actual_output_path))
+        return actual_output_path
+
+    # 同一個音源被引用多次時只處理一次
+    unique = list(dict.fromkeys(renames))
+    if len(unique) == 1:
+        outputs = {unique[0]: render(unique[0])}
+    else:
+        with ThreadPoolExecutor(max_workers=len(unique)) as pool:
+            outputs = dict(zip(unique, pool.map(render, unique)))
+    return [outputs[rename] for rename in renames]
+def process_files(tja_path, speed, lang='en', scheduler=None, profile='default', segments=None, stretch='atempo',
+                  report=None, timer=None):
+    """處理單一譜面與其所有音源，返回 (新TJA路徑, 第一個音源（通常為WAVE）的新路徑或None)
+
+    任一音源處理失敗時音源路徑為None；report 為 run_report.RunReport 時記錄此檔案各階段的耗時，
+    沒有 report 時可直接傳入 run_report.StageTimer。
+    輸入為變速輸出（例如 song_1.20x.tja）時改為以合成後的速度從原始譜面與音源產生
+    """
+    source_path, effective_speed, base_speed = resolve_source(tja_path, speed)
+    if source_path != tja_path:
+        print(get_text('variant_source', lang).format(tja_path, source_path, base_speed, effective_speed))
+        tja_path, speed = source_path, effective_speed
+    timer = report.file(tja_path, speed) if report else timer
+    try:
+        return _process_files(tja_path, speed, lang, scheduler, profile, segments, stretch, timer)
+    finally:
+        if timer:
+            timer.finish()
+def _process_files(tja_path, speed, lang, scheduler, profile, segments, stretch, timer):
+    print(get_text('start_processing', lang).format(tja_path, speed))
+    # 處理TJA檔案
+    new_tja_path, wave, nextsongs = rewrite_tja_file(tja_path, speed, lang, timer)
+    print(get_text('tja_processed', lang).format(new_tja_path))
+    renames = ([wave] if wave else []) + nextsongs
+    if not renames:
+        print(get_text('warning_no_wave', lang))
+        return new_tja_path, None
+    # 處理音源檔案 - 尋找各種格式並轉換為OGG
+    outputs = render_referenced_audio(os.path.dirname(tja_path), renames, speed, lang, scheduler=scheduler,
+                                      profile=profile, segments=segments, stretch=stretch, timer=timer)
+    if not all(outputs):
+        return new_tja_path, None
+    return new_tja_path, outputs[0]
+def parse_speed_list(text):
+    """解析以逗號分隔的速度列表，例如 "0.8,0.9,1.1" """
+    return [float(value) for value in text.split(',') if value.strip()]
 def main():
     # 自動檢測系統語言
     default_lang = get_system_language()
@@ -308,54 +565,111 @@ def main():
         epilog=get_text('epilog', lang)
     )
     
-    parser.add_argument('tja_file', type=str, help=get_text('tja_file_help', lang))
-    parser.add_argument('speed', type=float, help=get_text('speed_help', lang))
+    parser.add_argument('tja_file', type=str, nargs='?', help=get_text('tja_file_help', lang))
+    parser.add_argument('speed', type=float, nargs='?', help=get_text('speed_help', lang))
     parser.add_argument('--lang', '--language', 
                         choices=['en', 'zh-tw', 'ja'], 
                         default=default_lang,
                         help=get_text('lang_help', lang))
+    parser.add_argument('--watch', metavar='DIR', help=get_text('watch_help', lang))
+    parser.add_argument('--speeds', type=parse_speed_list, help=get_text('speeds_help', lang))
+    parser.add_argument('--workers', type=int, default=None, help=get_text('workers_help', lang))
+    parser.add_argument('--debounce', type=float, default=2.0, help=get_text('debounce_help', lang))
+    parser.add_argument('--audio-profile', choices=list(AUDIO_PROFILES), default='default',
+                        help=get_text('audio_profile_help', lang))
+    parser.add_argument('--batch', metavar='DIR', help=get_text('batch_help', lang))
+    parser.add_argument('--budget', type=float, default=None, help=get_text('budget_help', lang))
+    parser.add_argument('--zip', metavar='PACK', help=get_text('zip_help', lang))
+    parser.add_argument('--zip-output', metavar='PATH', default=None, help=get_text('zip_output_help', lang))
+    parser.add_argument('--resume', action='store_true', help=get_text('resume_help', lang))
+    parser.add_argument('--journal', default=None, help=get_text('journal_help', lang))
+    parser.add_argument('--index', metavar='DB', default=None, help=get_text('index_help', lang))
+    parser.add_argument('--skip-current', action='store_true', help=get_text('skip_current_help', lang))
+    parser.add_argument('--serve', action='store_true', help=get_text('serve_help', lang))
+    parser.add_argument('--port', type=int, default=8765, help=get_text('port_help', lang))
+    parser.add_argument('--stretch', choices=STRETCH_MODES, default='atempo', help=get_text('stretch_help', lang))
+    parser.add_argument('--segments', type=int, default=None, metavar='N', help=get_text('segments_help', lang))
+    parser.add_argument('--report', metavar='JSON', default=None, help=get_text('report_help', lang))
+    parser.add_argument('--profile', metavar='BASE', nargs='?', const='', default=None,
+                        help=get_text('profile_help', lang))
+    parser.add_argument('--profile-memory', action='store_true', help=get_text('profile_memory_help', lang))
     
     args = parser.parse_args()
     lang = args.lang  # 使用用户指定的語言
+    if args.profile is None:
+        run_cli(args, parser, lang)
+        return
+    # 以 cProfile（與可選的 tracemalloc）包住整次執行
+    from profiling import Profiler
+    profiler = Profiler(args.profile or None, memory=args.profile_memory)
+    try:
+        with profiler:
+            run_cli(args, parser, lang)
+    finally:
+        print(get_text('profile_written', lang).format(profiler.pstats_path, profiler.summary_path))
+def run_cli(args, parser, lang):
+    """依命令列參數執行（常駐服務、批次、監看或單一檔案）"""
+    if args.serve:
+        from tja_daemon import serve
+        serve(port=args.port, workers=args.workers)
+        return
+    speeds = args.speeds or ([args.speed] if args.speed is not None else [])
+    if not speeds or (not args.watch and not args.batch and not args.zip and not args.tja_file):
+        parser.error(get_text('error_missing_args', lang))
     # 檢查速度範圍
-    if not (0.5 <= args.speed <= 2.0):
+    if not all(0.5 <= speed <= 2.0 for speed in speeds):
         print(get_text('error_speed_range', lang))
         return
+
+    if args.zip:
+        from zip_pack import process_zip
+        if not os.path.isfile(args.zip):
+            print(get_text('error_file_not_found', lang).format(args.zip))
+            return
+        process_zip(args.zip, speeds, output=args.zip_output, profile=args.audio_profile, stretch=args.stretch,
+                    workers=args.workers, lang=lang)
+        return
+
+    if args.batch:
+        from batch_runner import run_batch
+        if not os.path.isdir(args.batch):
+            print(get_text('error_file_not_found', lang).format(args.batch))
+            return
+        run_batch(args.batch, speeds, profile=args.audio_profile, workers=args.workers,
+                  budget=args.budget, lang=lang, journal_path=args.journal, resume=args.resume,
+                  stretch=args.stretch, report_path=args.report, index_path=args.index,
+                  skip_current=args.skip_current)
+        return
+
+    if args.watch:
+        from watch_mode import watch_directory
+        if not os.path.isdir(args.watch):
+            print(get_text('error_file_not_found', lang).format(args.watch))
+            return
+        if args.debounce <= 0:
+            parser.error(get_text('error_debounce', lang))
+        watch_directory(args.watch, speeds, lang=lang, workers=args.workers, debounce=args.debounce,
+                        profile=args.audio_profile, stretch=args.stretch)
+        return
+
     # 檢查TJA檔案是否存在
     if not os.path.exists(args.tja_file):
         print(get_text('error_file_not_found', lang).format(args.tja_file))
         return
-    print(get_text('start_processing', lang).format(args.tja_file, args.speed))
-    try:
-        # 處理TJA檔案
-        wave_filename, new_wave_filename, new_tja_path = adjust_tja_speed(args.tja_file, args.speed, lang)
-        print(get_text('tja_processed', lang).format(new_tja_path))
-        if wave_filename is None:
-            print(get_text('warning_no_wave', lang))
-            return
-        # 處理音源檔案 - 尋找各種格式並轉換為OGG
-        base_dir = os.path.dirname(args.tja_file)
-        input_audio_path = find_audio_file(base_dir, wave_filename)
-        output_audio_path = os.path.join(base_dir, new_wave_filename)
-        
-        if not input_audio_path:
-            print(get_text('warning_audio_not_found', lang).format(wave_filename))
-            print(get_text('manual_audio_note', lang))
-            return
-            
-        print(get_text('start_audio_processing', lang))
-        print(f"找到音源檔案: {os.path.basename(input_audio_path)}")
-        
-        success, actual_output_path = adjust_audio_speed_ffmpeg(input_audio_path, output_audio_path, args.speed, lang)
-        if success:
-            print(get_text('audio_processed', lang).format(actual_output_path))
-            print(get_text('processing_complete', lang))
-            print(get_text('new_files', lang))
-            print(get_text('tja_label', lang).format(new_tja_path))
-            print(get_text('audio_label', lang).format(actual_output_path))
-        else:
-            print(get_text('audio_processing_failed', lang))
-    except Exception as e:
-        print(get_text('error_occurred', lang).format(e))
+    report = RunReport() if args.report else None
+    for speed in speeds:
+        try:
+            new_tja_path, actual_output_path = process_files(args.tja_file, speed, lang, profile=args.audio_profile,
+                                                             segments=args.segments, stretch=args.stretch,
+                                                             report=report)
+            if actual_output_path:
+                print(get_text('processing_complete', lang))
+                print(get_text('new_files', lang))
+                print(get_text('tja_label', lang).format(new_tja_path))
+                print(get_text('audio_label', lang).format(actual_output_path))
+        except Exception as e:
+            print(get_text('error_occurred', lang).format(e))
+    if report:
+        print(get_text('report_written', lang).format(report.write(args.report)))
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -9,7 +9,6 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import tkinterdnd2 as tkdnd
 import os
 import sys
-import json
 import locale
 import threading
 import subprocess
@@ -17,34 +16,18 @@ from pathlib import Path
 import tempfile
 import shutil
 
+from language_catalog import LanguageCatalog
+
 
 class LanguageManager:
     """Manages multi-language support"""
     
     def __init__(self):
         self.current_language = 'en'
-        self.languages = {}
-        self.load_languages()
-        
-    def load_languages(self):
-        """Load language files from languages directory"""
-        lang_dir = Path(__file__).parent / 'languages'
-        if not lang_dir.exists():
-            # Fallback to built-in languages if directory doesn't exist
-            self.languages = self._get_builtin_languages()
-            return
-            
-        for lang_file in lang_dir.glob('*.json'):
-            lang_code = lang_file.stem
-            try:
-                with open(lang_file, 'r', encoding='utf-8') as f:
-                    self.languages[lang_code] = json.load(f)
-            except Exception as e:
-                print(f"Error loading language file {lang_file}: {e}")
-                
-        # If no languages loaded, use built-in fallback
-        if not self.languages:
-            self.languages = self._get_builtin_languages()
+        # Each language catalog is loaded on first use (only the active language at startup)
+        self.catalog = LanguageCatalog(self._get_builtin_languages, ('en',),
+                                       lang_dir=str(Path(__file__).parent / 'languages'),
+                                       source=__file__, namespace=Path(__file__).stem, merge=False)
     
     def _get_builtin_languages(self):
         """Fallback built-in languages"""
@@ -83,9 +66,9 @@ class LanguageManager:
     
     def get_text(self, key, *args):
         """Get localized text"""
-        text = self.languages.get(self.current_language, {}).get(key)
+        text = self.catalog.text(self.current_language, key)
         if text is None:
-            text = self.languages.get('en', {}).get(key, key)
+            text = key
         
         if args:
             try:
@@ -96,12 +79,12 @@ class LanguageManager:
     
     def set_language(self, language):
         """Set current language"""
-        if language in self.languages:
+        if language in self.catalog.available():
             self.current_language = language
     
     def get_available_languages(self):
         """Get list of available languages"""
-        return list(self.languages.keys())
+        return self.catalog.available()
 
 
 class TJAProcessor:
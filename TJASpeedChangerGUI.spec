@@ -4,8 +4,8 @@
 a = Analysis(
     ['TJASpeedChangerGUI_Final.py'],
     pathex=[],
-    binaries=[('ffmpeg.exe', '.')],
-    datas=[('LOGO_BLACK_TRANS.png', '.')],
+    binaries=[],
+    datas=[('LOGO_BLACK_TRANS.png', '.'), ('ffmpeg_manifest.json', '.')],
     hiddenimports=['tkinterdnd2', 'tkinterdnd2.tkdnd', 'PIL', 'PIL._tkinter_finder'],
     hookspath=[],
     hooksconfig={},
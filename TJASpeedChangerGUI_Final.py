@@ -9,12 +9,27 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 from tkinterdnd2 import DND_FILES, TkinterDnD
 import os
 import sys
-import json
 import locale
+import time
 import threading
 import subprocess
 import webbrowser
 from pathlib import Path
+from contextlib import nullcontext
+
+from audio_lookup import AudioDirectoryIndex
+from language_catalog import LanguageCatalog
+from tja_io import write_tja_lines, detect_file_encoding
+from TJASpeedChanger import rescale_nextsong
+from tja_variants import speed_wave_filename, variant_tja_path, provenance_line, is_provenance_line, resolve_source
+from preview_render import PreviewRenderer, PreviewPlayer
+from audition import AuditionSession
+from chart_preview import ChartPreviewWorker, format_preview
+from run_report import StageTimer, stage
+from audio_probe import default_cache_dir
+from job_scheduler import RenderScheduler
+from ffmpeg_cache import find_ffmpeg
+from tk_diagnostics import EventLoopMonitor, DiagnosticsPanel, format_diagnostics
 try:
     from PIL import Image, ImageTk
     HAS_PIL = True
@@ -38,27 +53,10 @@ class LanguageManager:
     
     def __init__(self):
         self.current_language = 'en'
-        self.languages = self._get_builtin_languages()
-        self.load_languages()
-        
-    def load_languages(self):
-        """從語言目錄載入語言檔案"""
-        lang_dir = Path(__file__).parent / 'languages'
-        if not lang_dir.exists():
-            return  # 使用內建語言
-            
-        for lang_file in lang_dir.glob('*.json'):
-            lang_code = lang_file.stem
-            try:
-                with open(lang_file, 'r', encoding='utf-8') as f:
-                    loaded_lang = json.load(f)
-                    # 與內建語言合併（內建作為後備）
-                    if lang_code in self.languages:
-                        self.languages[lang_code].update(loaded_lang)
-                    else:
-                        self.languages[lang_code] = loaded_lang
-            except Exception as e:
-                print(f"載入語言檔案錯誤 {lang_file}: {e}")
+        # 每個語言的目錄檔在第一次使用時才載入（啟動時只讀取目前語言）
+        self.catalog = LanguageCatalog(self._get_builtin_languages, ('en', 'zh-tw', 'ja'),
+                                       lang_dir=str(Path(__file__).parent / 'languages'),
+                                       source=__file__, namespace=Path(__file__).stem, merge=True)
     
     def _get_builtin_languages(self):
         """內建語言"""
@@ -105,7 +103,24 @@ class LanguageManager:
                 'encoding_preserved': 'Saved with original encoding: {}',
                 'encoding_fallback': 'Using UTF-8 encoding as fallback',
                 'file_dropped': 'File dropped: {}',
-                'drag_drop_invalid': 'Invalid file type. Please drag a .tja file.'
+                'drag_drop_invalid': 'Invalid file type. Please drag a .tja file.',
+                'preview_button': 'Preview',
+                'preview_rendering': 'Rendering preview clip...',
+                'preview_playing': 'Playing preview from DEMOSTART ({:.2f}x, ready in {:.2f}s)',
+                'preview_no_player': 'Preview saved to {} (no audio player found)',
+                'preview_failed': 'Preview failed: {}',
+                'audition_button': 'Audition',
+                'audition_stop': 'Stop',
+                'audition_playing': 'Audition {:.2f}x (ready in {:.2f}s)',
+                'chart_preview_title': 'Chart Preview',
+                'chart_preview_empty': 'Select a TJA file to preview the changes',
+                'chart_preview_failed': 'Cannot preview chart: {}',
+                'stage_timings': '⏱ {:.2f}s total: {}',
+                'profiling_on': 'Diagnostics: profiling enabled for the next runs',
+                'profiling_off': 'Diagnostics: profiling disabled',
+                'profile_written': '📊 Profile written to {} (summary: {})',
+                'diagnostics_title': 'Diagnostics',
+                'variant_source': '🔁 {} is a speed variant; rendering from the original {} ({}x × requested = {}x)'
             },
             'zh-tw': {
                 'main_window_title': 'TJA速度修改器',
@@ -149,7 +164,24 @@ class LanguageManager:
                 'encoding_preserved': '使用原始編碼儲存: {}',
                 'encoding_fallback': '使用UTF-8編碼作為後備',
                 'file_dropped': '拖拉檔案: {}',
-                'drag_drop_invalid': '無效的檔案類型，請拖拉.tja檔案'
+                'drag_drop_invalid': '無效的檔案類型，請拖拉.tja檔案',
+                'preview_button': '試聽',
+                'preview_rendering': '正在產生試聽片段...',
+                'preview_playing': '從DEMOSTART開始試聽 ({:.2f}x，耗時 {:.2f}秒)',
+                'preview_no_player': '試聽片段已儲存於 {}（找不到播放器）',
+                'preview_failed': '試聽失敗: {}',
+                'audition_button': '即時試聽',
+                'audition_stop': '停止',
+                'audition_playing': '即時試聽 {:.2f}x（耗時 {:.2f}秒）',
+                'chart_preview_title': '譜面預覽',
+                'chart_preview_empty': '選擇TJA檔案後可預覽變更',
+                'chart_preview_failed': '無法預覽譜面: {}',
+                'stage_timings': '⏱ 共 {:.2f}秒: {}',
+                'profiling_on': '診斷模式：之後的處理將進行效能分析',
+                'profiling_off': '診斷模式：已關閉效能分析',
+                'profile_written': '📊 效能分析已寫入 {}（摘要: {}）',
+                'diagnostics_title': '診斷資訊',
+                'variant_source': '🔁 {} 是變速輸出，改為從原始譜面 {} 產生（{}x × 指定速度 = {}x）'
             },
             'ja': {
                 'main_window_title': 'TJA速度変更ツール',
@@ -193,7 +225,24 @@ class LanguageManager:
                 'encoding_preserved': '元のエンコーディングで保存: {}',
                 'encoding_fallback': 'UTF-8エンコーディングをフォールバックとして使用',
                 'file_dropped': 'ファイルドロップ: {}',
-                'drag_drop_invalid': '無効なファイル形式です。.tjaファイルをドラッグしてください'
+                'drag_drop_invalid': '無効なファイル形式です。.tjaファイルをドラッグしてください',
+                'preview_button': '試聴',
+                'preview_rendering': '試聴クリップを作成中...',
+                'preview_playing': 'DEMOSTARTから試聴 ({:.2f}x、{:.2f}秒で準備完了)',
+                'preview_no_player': '試聴クリップを {} に保存しました（プレーヤーが見つかりません）',
+                'preview_failed': '試聴に失敗しました: {}',
+                'audition_button': 'リアルタイム試聴',
+                'audition_stop': '停止',
+                'audition_playing': 'リアルタイム試聴 {:.2f}x（{:.2f}秒で準備完了）',
+                'chart_preview_title': '譜面プレビュー',
+                'chart_preview_empty': 'TJAファイルを選択すると変更をプレビューできます',
+                'chart_preview_failed': '譜面をプレビューできません: {}',
+                'stage_timings': '⏱ 合計 {:.2f}秒: {}',
+                'profiling_on': '診断モード：以降の処理をプロファイルします',
+                'profiling_off': '診断モード：プロファイルを無効にしました',
+                'profile_written': '📊 プロファイルを {} に書き出しました（概要: {}）',
+                'diagnostics_title': '診断情報',
+                'variant_source': '🔁 {} は速度変更済みのため、元の譜面 {} から作成します（{}x × 指定速度 = {}x）'
             }
         }
     
@@ -213,9 +262,9 @@ class LanguageManager:
     
     def get_text(self, key, *args):
         """獲取本地化文本"""
-        text = self.languages.get(self.current_language, {}).get(key)
+        text = self.catalog.text(self.current_language, key)
         if text is None:
-            text = self.languages.get('en', {}).get(key, key)
+            text = key
         
         if args:
             try:
@@ -226,12 +275,12 @@ class LanguageManager:
     
     def set_language(self, language):
         """設定當前語言"""
-        if language in self.languages:
+        if language in self.catalog.available():
             self.current_language = language
     
     def get_available_languages(self):
         """獲取可用語言列表"""
-        return list(self.languages.keys())
+        return self.catalog.available()
 
 
 class TJAProcessor:
@@ -240,130 +289,40 @@ class TJAProcessor:
     def __init__(self, language_manager):
         self.lang_mgr = language_manager
         self.ffmpeg_path = self._find_ffmpeg()
+        self.audio_index = AudioDirectoryIndex()
+        # 音源處理的工作與FFmpeg程序數（診斷面板顯示其狀態）
+        self.scheduler = RenderScheduler()
     
     def _find_ffmpeg(self):
-        """尋找FFmpeg執行檔"""
-        # 首先嘗試捆綁的FFmpeg
-        if getattr(sys, 'frozen', False):
-            # 以exe執行
-            ffmpeg_path = Path(sys._MEIPASS) / 'ffmpeg.exe'
-            if ffmpeg_path.exists():
-                return str(ffmpeg_path)
-        
-        # 嘗試當前目錄
-        local_ffmpeg = Path('ffmpeg.exe')
-        if local_ffmpeg.exists():
-            return str(local_ffmpeg)
-        
-        # 嘗試系統PATH
-        try:
-            result = subprocess.run(['where', 'ffmpeg'], capture_output=True, text=True)
-            if result.returncode == 0:
-                return 'ffmpeg'
-        except:
-            pass
-        
-        return None
+        """尋找FFmpeg執行檔（優先使用版本化快取或隨程式發佈的檔案，其次為目前資料夾與系統PATH）"""
+        return find_ffmpeg()
     
     def detect_file_encoding(self, file_path):
-        """檢測檔案編碼 - 改進版本，更精確的檢測，優先檢測ANSI編碼"""
-        # 按優先順序嘗試常見編碼，ANSI(CP950)和CP932優先
-        encodings_to_try = [
-            'utf-8-sig',    # UTF-8 with BOM
-            'utf-8',        # UTF-8 without BOM
-            'cp950',        # Traditional Chinese ANSI (Big5 Windows) - 最優先
-            'big5',         # Traditional Chinese (Big5 標準)
-            'cp932',        # Japanese ANSI (Shift-JIS Windows)
-            'shift_jis',    # Japanese Shift-JIS 標準
-            'gbk',          # Simplified Chinese
-            'euc-jp',       # Japanese (alternative)
-            'iso-2022-jp',  # Japanese (JIS)
-            'iso-8859-1',   # Western European
-            'latin1'        # Latin-1 (fallback)
-        ]
-        
-        # 如果有chardet可用，首先嘗試使用自動檢測
-        try:
-            import chardet
-            with open(file_path, 'rb') as f:
-                raw_data = f.read(8192)  # 只讀取前8KB進行檢測，節省時間
-                detected = chardet.detect(raw_data)
-                if detected and detected['encoding']:
-                    confidence = detected['confidence']
-                    detected_encoding = detected['encoding'].lower()
-                    
-                    # 高信心度的檢測結果直接使用
-                    if confidence > 0.8:
-                        # 標準化編碼名稱，優先使用Big5和Shift-JIS
-                        if 'utf-8' in detected_encoding:
-                            return 'utf-8-sig' if 'sig' in detected_encoding or confidence > 0.95 else 'utf-8'
-                        elif 'big5' in detected_encoding or 'cp950' in detected_encoding:
-                            return 'cp950'  # 統一使用cp950 (ANSI Big5)
-                        elif 'gb' in detected_encoding or ('chinese' in detected_encoding and 'big5' not in detected_encoding):
-                            return 'gbk'
-                        elif 'shift' in detected_encoding or 'cp932' in detected_encoding or 'japanese' in detected_encoding:
-                            return 'cp932'  # 統一使用cp932 (ANSI Shift-JIS)
-                        else:
-                            return detected['encoding']
-                    
-                    # 中等信心度的檢測結果也嘗試驗證
-                    elif confidence > 0.6:
-                        try:
-                            with open(file_path, 'r', encoding=detected['encoding'], errors='strict') as f:
-                                test_content = f.read(1024)  # 驗證前1KB
-                                if len(test_content) > 0:
-                                    return detected['encoding']
-                        except (UnicodeDecodeError, UnicodeError):
-                            pass  # 檢測結果不準確，繼續手動檢測
-        except ImportError:
-            pass  # chardet不可用，繼續手動檢測
-        
-        # 手動編碼檢測 - 嘗試讀取整個文件來驗證
-        for encoding in encodings_to_try:
-            try:
-                with open(file_path, 'r', encoding=encoding, errors='strict') as f:
-                    content = f.read()
-                    if len(content) > 0:
-                        # 額外驗證：檢查是否包含常見的TJA關鍵字
-                        content_lower = content.lower()
-                        tja_keywords = ['title:', 'bpm:', 'wave:', '#start', '#end']
-                        if any(keyword in content_lower for keyword in tja_keywords):
-                            # 對於CP950和CP932，進行額外驗證
-                            if encoding in ['cp950', 'cp932']:
-                                # 檢查是否包含CJK字符，確認這確實是正確的編碼
-                                has_cjk = any(ord(char) > 127 for char in content)
-                                if has_cjk:
-                                    # 嘗試重新編碼驗證一致性
-                                    try:
-                                        content.encode(encoding)
-                                        return encoding
-                                    except UnicodeEncodeError:
-                                        continue
-                                else:
-                                    return encoding
-                            else:
-                                return encoding
-            except (UnicodeDecodeError, UnicodeError, Exception):
-                continue
-        
-        # 最後手段：使用utf-8
-        return 'utf-8'
+        """檢測檔案編碼：BOM、純ASCII與UTF-8驗證優先，只有無法判斷的檔案才使用chardet與ANSI編碼試解"""
+        return detect_file_encoding(file_path)
     
     def adjust_tja_speed(self, tja_path, speed, progress_callback=None):
         """調整TJA檔案速度參數，強制OGG格式，保持原始編碼"""
+        wave_filename, new_wave_filename, new_tja_path, _ = self.rewrite_tja_file(tja_path, speed, progress_callback)
+        return wave_filename, new_wave_filename, new_tja_path
+    
+    def rewrite_tja_file(self, tja_path, speed, progress_callback=None, timer=None):
+        """改寫TJA檔案，返回 (WAVE檔名, 新WAVE檔名, 新TJA路徑, #NEXTSONG的(原檔名, 新檔名)列表)"""
         if progress_callback:
             progress_callback(f"Processing TJA file: {os.path.basename(tja_path)}")
         
         # 自動檢測檔案編碼並保存供後續使用
-        detected_encoding = self.detect_file_encoding(tja_path)
+        with stage(timer, 'detect'):
+            detected_encoding = self.detect_file_encoding(tja_path)
         original_encoding = detected_encoding  # 保存原始編碼
         
         if progress_callback:
             progress_callback(self.lang_mgr.get_text('encoding_detected', detected_encoding))
         
         try:
-            with open(tja_path, 'r', encoding=detected_encoding, errors='replace') as file:
-                lines = file.readlines()
+            with stage(timer, 'read'):
+                with open(tja_path, 'r', encoding=detected_encoding, errors='replace') as file:
+                    lines = file.readlines()
         except Exception as e:
             # 如果檢測到的編碼失敗，嘗試UTF-8與錯誤處理
             try:
@@ -375,13 +334,19 @@ class TJAProcessor:
             except Exception:
                 raise Exception("無法讀取TJA檔案，請檢查檔案編碼。")
         
-        new_lines = []
+        rewrite_start = time.perf_counter()
+        # 第一行記錄原始譜面與速度，再次處理此輸出時可從原始譜面產生
+        new_lines = [provenance_line(tja_path, speed)]
         wave_filename = None
+        nextsongs = []
         original_title = None
         
         for line in lines:
+            # 舊的來源記錄
+            if is_provenance_line(line):
+                continue
             # 修改標題加上速度標記
-            if line.startswith('TITLE:'):
+            elif line.startswith('TITLE:'):
                 original_title = line.strip().split(':', 1)[1]
                 new_lines.append(f'TITLE:{original_title} ({speed:.2f}x)\n')
             # 解析並修改BPM
@@ -402,10 +367,15 @@ class TJAProcessor:
             # 修改WAVE檔案名稱 - 總是轉換為OGG
             elif line.startswith('WAVE:'):
                 wave_filename = line.strip().split(':', 1)[1]
-                file_root, file_ext = os.path.splitext(wave_filename)
                 # 總是轉換為OGG格式
-                new_wave_filename = f'{file_root}_{speed:.2f}x.ogg'
+                new_wave_filename = speed_wave_filename(wave_filename, speed)
                 new_lines.append(f'WAVE:{new_wave_filename}\n')
+            # 段位道場的下一首歌曲（各自的音源）
+            elif line.startswith('#NEXTSONG'):
+                new_line, next_wave, new_next_wave = rescale_nextsong(line, speed)
+                if next_wave:
+                    nextsongs.append((next_wave, new_next_wave))
+                new_lines.append(new_line)
             # 處理譜面中的BPMCHANGE指令
             elif line.startswith('#BPMCHANGE'):
                 parts = line.strip().split(' ')
@@ -431,89 +401,39 @@ class TJAProcessor:
                     new_lines.append(line)
             else:
                 new_lines.append(line)
+        if timer:
+            timer.add_time('rewrite', time.perf_counter() - rewrite_start)
         
         # 儲存新的TJA檔案 - 使用原始編碼
-        base, ext = os.path.splitext(tja_path)
-        new_tja_path = f'{base}_{speed:.2f}x{ext}'
+        new_tja_path = variant_tja_path(tja_path, speed)
         
         # 使用原始檔案的編碼儲存，確保編碼一致性
-        # 第一優先：嚴格使用原始編碼，不允許任何字符丟失
-        save_success = False
+        # 在記憶體中一次編碼（無法表示的字元依編碼選擇處理策略），再以暫存檔原子寫入
         try:
-            with open(new_tja_path, 'w', encoding=original_encoding, errors='strict') as f:
-                f.writelines(new_lines)
-            save_success = True
-            if progress_callback:
+            with stage(timer, 'write'):
+                used_encoding, _ = write_tja_lines(new_tja_path, new_lines, original_encoding)
+        except OSError:
+            raise Exception("無法儲存TJA檔案，請檢查檔案權限。")
+        if timer:
+            timer.count('tja_bytes_read', os.path.getsize(tja_path))
+            timer.count('tja_lines', len(lines))
+            timer.count('tja_bytes_written', os.path.getsize(new_tja_path))
+        if progress_callback:
+            if used_encoding == original_encoding:
                 progress_callback(self.lang_mgr.get_text('encoding_preserved', original_encoding))
-        except (UnicodeEncodeError, UnicodeError):
-            # 嚴格模式失敗，嘗試安全模式但保持原編碼
-            pass
-        
-        # 如果嚴格模式失敗，嘗試安全模式但仍使用原始編碼
-        if not save_success:
-            try:
-                # 對於CJK編碼，首先嘗試xmlcharrefreplace來保留無法編碼的字符
-                error_strategy = 'xmlcharrefreplace' if original_encoding in ['shift_jis', 'cp932', 'big5', 'cp950', 'gbk'] else 'replace'
-                with open(new_tja_path, 'w', encoding=original_encoding, errors=error_strategy) as f:
-                    f.writelines(new_lines)
-                save_success = True
-                if progress_callback:
-                    progress_callback(self.lang_mgr.get_text('encoding_preserved', original_encoding))
-            except Exception:
-                pass
-        
-        # 如果還是失敗，最後嘗試ignore策略但保持原編碼
-        if not save_success:
-            try:
-                with open(new_tja_path, 'w', encoding=original_encoding, errors='ignore') as f:
-                    f.writelines(new_lines)
-                save_success = True
-                if progress_callback:
-                    progress_callback(self.lang_mgr.get_text('encoding_preserved', original_encoding))
-            except Exception:
-                pass
-        
-        # 最後手段：UTF-8（應該很少用到）
-        if not save_success:
-            try:
-                with open(new_tja_path, 'w', encoding='utf-8', errors='replace') as f:
-                    f.writelines(new_lines)
-                if progress_callback:
-                    progress_callback(self.lang_mgr.get_text('encoding_fallback'))
-            except Exception:
-                raise Exception("無法儲存TJA檔案，請檢查檔案權限。")
+            else:
+                progress_callback(self.lang_mgr.get_text('encoding_fallback'))
         
         # 返回新的wave檔案名（現在總是OGG）
-        if wave_filename:
-            file_root, _ = os.path.splitext(wave_filename)
-            new_wave_filename = f'{file_root}_{speed:.2f}x.ogg'
-        else:
-            new_wave_filename = None
+        new_wave_filename = speed_wave_filename(wave_filename, speed) if wave_filename else None
         
-        return wave_filename, new_wave_filename, new_tja_path
+        return wave_filename, new_wave_filename, new_tja_path, nextsongs
     
     def find_audio_file(self, base_dir, wave_filename):
-        """尋找各種副檔名的音源檔案"""
-        if not wave_filename:
-            return None
-            
-        # 首先嘗試精確的檔案名
-        exact_path = os.path.join(base_dir, wave_filename)
-        if os.path.exists(exact_path):
-            return exact_path
-        
-        # 嘗試不同的副檔名
-        file_root = os.path.splitext(wave_filename)[0]
-        audio_extensions = ['.ogg', '.mp3', '.wav', '.flac', '.m4a', '.aac']
-        
-        for ext in audio_extensions:
-            audio_path = os.path.join(base_dir, file_root + ext)
-            if os.path.exists(audio_path):
-                return audio_path
-        
-        return None
+        """尋找各種副檔名的音源檔案（目錄清單快取，不分大小寫）"""
+        return self.audio_index.find(base_dir, wave_filename)
     
-    def adjust_audio_speed(self, input_path, output_path, speed, progress_callback=None):
+    def adjust_audio_speed(self, input_path, output_path, speed, progress_callback=None, timer=None):
         """使用FFmpeg調整音源速度並轉換為OGG格式"""
         if not self.ffmpeg_path:
             raise Exception(self.lang_mgr.get_text('ffmpeg_not_found'))
@@ -562,54 +482,83 @@ class TJAProcessor:
                 '-y', output_path_ogg
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            with self.scheduler.ffmpeg_slot(), stage(timer, 'encode'):
+                result = subprocess.run(cmd, capture_output=True, text=True)
             if result.returncode != 0:
                 raise Exception(f"FFmpeg error: {result.stderr}")
+            if timer:
+                timer.count('audio_bytes_in', os.path.getsize(input_path))
+                timer.count('audio_bytes_out', os.path.getsize(output_path_ogg))
             return output_path_ogg  # 返回實際的輸出路徑
         except Exception as e:
             raise Exception(self.lang_mgr.get_text('audio_processing_error', str(e)))
     
-    def process_files(self, tja_path, speed, progress_callback=None, log_callback=None):
-        """主要處理功能，支援OGG轉換"""
+    def process_files(self, tja_path, speed, progress_callback=None, log_callback=None, timer=None):
+        """主要處理功能，支援OGG轉換（timer 為 StageTimer 時記錄各階段耗時）
+
+        輸入為變速輸出時改為以合成後的速度從原始譜面與音源產生
+        """
         try:
+            source_path, effective_speed, base_speed = resolve_source(tja_path, speed)
+            if source_path != tja_path:
+                if log_callback:
+                    log_callback(self.lang_mgr.get_text('variant_source', os.path.basename(tja_path),
+                                                        os.path.basename(source_path), base_speed, effective_speed))
+                tja_path, speed = source_path, effective_speed
             if log_callback:
                 log_callback(self.lang_mgr.get_text('start_processing', os.path.basename(tja_path), speed))
             
             # 處理TJA檔案
-            wave_filename, new_wave_filename, new_tja_path = self.adjust_tja_speed(
-                tja_path, speed, progress_callback
+            wave_filename, new_wave_filename, new_tja_path, nextsongs = self.rewrite_tja_file(
+                tja_path, speed, progress_callback, timer
             )
             
             if log_callback:
                 log_callback(self.lang_mgr.get_text('tja_processed', new_tja_path))
             
-            if wave_filename is None:
+            renames = ([(wave_filename, new_wave_filename)] if wave_filename else []) + nextsongs
+            if not renames:
                 if log_callback:
                     log_callback(self.lang_mgr.get_text('warning_no_wave'))
                 return new_tja_path, None
             
-            # 尋找各種副檔名的音源檔案
             base_dir = os.path.dirname(tja_path)
-            input_audio_path = self.find_audio_file(base_dir, wave_filename)
             
-            if not input_audio_path:
+            def render(rename):
+                # 尋找各種副檔名的音源檔案
+                source_wave, target_wave = rename
+                with stage(timer, 'find_audio'):
+                    input_audio_path = self.find_audio_file(base_dir, source_wave)
+                if not input_audio_path:
+                    if log_callback:
+                        log_callback(self.lang_mgr.get_text('warning_audio_not_found', source_wave))
+                        log_callback(self.lang_mgr.get_text('manual_audio_note'))
+                    return None
+                
                 if log_callback:
-                    log_callback(self.lang_mgr.get_text('warning_audio_not_found', wave_filename))
-                    log_callback(self.lang_mgr.get_text('manual_audio_note'))
-                return new_tja_path, None
-            
-            if log_callback:
-                log_callback(self.lang_mgr.get_text('start_audio_processing'))
-                log_callback(f"找到音源: {os.path.basename(input_audio_path)}")
-            
-            # 處理音源（總是輸出為OGG）
-            output_audio_path = os.path.join(base_dir, new_wave_filename)
-            actual_output_path = self.adjust_audio_speed(input_audio_path, output_audio_path, speed, progress_callback)
-            
-            if log_callback:
-                log_callback(self.lang_mgr.get_text('audio_processed', actual_output_path))
+                    log_callback(self.lang_mgr.get_text('start_audio_processing'))
+                    log_callback(f"找到音源: {os.path.basename(input_audio_path)}")
+                
+                # 處理音源（總是輸出為OGG）
+                output_audio_path = os.path.join(base_dir, target_wave)
+                actual_output_path = self.adjust_audio_speed(input_audio_path, output_audio_path, speed,
+                                                             progress_callback, timer)
+                
+                if log_callback:
+                    log_callback(self.lang_mgr.get_text('audio_processed', actual_output_path))
+                return actual_output_path
             
-            return new_tja_path, actual_output_path
+            # 段位道場引用多首歌曲時同時處理所有音源，總耗時約等於最長的一首
+            unique = list(dict.fromkeys(renames))
+            futures = [self.scheduler.submit(render, rename) for rename in unique]
+            outputs = [future.result() for future in futures]
+
+            # 任一音源（包含 #NEXTSONG）處理失敗時與CLI相同，不返回音源路徑
+            if not all(outputs):
+                if log_callback:
+                    log_callback(self.lang_mgr.get_text('audio_processing_failed'))
+                return new_tja_path, None
+            return new_tja_path, outputs[0]
             
         except Exception as e:
             raise Exception(self.lang_mgr.get_text('error_occurred', str(e)))
@@ -623,11 +572,33 @@ class TJASpeedChangerGUI:
         self.lang_mgr = LanguageManager()
         self.lang_mgr.current_language = self.lang_mgr.get_system_language()
         self.processor = TJAProcessor(self.lang_mgr)
+        # 試聽片段（快取於使用者快取資料夾）
+        self.previewer = PreviewRenderer(ffmpeg=self.processor.ffmpeg_path or 'ffmpeg',
+                                         audio_index=self.processor.audio_index)
+        self.player = PreviewPlayer()
+        # 即時試聽：解碼一次，滑桿移動時只重新變速短片段
+        self.audition = AuditionSession(ffmpeg=self.processor.ffmpeg_path or 'ffmpeg',
+                                        player=self.player, audio_index=self.processor.audio_index)
+        self.audition_active = False
+        self._audition_after_id = None
+        self._audition_generation = 0
+        # 譜面預覽：載入時解析一次，滑桿移動時只重新計算數值
+        self.chart_preview = ChartPreviewWorker(self._on_chart_preview, self._on_chart_preview_error)
+        self._chart_preview_after_id = None
+        # 最近一次處理的各階段耗時
+        self.last_timer = None
+        # 隱藏的診斷模式（Ctrl+Shift+D）：以 cProfile 與 tracemalloc 分析每次處理
+        self.profiling_enabled = False
         
         # 初始化GUI with drag and drop support
         self.root = TkinterDnD.Tk()
+        # 事件迴圈延遲監測（F12 開啟診斷面板）
+        self.loop_monitor = EventLoopMonitor(self.root).start()
+        self.diagnostics_panel = None
         self.setup_gui()
         self.update_language()
+        self.root.bind('<Control-Shift-D>', self.toggle_profiling)
+        self.root.bind('<F12>', self.toggle_diagnostics)
         
     def setup_gui(self):
         """設定主要GUI"""
@@ -745,6 +716,13 @@ class TJASpeedChangerGUI:
         self.speed_label = ttk.Label(speed_frame)
         self.speed_label.grid(row=1, column=0, pady=(5, 0))
         
+        # 譜面預覽（變速後的BPM、OFFSET、長度與音符密度）
+        self.chart_preview_frame = ttk.LabelFrame(speed_frame, padding="5")
+        self.chart_preview_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(5, 0))
+        self.chart_preview_var = tk.StringVar()
+        ttk.Label(self.chart_preview_frame, textvariable=self.chart_preview_var,
+                  font=('Courier', 9), justify=tk.LEFT).grid(row=0, column=0, sticky=tk.W)
+        
         # 儲存參照
         self.speed_frame = speed_frame
         
@@ -779,13 +757,30 @@ class TJASpeedChangerGUI:
         self.lang_frame = lang_frame
         
     def setup_process_button(self, parent, row):
-        """設定處理按鈕"""
+        """設定處理按鈕與試聽按鈕"""
+        button_frame = ttk.Frame(parent)
+        button_frame.grid(row=row, column=0, pady=(0, 10))
+        
         # 處理按鈕
         self.process_button = ttk.Button(
-            parent,
+            button_frame,
             command=self.process_files
         )
-        self.process_button.grid(row=row, column=0, pady=(0, 10))
+        self.process_button.pack(side=tk.LEFT)
+        
+        # 試聽按鈕：只處理從DEMOSTART開始的短片段
+        self.preview_button = ttk.Button(
+            button_frame,
+            command=self.preview_audio
+        )
+        self.preview_button.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # 即時試聽開關
+        self.audition_button = ttk.Button(
+            button_frame,
+            command=self.toggle_audition
+        )
+        self.audition_button.pack(side=tk.LEFT, padx=(10, 0))
         
     def setup_results_section(self, parent, row):
         """設定結果區段"""
@@ -891,6 +886,8 @@ class TJASpeedChangerGUI:
             file_path = files[0]  # 只取第一個檔案
             if file_path.lower().endswith('.tja'):
                 self.file_var.set(file_path)
+                self.stop_audition()
+                self.load_chart_preview(file_path)
                 self.log_message(self.lang_mgr.get_text('file_dropped', os.path.basename(file_path)))
             else:
                 messagebox.showwarning("Warning", self.lang_mgr.get_text('drag_drop_invalid'))
@@ -903,6 +900,8 @@ class TJASpeedChangerGUI:
         )
         if file_path:
             self.file_var.set(file_path)
+            self.stop_audition()
+            self.load_chart_preview(file_path)
     
     def validate_speed_input(self, value_if_allowed, char):
         """驗證速度輸入框只允許數字和小數點"""
@@ -939,6 +938,8 @@ class TJASpeedChangerGUI:
         self.speed_entry_var.set(f"{rounded_speed:.2f}")
         # 更新標籤
         self.update_speed_label()
+        self.schedule_audition()
+        self.schedule_chart_preview()
     
     def on_speed_entry_change(self, event=None):
         """處理數字輸入框變化"""
@@ -962,6 +963,8 @@ class TJASpeedChangerGUI:
             # 更新滑桿
             self.speed_var.set(speed)
             self.update_speed_label()
+            self.schedule_audition()
+            self.schedule_chart_preview()
             
         except ValueError:
             # 如果輸入無效，恢復到當前滑桿值
@@ -1007,10 +1010,15 @@ class TJASpeedChangerGUI:
         
         self.speed_frame.config(text=self.lang_mgr.get_text('speed_setting'))
         self.update_speed_label()
+        self.chart_preview_frame.config(text=self.lang_mgr.get_text('chart_preview_title'))
+        if not self.chart_preview.model:
+            self.chart_preview_var.set(self.lang_mgr.get_text('chart_preview_empty'))
         
         self.lang_frame.config(text=self.lang_mgr.get_text('language_setting'))
         
         self.process_button.config(text=self.lang_mgr.get_text('process_button'))
+        self.preview_button.config(text=self.lang_mgr.get_text('preview_button'))
+        self.update_audition_button()
         
         self.results_frame.config(text=self.lang_mgr.get_text('result_title'))
         self.clear_button.config(text=self.lang_mgr.get_text('clear_log'))
@@ -1020,11 +1028,13 @@ class TJASpeedChangerGUI:
         
     def log_message(self, message):
         """將訊息添加到結果區域"""
-        self.results_text.config(state='normal')
-        self.results_text.insert(tk.END, message + '\n')
-        self.results_text.see(tk.END)
-        self.results_text.config(state='disabled')
-        self.root.update()
+        with self.loop_monitor.measure('log_message'):
+            self.results_text.config(state='normal')
+            self.results_text.insert(tk.END, message + '\n')
+            self.results_text.see(tk.END)
+            self.results_text.config(state='disabled')
+            # 只重繪，不在回呼中處理其他事件（root.update() 會重入事件迴圈造成卡頓）
+            self.root.update_idletasks()
         
     def clear_results(self):
         """清除結果區域"""
@@ -1034,8 +1044,9 @@ class TJASpeedChangerGUI:
         
     def update_status(self, status):
         """更新狀態列"""
-        self.status_var.set(status)
-        self.root.update()
+        with self.loop_monitor.measure('update_status'):
+            self.status_var.set(status)
+            self.root.update_idletasks()
         
     def process_files(self):
         """處理TJA檔案與OGG轉換"""
@@ -1079,10 +1090,19 @@ class TJASpeedChangerGUI:
             def log_callback(message):
                 self.root.after(0, self.log_message, message)
             
-            # 處理檔案
-            new_tja_path, new_audio_path = self.processor.process_files(
-                tja_path, speed, progress_callback, log_callback
-            )
+            # 處理檔案（記錄各階段耗時，處理中也可在診斷面板看到）
+            timer = StageTimer(tja_path, speed)
+            self.last_timer = timer
+            profiler = self._create_profiler(tja_path, speed) if self.profiling_enabled else None
+            try:
+                with (profiler or nullcontext()):
+                    new_tja_path, new_audio_path = self.processor.process_files(
+                        tja_path, speed, progress_callback, log_callback, timer
+                    )
+            finally:
+                if profiler:
+                    log_callback(self.lang_mgr.get_text('profile_written', profiler.pstats_path, profiler.summary_path))
+            timer.finish()
             
             # 顯示結果
             def show_completion():
@@ -1091,6 +1111,7 @@ class TJASpeedChangerGUI:
                 self.log_message(self.lang_mgr.get_text('tja_label', new_tja_path))
                 if new_audio_path:
                     self.log_message(self.lang_mgr.get_text('audio_label', new_audio_path))
+                self.log_message(self.lang_mgr.get_text('stage_timings', timer.elapsed, timer.summary()))
                 
                 self.update_status(self.lang_mgr.get_text('status_completed'))
                 self.process_button.config(state='normal')
@@ -1112,15 +1133,191 @@ class TJASpeedChangerGUI:
             
             self.root.after(0, show_error)
             
+    def preview_audio(self):
+        """以目前的速度試聽從DEMOSTART開始的片段"""
+        tja_path = self.file_var.get()
+        if not tja_path or not os.path.exists(tja_path):
+            messagebox.showerror("Error", self.lang_mgr.get_text('file_not_selected'))
+            return
+        if not self.processor.ffmpeg_path:
+            messagebox.showerror("Error", self.lang_mgr.get_text('ffmpeg_not_found'))
+            return
+        
+        speed = self.speed_var.get()
+        self.preview_button.config(state='disabled')
+        self.update_status(self.lang_mgr.get_text('preview_rendering'))
+        
+        thread = threading.Thread(target=self._preview_thread, args=(tja_path, speed))
+        thread.daemon = True
+        thread.start()
+    
+    def _preview_thread(self, tja_path, speed):
+        """在獨立執行緒中產生並播放試聽片段"""
+        start = time.perf_counter()
+        try:
+            clip_path = self.previewer.render_chart(tja_path, speed)
+            if clip_path is None:
+                message = self.lang_mgr.get_text('warning_no_wave')
+            elif self.player.play(clip_path):
+                message = self.lang_mgr.get_text('preview_playing', speed, time.perf_counter() - start)
+            else:
+                message = self.lang_mgr.get_text('preview_no_player', clip_path)
+        except Exception as e:
+            message = self.lang_mgr.get_text('preview_failed', str(e))
+        
+        def show_result():
+            self.log_message(message)
+            self.update_status(self.lang_mgr.get_text('status_ready'))
+            self.preview_button.config(state='normal')
+        
+        self.root.after(0, show_result)
+    
+    def update_audition_button(self):
+        key = 'audition_stop' if self.audition_active else 'audition_button'
+        self.audition_button.config(text=self.lang_mgr.get_text(key))
+    
+    def toggle_audition(self):
+        """開始或停止即時試聽"""
+        if self.audition_active:
+            self.stop_audition()
+            return
+        tja_path = self.file_var.get()
+        if not tja_path or not os.path.exists(tja_path):
+            messagebox.showerror("Error", self.lang_mgr.get_text('file_not_selected'))
+            return
+        if not self.processor.ffmpeg_path:
+            messagebox.showerror("Error", self.lang_mgr.get_text('ffmpeg_not_found'))
+            return
+        try:
+            found = self.audition.load_chart(tja_path)
+        except Exception as e:
+            self.log_message(self.lang_mgr.get_text('preview_failed', str(e)))
+            return
+        if not found:
+            self.log_message(self.lang_mgr.get_text('warning_no_wave'))
+            return
+        self.audition_active = True
+        self.update_audition_button()
+        self.schedule_audition(delay=0)
+    
+    def stop_audition(self):
+        if self._audition_after_id:
+            self.root.after_cancel(self._audition_after_id)
+            self._audition_after_id = None
+        # 讓仍在處理中的舊結果不再播放
+        self._audition_generation += 1
+        if self.audition_active:
+            self.audition_active = False
+            self.audition.stop()
+            self.update_audition_button()
+    
+    def schedule_audition(self, delay=250):
+        """滑桿移動時去抖動：停止移動 delay 毫秒後才重新變速"""
+        if not self.audition_active:
+            return
+        if self._audition_after_id:
+            self.root.after_cancel(self._audition_after_id)
+        self._audition_after_id = self.root.after(delay, self._start_audition_render)
+    
+    def _start_audition_render(self):
+        self._audition_after_id = None
+        self._audition_generation += 1
+        generation = self._audition_generation
+        speed = self.speed_var.get()
+        thread = threading.Thread(target=self._audition_thread, args=(generation, speed))
+        thread.daemon = True
+        thread.start()
+    
+    def _audition_thread(self, generation, speed):
+        """在獨立執行緒中變速快取的片段並播放（已有更新的要求時捨棄結果）"""
+        start = time.perf_counter()
+        try:
+            clip_path = self.audition.render(speed)
+            message = None
+            if generation == self._audition_generation:
+                if self.player.play(clip_path):
+                    message = self.lang_mgr.get_text('audition_playing', speed, time.perf_counter() - start)
+                else:
+                    message = self.lang_mgr.get_text('preview_no_player', clip_path)
+        except Exception as e:
+            message = self.lang_mgr.get_text('preview_failed', str(e))
+        if message:
+            self.root.after(0, self.update_status, message)
+    
+    def toggle_profiling(self, event=None):
+        """切換診斷模式：開啟後每次處理都會寫出效能分析檔案"""
+        self.profiling_enabled = not self.profiling_enabled
+        key = 'profiling_on' if self.profiling_enabled else 'profiling_off'
+        self.update_status(self.lang_mgr.get_text(key))
+        self.log_message(self.lang_mgr.get_text(key))
+    
+    def toggle_diagnostics(self, event=None):
+        """開啟或關閉診斷面板"""
+        if self.diagnostics_panel and self.diagnostics_panel.is_open:
+            self.diagnostics_panel.close()
+            self.diagnostics_panel = None
+            return
+        self.diagnostics_panel = DiagnosticsPanel(self.root, self.lang_mgr.get_text('diagnostics_title'),
+                                                  self.collect_diagnostics)
+    
+    def collect_diagnostics(self):
+        caches = {
+            'audio lookup': self.processor.audio_index.stats(),
+            'preview clips': self.previewer.stats(),
+            'audition PCM': self.audition.cache.stats(),
+        }
+        text = format_diagnostics(self.loop_monitor.stats(), self.processor.scheduler.stats(), caches,
+                                  self.last_timer)
+        if self.profiling_enabled:
+            text += '\n' + self.lang_mgr.get_text('profiling_on')
+        return text
+    
+    def _create_profiler(self, tja_path, speed):
+        from profiling import Profiler
+        profile_dir = os.path.join(default_cache_dir(), 'profiles')
+        os.makedirs(profile_dir, exist_ok=True)
+        name = f"{os.path.splitext(os.path.basename(tja_path))[0]}_{speed:.2f}x_{time.strftime('%Y%m%d_%H%M%S')}"
+        return Profiler(os.path.join(profile_dir, name), memory=True)
+    
+    def load_chart_preview(self, tja_path):
+        """在背景解析新選擇的譜面，完成後立即顯示目前速度的預覽"""
+        self.chart_preview.load(tja_path)
+        self.chart_preview.request(self.speed_var.get())
+    
+    def schedule_chart_preview(self, delay=30):
+        """滑桿移動時去抖動；解析結果已快取，每次只需重新計算數值"""
+        if self._chart_preview_after_id:
+            self.root.after_cancel(self._chart_preview_after_id)
+        self._chart_preview_after_id = self.root.after(delay, self._request_chart_preview)
+    
+    def _request_chart_preview(self):
+        self._chart_preview_after_id = None
+        self.chart_preview.request(self.speed_var.get())
+    
+    def _on_chart_preview(self, speed, preview):
+        # 在工作執行緒中呼叫，轉回主執行緒更新畫面
+        self.root.after(0, self.chart_preview_var.set, format_preview(preview, speed))
+    
+    def _on_chart_preview_error(self, error):
+        self.root.after(0, self.chart_preview_var.set, self.lang_mgr.get_text('chart_preview_failed', str(error)))
+    
     def run(self):
         """啟動GUI應用程式"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            # 清除即時試聽的暫存檔
+            self.audition.close()
+            self.chart_preview.close()
 
 
 def main():
     """主要進入點"""
     try:
         app = TJASpeedChangerGUI()
+        if os.environ.get('TJA_STARTUP_PROBE'):
+            # 啟動時間量測（benchmark_startup.py）：視窗完成繪製後立即結束
+            app.root.after_idle(app.root.destroy)
         app.run()
     except Exception as e:
         messagebox.showerror("Error", f"啟動應用程式失敗: {e}")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Async Engine
+process_files 的 asyncio 版本：FFmpeg 以 asyncio.create_subprocess_exec 執行並串流進度，
+多個工作可在同一個事件迴圈中以 Semaphore 限制並行數
+"""
+
+import os
+import asyncio
+
+from TJASpeedChanger import (rewrite_tja_file, build_ffmpeg_command, find_audio_file,
+                             AUDIO_PROFILES, STRETCH_MODES)
+from audio_probe import probe_audio
+from library_index import probe_audio_duration
+from job_scheduler import default_ffmpeg_limit
+from tja_variants import resolve_source
+
+
+class FFmpegError(Exception):
+    """FFmpeg 執行失敗"""
+
+
+def parse_progress_line(line):
+    """解析 -progress 輸出的一行，返回 (key, value)；格式不符時返回 None"""
+    line = line.strip()
+    if '=' not in line:
+        return None
+    key, value = line.split('=', 1)
+    return key.strip(), value.strip()
+
+
+async def adjust_audio_speed_async(input_path, output_path, speed, profile='default',
+                                   progress_callback=None, ffmpeg='ffmpeg', duration=None,
+                                   stretch='atempo', sample_rate=None):
+    """以非同步子程序執行FFmpeg，返回實際輸出的OGG路徑
+
+    progress_callback(out_seconds, fraction) 於每次FFmpeg回報進度時呼叫，
+    fraction 在未知原始長度時為 None。
+    工作被取消（或發生例外）時結束FFmpeg程序並刪除不完整的輸出；
+    FFmpeg失敗時也刪除輸出，避免之後被當成已完成的變速音源
+    """
+    output_path_ogg = os.path.splitext(output_path)[0] + '.ogg'
+    cmd = build_ffmpeg_command(input_path, output_path_ogg, speed, profile, ffmpeg=ffmpeg, progress=True,
+                               stretch=stretch, sample_rate=sample_rate)
+    expected = duration / speed if duration else None
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    # 同時讀取stderr，避免管線塞滿造成死結
+    stderr_task = asyncio.create_task(proc.stderr.read())
+    finished = False
+    try:
+        async for raw in proc.stdout:
+            parsed = parse_progress_line(raw.decode('utf-8', 'replace'))
+            if not parsed or not progress_callback:
+                continue
+            key, value = parsed
+            if key == 'out_time_us' and value.isdigit():
+                seconds = int(value) / 1_000_000
+                fraction = min(1.0, seconds / expected) if expected else None
+                progress_callback(seconds, fraction)
+            elif key == 'progress' and value == 'end':
+                progress_callback(expected or 0.0, 1.0)
+
+        stderr = await stderr_task
+        returncode = await proc.wait()
+        finished = True
+    finally:
+        if not finished:
+            stderr_task.cancel()
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            try:
+                os.unlink(output_path_ogg)
+            except OSError:
+                pass
+    if returncode != 0:
+        try:
+            os.unlink(output_path_ogg)
+        except OSError:
+            pass
+        raise FFmpegError(stderr.decode('utf-8', 'replace').strip())
+    return output_path_ogg
+
+
+async def _gather_or_cancel(coros):
+    """同 asyncio.gather，但任一工作失敗時取消其餘工作（結束其FFmpeg程序）並等待它們結束"""
+    tasks = [asyncio.create_task(coro) for coro in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _render_referenced_async(base_dir, wave_filename, new_wave_filename, speed, profile,
+                                   progress_callback=None, ffmpeg='ffmpeg', stretch='atempo'):
+    input_audio_path = await asyncio.to_thread(find_audio_file, base_dir, wave_filename)
+    if not input_audio_path:
+        return None
+    duration = None
+    sample_rate = None
+    if stretch == 'resample':
+        # resample 模式需要來源取樣率
+        info = await asyncio.to_thread(probe_audio, input_audio_path, ffmpeg) or {}
+        duration, sample_rate = info.get('duration'), info.get('sample_rate')
+    elif progress_callback:
+        duration = await asyncio.to_thread(probe_audio_duration, input_audio_path)
+    output_audio_path = os.path.join(base_dir, new_wave_filename)
+    return await adjust_audio_speed_async(
+        input_audio_path, output_audio_path, speed, profile, progress_callback, ffmpeg, duration,
+        stretch, sample_rate)
+
+
+async def process_files_async(tja_path, speed, profile='default', progress_callback=None, ffmpeg='ffmpeg',
+                              stretch='atempo'):
+    """非同步處理單一譜面與其所有音源，返回 (新TJA路徑, 第一個音源的新路徑或None)
+
+    段位道場 #NEXTSONG 引用的音源會同時處理；進度只回報第一個音源。
+    輸入為變速輸出時改為以合成後的速度從原始譜面產生
+    """
+    if profile not in AUDIO_PROFILES:
+        raise ValueError(f"unknown profile: {profile}")
+    if stretch not in STRETCH_MODES:
+        raise ValueError(f"unknown stretch mode: {stretch}")
+    # TJA改寫與檔案查詢屬於短暫的阻塞I/O，交給執行緒處理
+    tja_path, speed, _ = await asyncio.to_thread(resolve_source, tja_path, speed)
+    new_tja_path, wave, nextsongs = await asyncio.to_thread(rewrite_tja_file, tja_path, speed)
+    renames = list(dict.fromkeys(([wave] if wave else []) + nextsongs))
+    if not renames:
+        return new_tja_path, None
+
+    base_dir = os.path.dirname(tja_path)
+    outputs = await _gather_or_cancel(
+        _render_referenced_async(base_dir, wave_filename, new_wave_filename, speed, profile,
+                                 progress_callback if index == 0 else None, ffmpeg, stretch)
+        for index, (wave_filename, new_wave_filename) in enumerate(renames))
+    if not all(outputs):
+        return new_tja_path, None
+    return new_tja_path, outputs[0]
+
+
+class AsyncProcessor:
+    """以 Semaphore 限制並行數的非同步處理器
+
+    jobs 為 (tja_path, speed)、(tja_path, speed, profile) 或 (tja_path, speed, profile, stretch) 的序列
+    """
+
+    def __init__(self, concurrency=None, ffmpeg='ffmpeg'):
+        self.concurrency = concurrency or default_ffmpeg_limit()
+        self.ffmpeg = ffmpeg
+        self._semaphore = None
+
+    @property
+    def semaphore(self):
+        # 延遲建立，確保屬於目前執行中的事件迴圈
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def process(self, tja_path, speed, profile='default', progress_callback=None, stretch='atempo'):
+        async with self.semaphore:
+            return await process_files_async(tja_path, speed, profile, progress_callback, self.ffmpeg, stretch)
+
+    async def _run_job(self, job, progress_callback=None):
+        tja_path, speed, *rest = job
+        profile = rest[0] if rest else 'default'
+        stretch = rest[1] if len(rest) > 1 else 'atempo'
+        callback = None
+        if progress_callback:
+            callback = lambda seconds, fraction: progress_callback(job, seconds, fraction)
+        try:
+            return job, await self.process(tja_path, speed, profile, callback, stretch)
+        except Exception as e:
+            return job, e
+
+    async def process_many(self, jobs, progress_callback=None):
+        """執行所有工作，依輸入順序返回 [(job, 結果或例外)]"""
+        return await asyncio.gather(*(self._run_job(job, progress_callback) for job in jobs))
+
+    async def iter_results(self, jobs, progress_callback=None):
+        """非同步產生器：依完成順序產生 (job, 結果或例外)"""
+        tasks = [asyncio.create_task(self._run_job(job, progress_callback)) for job in jobs]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Audio Lookup
+以目錄清單快取解析TJA的WAVE音源：每個目錄只呼叫一次 os.scandir，
+同資料夾的所有譜面共用，比對不分大小寫並可設定副檔名優先順序
+"""
+
+import os
+import threading
+
+
+# 預設副檔名優先順序（與原本 find_audio_file 相同）
+DEFAULT_AUDIO_EXTENSIONS = ('.ogg', '.mp3', '.wav', '.flac', '.m4a', '.aac')
+
+
+class DirectoryListing:
+    """單一目錄的檔名清單，支援不分大小寫查詢"""
+
+    def __init__(self, dir_path, names, mtime_ns=None):
+        self.dir_path = dir_path
+        self.mtime_ns = mtime_ns
+        self.names = set(names)
+        # 小寫檔名 -> 實際檔名（同名不同大小寫時保留第一個，精確比對另行處理）
+        self.lower_names = {}
+        # 小寫主檔名 -> {小寫副檔名: 實際檔名}
+        self.stems = {}
+        for name in sorted(self.names):
+            lower = name.lower()
+            self.lower_names.setdefault(lower, name)
+            stem, ext = os.path.splitext(lower)
+            self.stems.setdefault(stem, {}).setdefault(ext, name)
+
+    def match(self, file_name, extensions=DEFAULT_AUDIO_EXTENSIONS):
+        """尋找音源實際檔名：精確名稱 -> 不分大小寫名稱 -> 依優先順序嘗試其他副檔名"""
+        if file_name in self.names:
+            return file_name
+        actual = self.lower_names.get(file_name.lower())
+        if actual:
+            return actual
+        candidates = self.stems.get(os.path.splitext(file_name)[0].lower(), {})
+        for ext in extensions:
+            actual = candidates.get(ext.lower())
+            if actual:
+                return actual
+        return None
+
+
+class AudioDirectoryIndex:
+    """每個目錄一次 os.scandir 的音源查詢快取（執行緒安全）"""
+
+    def __init__(self, extensions=DEFAULT_AUDIO_EXTENSIONS, revalidate=True):
+        self.extensions = tuple(extensions)
+        # revalidate=True 時每次查詢只 stat 目錄本身，目錄變動才重新列出
+        self.revalidate = revalidate
+        self._listings = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _scan(self, dir_path, mtime_ns):
+        names = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_file():
+                            names.append(entry.name)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return DirectoryListing(dir_path, names, mtime_ns)
+
+    def listing(self, dir_path):
+        """取得（必要時建立）目錄清單"""
+        key = os.path.normcase(os.path.abspath(dir_path or '.'))
+        mtime_ns = None
+        if self.revalidate:
+            try:
+                mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+
+        with self._lock:
+            cached = self._listings.get(key)
+            if cached is not None and (not self.revalidate or cached.mtime_ns == mtime_ns):
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        listing = self._scan(key, mtime_ns)
+        with self._lock:
+            self._listings[key] = listing
+        return listing
+
+    def prime(self, dir_path, names, mtime_ns=None):
+        """以已取得的目錄清單預先填入快取（例如歌曲庫掃描的結果）"""
+        key = os.path.normcase(os.path.abspath(dir_path or '.'))
+        with self._lock:
+            self._listings[key] = DirectoryListing(key, names, mtime_ns)
+
+    def invalidate(self, dir_path=None):
+        """清除單一目錄或全部的快取"""
+        with self._lock:
+            if dir_path is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(os.path.normcase(os.path.abspath(dir_path)), None)
+
+    def find(self, base_dir, wave_filename, extensions=None):
+        """尋找WAVE音源，返回完整路徑或 None"""
+        if not wave_filename:
+            return None
+        # WAVE可能包含子目錄
+        sub_dir, file_name = os.path.split(wave_filename)
+        dir_path = os.path.join(base_dir, sub_dir) if sub_dir else base_dir
+        actual = self.listing(dir_path).match(file_name, extensions or self.extensions)
+        if actual is None:
+            return None
+        return os.path.join(dir_path, actual)
+
+    def stats(self):
+        """快取命中統計"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'directories': len(self._listings)}
+
+
+# 模組共用的預設快取
+default_audio_index = AudioDirectoryIndex()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Audio Probe
+音源中繼資料快取（依內容雜湊）與每個工作的耗時預測模型
+"""
+
+import os
+import re
+import sys
+import json
+import atexit
+import shutil
+import hashlib
+import threading
+import subprocess
+
+from tja_io import write_bytes_atomic
+
+
+def default_cache_dir():
+    """每位使用者的快取資料夾"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'TJASpeedChanger')
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_bytes_atomic(path, json.dumps(data, ensure_ascii=False, indent=1).encode('utf-8'))
+
+
+# ----------------------------------------------------------------------
+# 內容雜湊
+# ----------------------------------------------------------------------
+class ContentHashMemo:
+    """以 (路徑, 大小, mtime) 記憶內容雜湊，保存在探測快取旁：下次執行時未變動的音源不必重新讀取整個檔案"""
+
+    # 超過上限時捨棄最早記錄的項目
+    MAX_ENTRIES = 20000
+
+    def __init__(self, memo_path=None):
+        self.memo_path = memo_path or os.path.join(default_cache_dir(), 'content_hash.json')
+        self._entries = None
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def _load(self):
+        # 第一次查詢時才讀取（只匯入模組時不碰檔案）
+        if self._entries is None:
+            entries = _load_json(self.memo_path, {})
+            self._entries = entries if isinstance(entries, dict) else {}
+
+    def lookup(self, path, st):
+        key = os.path.abspath(path)
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if isinstance(entry, list) and len(entry) == 3 and entry[:2] == [st.st_size, st.st_mtime_ns]:
+            return entry[2]
+        return None
+
+    def store(self, path, st, digest):
+        key = os.path.abspath(path)
+        with self._lock:
+            self._load()
+            self._entries.pop(key, None)
+            self._entries[key] = [st.st_size, st.st_mtime_ns, digest]
+            if len(self._entries) > self.MAX_ENTRIES:
+                del self._entries[next(iter(self._entries))]
+            self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                _save_json(self.memo_path, self._entries)
+            except OSError:
+                # 快取寫入失敗不影響處理結果
+                return
+            self._dirty = False
+
+
+# 預設的記憶與預設的探測快取放在同一個資料夾，程序結束時保存
+default_hash_memo = ContentHashMemo()
+atexit.register(default_hash_memo.save)
+
+
+def content_hash(path, chunk_size=1024 * 1024, memo=None):
+    """計算檔案內容的BLAKE2b雜湊；以 (路徑, 大小, mtime) 記憶（跨執行保存），檔案未變動時不重新讀取"""
+    memo = memo or default_hash_memo
+    st = os.stat(path)
+    cached = memo.lookup(path, st)
+    if cached:
+        return cached
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    memo.store(path, st, value)
+    return value
+
+
+# ----------------------------------------------------------------------
+# 探測
+# ----------------------------------------------------------------------
+def _probe_with_ffprobe(ffprobe, path):
+    result = subprocess.run(
+        [ffprobe, '-v', 'error', '-select_streams', 'a:0', '-show_entries',
+         'format=duration,bit_rate:stream=codec_name,sample_rate,channels,bit_rate',
+         '-of', 'json', path],
+        capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    data = json.loads(result.stdout or '{}')
+    fmt = data.get('format', {})
+    stream = (data.get('streams') or [{}])[0]
+    bitrate = stream.get('bit_rate') or fmt.get('bit_rate')
+    return {
+        'duration': float(fmt['duration']) if fmt.get('duration') else None,
+        'sample_rate': int(stream['sample_rate']) if stream.get('sample_rate') else None,
+        'channels': stream.get('channels'),
+        'codec': stream.get('codec_name'),
+        'bitrate': int(bitrate) if bitrate else None,
+    }
+
+
+_DURATION_RE = re.compile(r'Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)')
+_BITRATE_RE = re.compile(r'Duration:.*?bitrate:\s*(\d+)\s*kb/s')
+_STREAM_RE = re.compile(r'Stream #\S+.*?Audio:\s*([^\s,]+).*?,\s*(\d+)\s*Hz,\s*([^,]+)')
+_CHANNEL_NAMES = {'mono': 1, 'stereo': 2, '5.1': 6, '5.1(side)': 6, '7.1': 8}
+
+
+def _probe_with_ffmpeg(ffmpeg, path):
+    """沒有ffprobe時解析 `ffmpeg -i` 的輸出"""
+    result = subprocess.run([ffmpeg, '-hide_banner', '-i', path], capture_output=True, text=True)
+    text = result.stderr
+    duration = _DURATION_RE.search(text)
+    if not duration:
+        return None
+    hours, minutes, seconds = duration.groups()
+    info = {'duration': int(hours) * 3600 + int(minutes) * 60 + float(seconds),
+            'sample_rate': None, 'channels': None, 'codec': None, 'bitrate': None}
+    bitrate = _BITRATE_RE.search(text)
+    if bitrate:
+        info['bitrate'] = int(bitrate.group(1)) * 1000
+    stream = _STREAM_RE.search(text)
+    if stream:
+        info['codec'] = stream.group(1)
+        info['sample_rate'] = int(stream.group(2))
+        layout = stream.group(3).strip()
+        info['channels'] = _CHANNEL_NAMES.get(layout) or (int(layout.split()[0]) if layout[:1].isdigit() else None)
+    return info
+
+
+def probe_audio(path, ffmpeg='ffmpeg'):
+    """探測音源 (長度、取樣率、聲道數、編碼、位元率)，無法探測時返回 None"""
+    try:
+        ffprobe = shutil.which('ffprobe')
+        if ffprobe:
+            return _probe_with_ffprobe(ffprobe, path)
+        return _probe_with_ffmpeg(ffmpeg, path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+class AudioProbeCache:
+    """依內容雜湊快取的音源中繼資料（相同內容的檔案只探測一次）"""
+
+    def __init__(self, cache_path=None, ffmpeg='ffmpeg'):
+        self.cache_path = cache_path or os.path.join(default_cache_dir(), 'audio_probe.json')
+        self.ffmpeg = ffmpeg
+        # 雜湊記憶與探測快取放在同一個資料夾
+        memo_path = os.path.join(os.path.dirname(self.cache_path), 'content_hash.json')
+        self.hash_memo = default_hash_memo if memo_path == default_hash_memo.memo_path else ContentHashMemo(memo_path)
+        self._entries = _load_json(self.cache_path, {})
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path):
+        """返回含 'hash' 欄位的中繼資料字典；無法探測時 duration 等欄位為 None"""
+        digest = content_hash(path, memo=self.hash_memo)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self.hits += 1
+                return dict(entry, hash=digest)
+            self.misses += 1
+        info = probe_audio(path, self.ffmpeg) or {}
+        with self._lock:
+            if info:
+                self._entries[digest] = info
+                self._dirty = True
+        return dict(info, hash=digest)
+
+    def save(self):
+        self.hash_memo.save()
+        with self._lock:
+            if not self._dirty:
+                return
+            _save_json(self.cache_path, self._entries)
+            self._dirty = False
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+# ----------------------------------------------------------------------
+# 耗時模型
+# ----------------------------------------------------------------------
+class CostModel:
+    """預測每個工作的耗時（秒）：seconds ≈ k * 輸出長度 + c，依設定檔分別以過去的紀錄校正
+
+    紀錄為FFmpeg編碼本身的時間（不含等待執行名額）；atempo與libvorbis皆為單執行緒，
+    且排程器的FFmpeg並行數不超過核心數，因此量測到的執行時間約等於CPU時間
+    """
+
+    # 尚無紀錄時的預設值：每秒輸出約需0.02秒，加上固定開銷0.3秒
+    DEFAULT_COEFFICIENTS = {'default': (0.02, 0.3), 'draft': (0.015, 0.3), 'high': (0.03, 0.3)}
+    MAX_SAMPLES = 200
+
+    def __init__(self, model_path=None):
+        self.model_path = model_path or os.path.join(default_cache_dir(), 'cost_model.json')
+        self.samples = _load_json(self.model_path, {})
+        self._coefficients = {}
+        self._lock = threading.Lock()
+
+    def record(self, duration, speed, profile, seconds):
+        """記錄一次實際執行的耗時"""
+        if not duration or seconds <= 0:
+            return
+        with self._lock:
+            samples = self.samples.setdefault(profile, [])
+            samples.append([duration / speed, seconds])
+            del samples[:-self.MAX_SAMPLES]
+            self._coefficients.pop(profile, None)
+
+    def coefficients(self, profile):
+        """以最小平方法擬合 (k, c)；紀錄不足時使用預設值"""
+        with self._lock:
+            if profile in self._coefficients:
+                return self._coefficients[profile]
+            samples = list(self.samples.get(profile, []))
+        # 'default/resample' 等分類在校正前沿用編碼設定檔的預設值
+        default = self.DEFAULT_COEFFICIENTS.get(profile.split('/')[0], self.DEFAULT_COEFFICIENTS['default'])
+        if len(samples) < 2:
+            result = default
+        else:
+            n = len(samples)
+            mean_x = sum(x for x, _ in samples) / n
+            mean_y = sum(y for _, y in samples) / n
+            var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+            if var_x == 0:
+                # 所有紀錄的長度相同，只能估計比例
+                result = (max(mean_y - default[1], 0.0) / mean_x if mean_x else default[0], default[1])
+            else:
+                k = sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x
+                c = mean_y - k * mean_x
+                result = (max(k, 0.0), max(c, 0.0))
+        with self._lock:
+            self._coefficients[profile] = result
+        return result
+
+    def predict(self, duration, speed, profile='default'):
+        """預測處理時間（秒）；未知長度時返回 None"""
+        if not duration:
+            return None
+        k, c = self.coefficients(profile)
+        return k * duration / speed + c
+
+    def save(self):
+        with self._lock:
+            _save_json(self.model_path, self.samples)
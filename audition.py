@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Audition
+GUI即時試聽：音源只解碼一次（從 DEMOSTART 開始的一段PCM保存在記憶體），
+每次改變速度時只把快取的PCM經由管線送入FFmpeg變速，不需重新讀檔、定位與解碼
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+
+from TJASpeedChanger import build_speed_filter, detect_file_encoding
+from audio_lookup import default_audio_index
+from audio_probe import content_hash
+from library_index import parse_tja_headers
+from preview_render import PreviewPlayer
+from tja_variants import resolve_source
+
+
+# 快取的PCM格式：44.1kHz、立體聲、16bit
+AUDITION_RATE = 44100
+AUDITION_CHANNELS = 2
+BYTES_PER_SECOND = AUDITION_RATE * AUDITION_CHANNELS * 2
+
+# 試聽長度（輸出秒數）
+AUDITION_SECONDS = 8.0
+# 第一次解碼時至少涵蓋 2x 速度所需的長度，常用速度之後都不需要再解碼
+MIN_DECODE_SPEED = 2.0
+
+
+def decode_pcm(input_path, start, seconds, ffmpeg='ffmpeg'):
+    """從 start 秒解碼 seconds 秒為原始PCM位元組"""
+    cmd = [
+        ffmpeg, '-v', 'error', '-ss', f'{start:.3f}', '-t', f'{seconds:.3f}', '-i', input_path,
+        '-f', 's16le', '-ac', str(AUDITION_CHANNELS), '-ar', str(AUDITION_RATE), 'pipe:1',
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg error: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result.stdout
+
+
+def stretch_pcm(pcm, speed, output_wav, seconds=AUDITION_SECONDS, stretch='atempo', ffmpeg='ffmpeg'):
+    """將快取的PCM經由stdin送入FFmpeg變速並輸出WAV
+
+    純Python的時間伸縮比FFmpeg的atempo慢上百倍，因此仍交給FFmpeg處理，
+    但省去了讀檔、定位與解碼
+    """
+    cmd = [
+        ffmpeg, '-v', 'error',
+        '-f', 's16le', '-ac', str(AUDITION_CHANNELS), '-ar', str(AUDITION_RATE), '-i', 'pipe:0',
+        '-filter:a', build_speed_filter(speed, stretch, AUDITION_RATE),
+        '-t', f'{seconds:.3f}', '-c:a', 'pcm_s16le', '-y', output_wav,
+    ]
+    result = subprocess.run(cmd, input=pcm, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg error: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return output_wav
+
+
+class DecodedClipCache:
+    """解碼後PCM片段的記憶體快取（LRU），鍵為 (音源雜湊, 起點)"""
+
+    def __init__(self, ffmpeg='ffmpeg', max_bytes=256 * 1024 * 1024, memo=None):
+        self.ffmpeg = ffmpeg
+        # 內容雜湊的記憶（預設為使用者快取資料夾中的記憶）
+        self.memo = memo
+        self.max_bytes = max_bytes
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, input_path, start, seconds):
+        """返回從 start 開始至少 seconds 秒的PCM（音源較短時返回全部）"""
+        key = (content_hash(input_path, memo=self.memo), round(start, 3))
+        needed = int(seconds * AUDITION_RATE) * AUDITION_CHANNELS * 2
+        with self._lock:
+            entry = self._clips.get(key)
+            if entry is not None:
+                pcm, complete = entry
+                if len(pcm) >= needed or complete:
+                    self._clips.move_to_end(key)
+                    self.hits += 1
+                    return pcm[:needed]
+            self.misses += 1
+        # 需要更長的片段時重新解碼較長的範圍
+        pcm = decode_pcm(input_path, start, seconds, self.ffmpeg)
+        # 解碼結果比要求短代表已到音源結尾
+        complete = len(pcm) < needed
+        with self._lock:
+            self._clips[key] = (pcm, complete)
+            self._clips.move_to_end(key)
+            while sum(len(clip) for clip, _ in self._clips.values()) > self.max_bytes and len(self._clips) > 1:
+                self._clips.popitem(last=False)
+        return pcm
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'clips': len(self._clips),
+                    'bytes': sum(len(clip) for clip, _ in self._clips.values())}
+
+
+class AuditionSession:
+    """一個譜面的試聽工作階段：每個速度的結果也會保留，重複試聽同一速度時直接播放"""
+
+    def __init__(self, ffmpeg='ffmpeg', seconds=AUDITION_SECONDS, stretch='atempo', cache=None,
+                 player=None, audio_index=None):
+        self.ffmpeg = ffmpeg
+        self.seconds = seconds
+        self.stretch = stretch
+        self.cache = cache or DecodedClipCache(ffmpeg)
+        self.player = player or PreviewPlayer()
+        self.audio_index = audio_index or default_audio_index
+        self.input_path = None
+        self.start = 0.0
+        self.speed_scale = 1.0
+        self._rendered = {}
+        self._work_dir = None
+        self._lock = threading.Lock()
+
+    def load_chart(self, tja_path):
+        """讀取譜面的音源與 DEMOSTART，返回是否找到音源
+
+        譜面為變速輸出時改用原始譜面的音源（沿用原始音源已解碼的片段），試聽速度再乘上該譜面的速度
+        """
+        tja_path, _, speed_scale = resolve_source(tja_path, 1.0)
+        headers = parse_tja_headers(tja_path, detect_file_encoding(tja_path))
+        input_path = self.audio_index.find(os.path.dirname(tja_path), headers.get('WAVE'))
+        try:
+            start = max(float(headers.get('DEMOSTART') or 0.0), 0.0)
+        except ValueError:
+            start = 0.0
+        self.load(input_path, start, speed_scale)
+        return input_path is not None
+
+    def load(self, input_path, start=0.0, speed_scale=1.0):
+        """切換音源或起點時清除已變速的結果（speed_scale 為音源相對原始音源的速度）"""
+        with self._lock:
+            if (input_path, start) != (self.input_path, self.start):
+                self._rendered.clear()
+            self.input_path = input_path
+            self.start = start
+            self.speed_scale = speed_scale
+
+    def render(self, speed):
+        """返回此速度的試聽WAV路徑"""
+        if not self.input_path:
+            raise RuntimeError('no audio loaded')
+        speed = round(speed * self.speed_scale, 6)
+        key = (round(speed, 2), self.stretch)
+        with self._lock:
+            path = self._rendered.get(key)
+            if path and os.path.exists(path):
+                return path
+            if self._work_dir is None:
+                self._work_dir = tempfile.mkdtemp(prefix='tja_audition_')
+            input_path, start = self.input_path, self.start
+        pcm = self.cache.get(input_path, start, self.seconds * max(speed, MIN_DECODE_SPEED))
+        # 每個速度使用不同的檔名，避免覆寫仍在播放的檔案
+        path = os.path.join(self._work_dir, f'audition_{key[0]:.2f}x_{self.stretch}.wav')
+        stretch_pcm(pcm, speed, path, self.seconds, self.stretch, self.ffmpeg)
+        with self._lock:
+            self._rendered[key] = path
+        return path
+
+    def play(self, speed):
+        """變速並播放，返回WAV路徑（找不到播放器時返回 None）"""
+        path = self.render(speed)
+        return path if self.player.play(path) else None
+
+    def stop(self):
+        self.player.stop()
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._rendered.clear()
+            if self._work_dir:
+                shutil.rmtree(self._work_dir, ignore_errors=True)
+                self._work_dir = None
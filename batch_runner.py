@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+批次處理整個資料夾的速度列表：先探測音源並預測每個工作的耗時，
+依最長工作優先排程、顯示總預估時間，並可拒絕超出時間預算的工作；
+譜面清單與引用的音源由歌曲庫索引（library_index）提供，只重新解析有變動的譜面；
+內容相同的音源在每個 (雜湊, 速度, 設定檔) 只編碼一次，其他輸出以複製取得
+"""
+
+import os
+import json
+import heapq
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from TJASpeedChanger import (get_text, process_files, find_audio_file, detect_file_encoding, rewrite_tja_file,
+                             render_referenced_audio, referenced_audio)
+from audio_probe import AudioProbeCache, CostModel
+from job_scheduler import RenderScheduler
+from library_index import LibraryIndex, default_index_path, parse_tja_headers
+from run_journal import RunJournal, job_key
+from run_report import RunReport, StageTimer
+from tja_io import copy_atomic
+from tja_variants import parse_variant_name, variant_tja_path, speed_wave_filename
+
+
+# 預設的批次日誌檔名
+JOURNAL_NAME = '.tja_batch_journal.jsonl'
+
+# 只有譜面（沒有音源）的工作的預估時間
+TJA_ONLY_SECONDS = 0.05
+
+
+def format_duration(seconds):
+    """將秒數格式化為 h:mm:ss 或 m:ss"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}' if hours else f'{minutes}:{seconds:02d}'
+
+
+def find_charts(root, index=None):
+    """遞迴尋找原始譜面（略過本工具產生的變速檔案）
+
+    index 為 LibraryIndex 時先增量更新索引再查詢，未變動的譜面不重新解析
+    """
+    if index is not None:
+        index.update(root)
+        return [chart['path'] for chart in index.charts(root)]
+    charts = []
+    for dir_path, _, file_names in os.walk(root):
+        for name in sorted(file_names):
+            if name.lower().endswith('.tja') and not parse_variant_name(name):
+                charts.append(os.path.join(dir_path, name))
+    return sorted(charts)
+
+
+class BatchJob:
+    """批次中的一個 (譜面, 速度) 工作
+
+    audio 為譜面引用的所有音源 [(音源檔名, 找到的路徑或None, 探測結果)]，
+    有 WAVE 時第一項為 WAVE，其後為段位道場的各 #NEXTSONG；memo 為計算識別鍵時使用的內容雜湊記憶
+    """
+
+    def __init__(self, chart, speed, profile, audio=(), predicted=TJA_ONLY_SECONDS, wave=None, stretch='atempo',
+                 memo=None):
+        self.chart = chart
+        self.speed = speed
+        self.profile = profile
+        self.stretch = stretch
+        self.wave = wave
+        self.audio = [(name, path, info or {}) for name, path, info in audio]
+        self.predicted = predicted
+        self.memo = memo
+        self._key = None
+
+    @property
+    def audio_path(self):
+        """WAVE 音源的路徑（共用編碼結果的依據）"""
+        return self.audio[0][1] if self.wave and self.audio else None
+
+    @property
+    def audio_info(self):
+        return self.audio[0][2] if self.wave and self.audio else {}
+
+    @property
+    def duration(self):
+        return self.audio_info.get('duration')
+
+    @property
+    def has_audio(self):
+        """是否找到任何引用的音源（找到卻沒有輸出代表處理失敗）"""
+        return any(path for _, path, _ in self.audio)
+
+    def nextsong_audio(self):
+        """WAVE 以外的音源（共用 WAVE 的編碼結果時仍需各自處理）"""
+        return self.audio[1:] if self.wave else self.audio
+
+    @property
+    def key(self):
+        """日誌的識別鍵，包含譜面與音源的內容指紋（第一次取得時計算，執行期間不變）"""
+        if self._key is None:
+            inputs = [self.chart] + [path for _, path, _ in self.audio if path]
+            self._key = job_key(self.chart, self.speed, self.profile, self.stretch, inputs, self.memo)
+        return self._key
+
+    @property
+    def cost_profile(self):
+        """耗時模型的分類：不同變速方式的CPU負擔差距很大，分開校正"""
+        return self.profile if self.stretch == 'atempo' else f'{self.profile}/{self.stretch}'
+
+    @property
+    def render_key(self):
+        """音源輸出的識別鍵：內容相同的音源以相同速度與設定檔輸出的結果相同"""
+        digest = self.audio_info.get('hash')
+        return (digest, f'{self.speed:.2f}', self.profile, self.stretch) if digest else None
+
+    def expected_outputs(self):
+        """此工作會產生的檔案，包含每個 #NEXTSONG 的音源（與 rewrite_tja_lines 的命名規則相同）"""
+        outputs = [variant_tja_path(self.chart, self.speed)]
+        for name, path, _ in self.audio:
+            if path:
+                outputs.append(os.path.join(os.path.dirname(self.chart), speed_wave_filename(name, self.speed)))
+        return outputs
+
+
+class BatchRunner:
+    """批次執行器"""
+
+    def __init__(self, speeds, profile='default', workers=None, budget=None, lang='en',
+                 probe_cache=None, cost_model=None, journal=None, stretch='atempo', report=None,
+                 index=None, skip_current=False):
+        self.speeds = speeds
+        self.profile = profile
+        self.stretch = stretch
+        self.budget = budget
+        self.lang = lang
+        self.scheduler = RenderScheduler(max_workers=workers)
+        self.probe_cache = probe_cache or AudioProbeCache()
+        self.cost_model = cost_model or CostModel()
+        self.journal = journal
+        self.report = report
+        self.index = index
+        self.skip_current = skip_current
+
+    @property
+    def parallelism(self):
+        return min(self.scheduler.max_workers, self.scheduler.max_ffmpeg)
+
+    def predict_audio(self, job, audio):
+        """預估處理多個音源的耗時（無法探測長度時以預設模型估計三分鐘的歌曲）"""
+        total = 0.0
+        for _, path, info in audio:
+            if not path:
+                continue
+            predicted = self.cost_model.predict(info.get('duration'), job.speed, job.cost_profile)
+            total += predicted if predicted is not None else self.cost_model.predict(180.0, job.speed, job.cost_profile)
+        return total
+
+    def chart_audio(self, chart):
+        """返回 (WAVE檔名, 引用的所有音源檔名)；索引中有記錄時直接查詢，不重新解析譜面"""
+        row = self.index.get_chart(chart) if self.index else None
+        if row is not None and row['referenced'] is not None:
+            return row['wave'], json.loads(row['referenced'])
+        encoding = detect_file_encoding(chart)
+        return parse_tja_headers(chart, encoding).get('WAVE'), referenced_audio(chart, encoding)
+
+    def build_jobs(self, charts):
+        """探測每個譜面引用的所有音源（每個音源只探測一次）並建立工作"""
+        jobs = []
+        for chart in charts:
+            wave, names = self.chart_audio(chart)
+            audio = []
+            for name in names:
+                path = find_audio_file(os.path.dirname(chart), name)
+                audio.append((name, path, self.probe_cache.get(path) if path else None))
+            for speed in self.speeds:
+                job = BatchJob(chart, speed, self.profile, audio, wave=wave, stretch=self.stretch,
+                               memo=self.probe_cache.hash_memo)
+                if job.has_audio:
+                    job.predicted = self.predict_audio(job, job.audio)
+                jobs.append(job)
+        return jobs
+
+    def plan(self, jobs):
+        """最長工作優先排程，返回 (接受的工作, 超出預算的工作, 預估總時間)
+
+        以貪婪法模擬分配到各個執行名額，完成時間超過預算的工作會被拒絕
+        """
+        ordered = sorted(jobs, key=lambda job: job.predicted, reverse=True)
+        slots = [0.0] * self.parallelism
+        accepted, refused = [], []
+        for job in ordered:
+            finish = slots[0] + job.predicted
+            if self.budget is not None and finish > self.budget:
+                refused.append(job)
+                continue
+            heapq.heapreplace(slots, finish)
+            accepted.append(job)
+        return accepted, refused, max(slots)
+
+    def group_identical(self, jobs):
+        """將音源內容相同的工作分組，返回 (需要編碼的工作, {代表工作key: [共用其音源的工作]})"""
+        leaders, followers, owners = [], {}, {}
+        for job in jobs:
+            render_key = job.render_key
+            owner = owners.get(render_key) if render_key else None
+            if owner is None:
+                if render_key:
+                    owners[render_key] = job
+                leaders.append(job)
+            else:
+                # 沿用代表工作的 WAVE 輸出，#NEXTSONG 的音源仍需各自處理
+                job.predicted = TJA_ONLY_SECONDS + self.predict_audio(job, job.nextsong_audio())
+                followers.setdefault(owner.key, []).append(job)
+        return leaders, followers
+
+    def current_filter(self, jobs):
+        """略過索引中已存在且為最新的變速輸出，返回 (需要處理的工作, 略過的工作)"""
+        pending, current, speeds = [], [], {}
+        for job in jobs:
+            if job.chart not in speeds:
+                speeds[job.chart] = self.index.current_speeds(job.chart)
+            (current if round(job.speed, 2) in speeds[job.chart] else pending).append(job)
+        return pending, current
+
+    def resume_filter(self, jobs):
+        """續傳：略過已完成且輸出完整的工作，清除上次中斷留下的不完整輸出"""
+        pending, skipped = [], []
+        for job in jobs:
+            if self.journal.is_complete(job.key):
+                skipped.append(job)
+                continue
+            if self.journal.was_interrupted(job.key):
+                for path in job.expected_outputs():
+                    if os.path.exists(path):
+                        os.unlink(path)
+                print(get_text('batch_redo', self.lang).format(job.chart, job.speed))
+            pending.append(job)
+        return pending, skipped
+
+    def _run_job(self, job):
+        if self.journal:
+            self.journal.start(job.key)
+        # 耗時模型只以FFmpeg編碼的時間校正（不含等待執行名額與改寫譜面的時間）
+        timer = self.report.file(job.chart, job.speed) if self.report else StageTimer(job.chart, job.speed)
+        new_tja_path, new_audio_path = process_files(job.chart, job.speed, self.lang,
+                                                     scheduler=self.scheduler, profile=job.profile, stretch=job.stretch,
+                                                     timer=timer)
+        encoded = timer.stages.get('encode')
+        # 段位道場的多個音源平行編碼，無法分開各自的耗時
+        if new_audio_path and encoded and len([path for _, path, _ in job.audio if path]) == 1:
+            self.cost_model.record(job.duration, job.speed, job.cost_profile, encoded)
+        # 有音源卻沒有輸出代表失敗（任一 #NEXTSONG 失敗時也沒有輸出），不記錄為完成
+        if self.journal and (new_audio_path or not job.has_audio):
+            self.journal.done(job.key, job.expected_outputs() if new_audio_path else [new_tja_path])
+        return new_audio_path
+
+    def _run_shared_job(self, job, rendered_path):
+        """改寫譜面並沿用相同音源已編碼的結果；代表工作失敗時自行編碼"""
+        if not rendered_path:
+            return self._run_job(job)
+        if self.journal:
+            self.journal.start(job.key)
+        new_tja_path, (_, new_wave_filename), nextsongs = rewrite_tja_file(job.chart, job.speed, self.lang)
+        print(get_text('tja_processed', self.lang).format(new_tja_path))
+        base_dir = os.path.dirname(job.chart)
+        target = os.path.join(base_dir, new_wave_filename)
+        # 同資料夾的譜面引用同一個音源時輸出檔案本來就相同
+        if os.path.abspath(target) != os.path.abspath(rendered_path):
+            copy_atomic(rendered_path, target)
+        print(get_text('batch_shared', self.lang).format(target, rendered_path))
+        # 段位道場其他曲目的音源仍需各自處理
+        if nextsongs and not all(render_referenced_audio(base_dir, nextsongs, job.speed, self.lang,
+                                                         scheduler=self.scheduler, profile=job.profile,
+                                                         stretch=job.stretch)):
+            return None
+        if self.journal:
+            self.journal.done(job.key, job.expected_outputs())
+        return target
+
+    def run(self, charts):
+        """執行批次，返回結果摘要"""
+        jobs = self.build_jobs(charts)
+        skipped = []
+        if self.index and self.skip_current:
+            jobs, current = self.current_filter(jobs)
+            skipped.extend(current)
+            if current:
+                print(get_text('batch_current', self.lang).format(len(current)))
+        if self.journal:
+            jobs, resumed = self.resume_filter(jobs)
+            skipped.extend(resumed)
+            if resumed:
+                print(get_text('batch_resumed', self.lang).format(len(resumed)))
+        leaders, followers = self.group_identical(jobs)
+        accepted, refused, eta = self.plan(leaders)
+        # 共用音源的工作隨其代表工作一起接受或拒絕
+        for job in list(refused):
+            refused.extend(followers.pop(job.key, []))
+        shared_jobs = [job for group in followers.values() for job in group]
+        shared = len(shared_jobs)
+        total = len(accepted) + shared
+        print(get_text('batch_plan', self.lang).format(total, format_duration(eta), self.parallelism))
+        if shared:
+            print(get_text('batch_dedup', self.lang).format(shared))
+        for job in refused:
+            print(get_text('batch_refused', self.lang).format(job.chart, job.speed, job.predicted))
+
+        remaining = sum(job.predicted for job in accepted + shared_jobs)
+        done = 0
+        failed = 0
+        pending = {self.scheduler.submit(self._run_job, job): job for job in accepted}
+        try:
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = pending.pop(future)
+                    rendered_path = None
+                    try:
+                        rendered_path = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(get_text('error_occurred', self.lang).format(e))
+                    else:
+                        # 有音源卻沒有輸出代表FFmpeg失敗（錯誤已顯示），不算完成
+                        if job.has_audio and not rendered_path:
+                            failed += 1
+                    # 代表工作完成後才處理共用其音源的工作
+                    for follower in followers.pop(job.key, []):
+                        pending[self.scheduler.submit(self._run_shared_job, follower, rendered_path)] = follower
+                    done += 1
+                    remaining -= job.predicted
+                    print(get_text('batch_progress', self.lang).format(
+                        done, total, os.path.basename(job.chart), job.speed,
+                        format_duration(max(remaining, 0) / self.parallelism)))
+        finally:
+            self.scheduler.shutdown(wait=True)
+            for cache in (self.probe_cache, self.cost_model):
+                try:
+                    cache.save()
+                except OSError:
+                    # 快取寫入失敗不影響批次結果（下次重新探測與校正）
+                    pass
+            if self.journal:
+                self.journal.close()
+        return {'completed': done - failed, 'failed': failed, 'refused': len(refused),
+                'skipped': len(skipped), 'shared': shared, 'estimated': eta}
+
+
+def run_batch(root, speeds, profile='default', workers=None, budget=None, lang='en',
+              journal_path=None, resume=False, stretch='atempo', report_path=None, index_path=None,
+              skip_current=False):
+    """CLI --batch 入口；日誌預設存放於批次資料夾，指定 report_path 時另外寫出耗時報告
+
+    譜面清單由歌曲庫索引查詢，完成後再次更新索引以記錄新產生的變速檔案
+    """
+    journal = RunJournal(journal_path or os.path.join(root, JOURNAL_NAME), resume=resume)
+    report = RunReport() if report_path else None
+    with LibraryIndex(index_path or default_index_path()) as index:
+        runner = BatchRunner(speeds, profile, workers, budget, lang, journal=journal, stretch=stretch, report=report,
+                             index=index, skip_current=skip_current)
+        summary = runner.run(find_charts(root, index))
+        index.update(root)
+    print(get_text('batch_complete', lang).format(summary['completed'], summary['failed'], summary['refused']))
+    if report:
+        print(get_text('report_written', lang).format(report.write(report_path)))
+    return summary
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark encoding detection
+以混合的譜面資料（大多為ASCII與UTF-8，少數為ANSI Big5、Shift-JIS、GBK）
+比較舊版偵測（chardet 檢查前8KB後以各編碼試讀整個檔案）與新的快速路徑的處理量
+
+用法: python benchmark_encoding.py [資料夾] [--files 200] [--repeat 3]
+未指定資料夾時產生測試資料
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from tja_io import detect_file_encoding
+
+try:
+    import chardet
+except ImportError:
+    chardet = None
+
+
+# 產生的資料中各編碼的比例（大部分譜面為ASCII或UTF-8）
+MIX = (('ascii', 50), ('utf-8', 30), ('utf-8-sig', 5), ('cp950', 6), ('cp932', 6), ('gbk', 3))
+TITLES = {
+    'ascii': 'Sample Song',
+    'utf-8': '夜に駆ける',
+    'utf-8-sig': '紅蓮華',
+    'cp950': '測試歌曲',
+    'cp932': 'テスト楽曲',
+    'gbk': '测试歌曲',
+}
+
+
+def legacy_detect_file_encoding(file_path):
+    """舊版GUI的偵測流程（保留作為比較基準）"""
+    if chardet is not None:
+        with open(file_path, 'rb') as f:
+            detected = chardet.detect(f.read(8192))
+        if detected and detected['encoding'] and detected['confidence'] > 0.8:
+            name = detected['encoding'].lower()
+            if 'utf-8' in name:
+                return 'utf-8-sig' if 'sig' in name or detected['confidence'] > 0.95 else 'utf-8'
+            if 'big5' in name or 'cp950' in name:
+                return 'cp950'
+            if 'gb' in name:
+                return 'gbk'
+            if 'shift' in name or 'cp932' in name or 'japanese' in name:
+                return 'cp932'
+            return detected['encoding']
+    for encoding in ('utf-8-sig', 'utf-8', 'cp950', 'big5', 'cp932', 'shift_jis', 'gbk', 'euc-jp'):
+        try:
+            with open(file_path, 'r', encoding=encoding, errors='strict') as f:
+                content = f.read()
+        except (UnicodeDecodeError, UnicodeError):
+            continue
+        if any(keyword in content.lower() for keyword in ('title:', 'bpm:', 'wave:', '#start', '#end')):
+            return encoding
+    return 'utf-8'
+
+
+def chart_text(title, measures=600):
+    lines = [f'TITLE:{title}', 'SUBTITLE:--Benchmark', 'BPM:160', 'WAVE:song.ogg',
+             'OFFSET:-1.234', 'DEMOSTART:30.5', '', 'COURSE:Oni', 'LEVEL:9', '#START']
+    for i in range(measures):
+        if i % 32 == 0:
+            lines.append(f'#BPMCHANGE {160 + i % 7}')
+        lines.append('1020102010201020,' if i % 2 else '3000400030004000,')
+    lines.append('#END')
+    return '\n'.join(lines) + '\n'
+
+
+def create_corpus(folder, count):
+    """依 MIX 的比例產生譜面，返回 [(路徑, 編碼)]"""
+    files = []
+    total = sum(weight for _, weight in MIX)
+    for name, weight in MIX:
+        for i in range(max(1, count * weight // total)):
+            encoding = 'utf-8' if name == 'ascii' else name
+            path = os.path.join(folder, f'{name}_{i:03d}.tja')
+            with open(path, 'wb') as f:
+                f.write(chart_text(TITLES[name]).encode(encoding))
+            files.append((path, name))
+    return files
+
+
+def run(detect, paths, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [detect(path) for path in paths]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TJA encoding detection')
+    parser.add_argument('folder', nargs='?', help='folder of TJA files (default: generated corpus)')
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.folder:
+            paths = [os.path.join(root, name) for root, _, names in os.walk(args.folder)
+                     for name in names if name.lower().endswith('.tja')]
+        else:
+            paths = [path for path, _ in create_corpus(tmp, args.files)]
+        size = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        print(f"{len(paths)} files, {size:.1f} MiB, chardet {'available' if chardet else 'not installed'}\n")
+        print(f"{'detector':<10}{'seconds':>10}{'files/s':>10}")
+        results = {}
+        for name, detect in (('legacy', legacy_detect_file_encoding), ('fast', detect_file_encoding)):
+            elapsed, results[name] = run(detect, paths, args.repeat)
+            print(f'{name:<10}{elapsed:10.3f}{len(paths) / elapsed:10.0f}')
+        # 舊版對純ASCII檔案返回 ascii，新版返回相容的 utf-8
+        changed = sum(1 for old, new in zip(results['legacy'], results['fast'])
+                      if old != new and (old, new) != ('ascii', 'utf-8'))
+        print(f'\n{changed} files detected differently')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark startup
+比較冷啟動（FFmpeg快取被清除）與熱啟動（已解壓並驗證）的啟動時間
+
+用法:
+  python benchmark_startup.py [--exe dist/TJASpeedChangerGUI.exe] [--repeat 5]
+      啟動GUI（設定 TJA_STARTUP_PROBE，視窗繪製完成後立即結束）並量測實際時間
+  python benchmark_startup.py --resolve-only [--size-mb 80]
+      只量測 find_ffmpeg()：以假的FFmpeg壓縮檔比較第一次解壓與之後直接使用快取
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import zipfile
+import argparse
+import tempfile
+import subprocess
+
+from ffmpeg_cache import (FFMPEG_NAME, MANIFEST_NAME, ARCHIVE_NAME, FFmpegCache,
+                          build_manifest, ffmpeg_cache_root, find_ffmpeg, load_manifest)
+
+
+def clear_cache(root):
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+
+
+def time_launch(cmd, env):
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def benchmark_launch(args):
+    if args.exe:
+        cmd = [args.exe]
+        dirs = [os.path.dirname(os.path.abspath(args.exe))]
+    else:
+        cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            'TJASpeedChangerGUI_Final.py')]
+        dirs = None
+    env = dict(os.environ, TJA_STARTUP_PROBE='1')
+    manifest = load_manifest(dirs)
+    entry_dir = FFmpegCache(manifest=manifest).entry_dir if manifest else None
+
+    cold, warm = [], []
+    for _ in range(args.repeat):
+        if entry_dir:
+            clear_cache(entry_dir)
+        cold.append(time_launch(cmd, env))
+        warm.append(time_launch(cmd, env))
+    if not manifest:
+        print(f'No {MANIFEST_NAME} found: cold and warm runs use the same FFmpeg lookup')
+    report(cold, warm)
+    return 0
+
+
+def benchmark_resolve(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app_dir = os.path.join(tmp, 'app')
+        cache_root = os.path.join(tmp, 'cache')
+        os.makedirs(app_dir)
+        # 假的FFmpeg：隨機內容不易壓縮，大小接近實際的靜態版FFmpeg
+        binary = os.path.join(tmp, FFMPEG_NAME)
+        with open(binary, 'wb') as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        with open(os.path.join(app_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(build_manifest(binary, version='bench'), f)
+        with zipfile.ZipFile(os.path.join(app_dir, ARCHIVE_NAME), 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.write(binary, FFMPEG_NAME)
+
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            clear_cache(cache_root)
+            start = time.perf_counter()
+            assert find_ffmpeg([app_dir], cache_root)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            assert find_ffmpeg([app_dir], cache_root)
+            warm.append(time.perf_counter() - start)
+    print(f'find_ffmpeg() with a {args.size_mb} MB {ARCHIVE_NAME} (cache: temporary, real cache is {ffmpeg_cache_root()})')
+    report(cold, warm)
+    return 0
+
+
+def report(cold, warm):
+    print(f"{'run':<8}{'best s':>10}{'mean s':>10}")
+    for name, runs in (('cold', cold), ('warm', warm)):
+        print(f'{name:<8}{min(runs):10.3f}{sum(runs) / len(runs):10.3f}')
+    if min(warm):
+        print(f'warm launch is {min(cold) / min(warm):.1f}x faster')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cold vs warm startup')
+    parser.add_argument('--exe', help='packaged executable (default: run the GUI script)')
+    parser.add_argument('--resolve-only', action='store_true', help='time only the FFmpeg lookup')
+    parser.add_argument('--size-mb', type=int, default=80, help='fake FFmpeg size for --resolve-only')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    return benchmark_resolve(args) if args.resolve_only else benchmark_launch(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark stretch modes
+比較 atempo（保持音調）與 resample（音調隨速度改變）兩種變速方式的處理速度
+
+用法: python benchmark_stretch.py [音源檔案] [--speeds 0.8,1.2] [--repeat 3]
+未指定音源時產生120秒的立體聲測試音源
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+from TJASpeedChanger import STRETCH_MODES, build_ffmpeg_command, build_speed_filter, parse_speed_list
+from audio_probe import probe_audio
+
+try:
+    import resource
+except ImportError:  # Windows 沒有 resource 模組，只量測實際時間
+    resource = None
+
+
+def child_cpu_seconds():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_timed(cmd):
+    """執行指令，返回 (實際秒數, CPU秒數或None)"""
+    cpu_before = child_cpu_seconds()
+    start = time.perf_counter()
+    subprocess.run(cmd, capture_output=True, check=True)
+    wall = time.perf_counter() - start
+    cpu_after = child_cpu_seconds()
+    return wall, (cpu_after - cpu_before) if cpu_before is not None else None
+
+
+def create_test_audio(path, seconds=120):
+    subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', f'sine=f=440:d={seconds}',
+                    '-f', 'lavfi', '-i', f'anoisesrc=d={seconds}:a=0.1',
+                    '-filter_complex', 'amix=inputs=2', '-ac', '2', '-ar', '44100', '-y', path], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark atempo vs resample stretch modes')
+    parser.add_argument('audio', nargs='?', help='source audio (default: generated 120 s test tone)')
+    parser.add_argument('--speeds', type=parse_speed_list, default=[0.8, 1.2])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--profile', default='draft')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.audio
+        if not source:
+            source = os.path.join(tmp, 'bench.wav')
+            create_test_audio(source)
+        info = probe_audio(source) or {}
+        duration, sample_rate = info.get('duration'), info.get('sample_rate')
+        print(f"Source: {source} ({duration:.1f}s, {sample_rate} Hz)\n")
+        print(f"{'mode':<10}{'speed':>7}{'stage':>8}{'wall s':>9}{'cpu s':>9}{'x realtime':>12}")
+
+        for speed in args.speeds:
+            for mode in STRETCH_MODES:
+                output = os.path.join(tmp, f'out_{mode}.ogg')
+                stages = {
+                    # 只有變速濾鏡（不編碼），量測濾鏡本身的成本
+                    'filter': ['ffmpeg', '-v', 'error', '-i', source, '-filter:a',
+                               build_speed_filter(speed, mode, sample_rate), '-f', 'null', '-'],
+                    # 完整處理（變速 + OGG編碼）
+                    'render': build_ffmpeg_command(source, output, speed, args.profile,
+                                                   stretch=mode, sample_rate=sample_rate),
+                }
+                for stage, cmd in stages.items():
+                    runs = [run_timed(cmd) for _ in range(args.repeat)]
+                    wall = min(run[0] for run in runs)
+                    cpu = min(run[1] for run in runs) if runs[0][1] is not None else None
+                    cpu_text = f'{cpu:9.2f}' if cpu is not None else f"{'-':>9}"
+                    print(f"{mode:<10}{speed:>7.2f}{stage:>8}{wall:9.2f}{cpu_text}{duration / wall:12.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
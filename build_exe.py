@@ -8,8 +8,14 @@ import os
 import sys
 import subprocess
 import shutil
+import zipfile
 from pathlib import Path
 
+from ffmpeg_cache import build_manifest, MANIFEST_NAME, ARCHIVE_NAME
+
+# 以 --zip-ffmpeg 建置時FFmpeg以壓縮檔發佈，第一次啟動時解壓到使用者快取
+ZIP_FFMPEG = '--zip-ffmpeg' in sys.argv
+
 def check_requirements():
     """Check if all requirements are met"""
     print("Checking requirements...")
@@ -108,12 +114,21 @@ VSVersionInfo(
     
     print("✓ Created version info file")
 
+def create_ffmpeg_manifest():
+    """Write the FFmpeg manifest (version, SHA-256, size) bundled with the executable"""
+    import json
+    manifest = build_manifest("ffmpeg.exe")
+    with open(MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✓ Created FFmpeg manifest (version {manifest['version']}, sha256 {manifest['sha256'][:12]})")
+
 def build_executable():
     """Build the standalone executable"""
     print("Building executable...")
     
     # Create version info
     create_version_info()
+    create_ffmpeg_manifest()
     
     # PyInstaller command
     cmd = [
@@ -123,7 +138,7 @@ def build_executable():
         "--name=TJASpeedChangerGUI",   # Executable name
         "--icon=icon.ico" if Path("icon.ico").exists() else "",  # Icon if exists
         "--version-file=version_info.txt",  # Version info
-        "--add-binary=ffmpeg.exe;.",    # Include FFmpeg
+        f"--add-data={MANIFEST_NAME};.",  # FFmpeg manifest (FFmpeg itself ships alongside)
         "--add-data=LOGO_BLACK_TRANS.png;.",  # Include logo file
         "--hidden-import=tkinterdnd2",  # Ensure tkinterdnd2 is included
         "--hidden-import=tkinterdnd2.tkdnd",
@@ -163,6 +178,19 @@ def post_build_tasks():
         print(f"✓ Executable created: {exe_path.absolute()}")
         print(f"✓ File size: {exe_path.stat().st_size / 1024 / 1024:.1f} MB")
         
+        # FFmpeg is shipped next to the executable instead of inside it, so a
+        # onefile launch no longer extracts ~100MB to a temp folder every time
+        if ZIP_FFMPEG:
+            with zipfile.ZipFile(Path("dist") / ARCHIVE_NAME, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.write("ffmpeg.exe", "ffmpeg.exe")
+            print(f"✓ Packed FFmpeg: dist/{ARCHIVE_NAME}")
+        else:
+            shutil.copy2("ffmpeg.exe", Path("dist") / "ffmpeg.exe")
+            print("✓ Copied FFmpeg: dist/ffmpeg.exe")
+        shutil.copy2(MANIFEST_NAME, Path("dist") / MANIFEST_NAME)
+        Path(MANIFEST_NAME).unlink()
+        print(f"✓ Copied FFmpeg manifest: dist/{MANIFEST_NAME}")
+        
         return True
     else:
         print("✗ Executable not found after build")
@@ -195,10 +223,11 @@ def main():
     print("BUILD COMPLETED SUCCESSFULLY!")
     print("=" * 50)
     print(f"Executable location: {Path('dist/TJASpeedChangerGUI.exe').absolute()}")
-    print("\nYou can now distribute the executable along with any sample files.")
+    print("\nDistribute the executable together with the FFmpeg files in dist/:")
+    print(f"- {ARCHIVE_NAME if ZIP_FFMPEG else 'ffmpeg.exe'} and {MANIFEST_NAME} (keep them next to the executable)")
     print("The executable includes:")
     print("- GUI application with improved encoding support")
-    print("- FFmpeg for audio processing and OGG conversion") 
+    print("- FFmpeg lookup with a hash-checked, versioned per-user cache")
     print("- Built-in multi-language support (EN/ZH-TW/JA)")
     print("- ZhongTaiko Studios branding and logo")
     print("- Big5/Shift-JIS encoding preservation")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Chart Preview
+譜面只解析一次，之後任何速度的預覽（BPM、OFFSET、長度、最高音符密度）都只需簡單運算；
+背景工作執行緒只處理最新的要求，滑桿快速移動時不會累積工作
+"""
+
+import threading
+from itertools import accumulate
+
+from TJASpeedChanger import detect_file_encoding
+# 與 tempo_map 共用同一個譜面解析；有NumPy時直接使用 CourseMap
+from tempo_map import HAS_NUMPY, DENSITY_WINDOW, HIT_NOTES, CourseMap, parse_courses, _float
+
+
+class CourseTiming:
+    """沒有NumPy時的時間軸：與 tempo_map.CourseMap 相同的介面（單一速度），由相同的解析結果計算
+
+    每個音符的時間分成兩部分：由BPM與小節長度決定的秒數（變速後除以速度），
+    以及之前所有 #DELAY 的總和（依改寫規則 #DELAY 乘以速度）
+    """
+
+    def __init__(self, name, level, slots, player=None):
+        slot_seconds, delays, bpms, _, codes, _ = slots
+        self.name = name
+        self.level = level
+        self.player = player
+        self.bpms = bpms
+        starts = list(accumulate(slot_seconds, initial=0.0))
+        slot_delays = list(accumulate(delays))
+        hits = [i for i, code in enumerate(codes) if chr(code) in HIT_NOTES]
+        self.note_starts = [starts[i] for i in hits]
+        self.note_delays = [slot_delays[i] for i in hits]
+        self.length_beats = starts[-1]
+        self.length_delay = slot_delays[-1]
+
+    @property
+    def key(self):
+        return self.name, self.player
+
+    @property
+    def notes(self):
+        return len(self.note_starts)
+
+    def note_times(self, speed=1.0):
+        """返回只有一列的音符時間（與 CourseMap.note_times 的形狀相同）"""
+        return [[start / speed + delay * speed for start, delay in zip(self.note_starts, self.note_delays)]]
+
+    def lengths(self, speed=1.0):
+        return self.length_beats / speed + self.length_delay * speed
+
+    def peak_density(self, speed=1.0, window=DENSITY_WINDOW):
+        """任意 window 秒內的最多音符數（每秒），以雙指標滑動視窗計算"""
+        # 延遲為負時時間可能倒退，排序後再計算
+        times = sorted(self.note_times(speed)[0])
+        peak = 0
+        left = 0
+        for right, time in enumerate(times):
+            while time - times[left] >= window:
+                left += 1
+            peak = max(peak, right - left + 1)
+        return [peak / window]
+
+
+class ChartModel:
+    """解析後的譜面"""
+
+    def __init__(self, headers, courses):
+        self.headers = headers
+        self.courses = courses
+        self._previews = {}
+
+    @property
+    def bpm(self):
+        return _float(self.headers.get('BPM'), 120.0)
+
+    @property
+    def offset(self):
+        return _float(self.headers.get('OFFSET'))
+
+    @property
+    def demostart(self):
+        return _float(self.headers.get('DEMOSTART'))
+
+    def preview(self, speed):
+        """以改寫規則計算指定速度下的數值，返回 {名稱: (原始值, 變速後)}"""
+        key = round(speed, 4)
+        if key not in self._previews:
+            self._previews[key] = self._compute_preview(speed)
+        return self._previews[key]
+
+    def _compute_preview(self, speed):
+        bpms = [float(bpm) for course in self.courses for bpm in course.bpms] or [self.bpm]
+        duration = max((float(course.lengths(1.0)) for course in self.courses), default=0.0)
+        new_duration = max((float(course.lengths(speed)) for course in self.courses), default=0.0)
+        result = {
+            'bpm': (self.bpm, self.bpm * speed),
+            'bpm_range': ((min(bpms), max(bpms)), (min(bpms) * speed, max(bpms) * speed)),
+            'offset': (self.offset, self.offset / speed),
+            'demostart': (self.demostart, self.demostart / speed),
+            'duration': (duration, new_duration),
+            'courses': {},
+        }
+        for course in self.courses:
+            # 以 (難度, 玩家) 區分雙人譜面的 P1 與 P2
+            result['courses'][course.key] = {
+                'level': course.level,
+                'notes': course.notes,
+                'peak_nps': (float(course.peak_density(1.0)[0]), float(course.peak_density(speed)[0])),
+            }
+        return result
+
+
+def parse_chart_lines(lines):
+    """解析TJA內容為 ChartModel（有NumPy時各難度為 tempo_map.CourseMap）"""
+    headers, courses = parse_courses(lines)
+    course_class = CourseMap if HAS_NUMPY else CourseTiming
+    return ChartModel(headers, [course_class(name, level, slots, player) for name, level, player, slots in courses])
+
+
+def load_chart(tja_path):
+    with open(tja_path, 'r', encoding=detect_file_encoding(tja_path), errors='replace') as f:
+        return parse_chart_lines(f.readlines())
+
+
+def format_preview(preview, speed):
+    """將預覽結果格式化為差異面板的文字"""
+    def pair(values, fmt):
+        old, new = values
+        return f'{fmt.format(old)} → {fmt.format(new)}'
+
+    (low, high), (new_low, new_high) = preview['bpm_range']
+    lines = [
+        f'Speed     1.00x → {speed:.2f}x',
+        f'BPM       {pair(preview["bpm"], "{:.3f}")}',
+        f'OFFSET    {pair(preview["offset"], "{:.3f}")}',
+        f'DEMOSTART {pair(preview["demostart"], "{:.3f}")}',
+        f'Length    {pair(preview["duration"], "{:.1f}s")}',
+    ]
+    if high != low:
+        lines.insert(2, f'BPM range {low:.1f}-{high:.1f} → {new_low:.1f}-{new_high:.1f}')
+    for (name, player), course in preview['courses'].items():
+        level = f' ★{course["level"]}' if course['level'] else ''
+        player = f' {player}' if player else ''
+        lines.append(f'{name}{player}{level}: {course["notes"]} notes, peak {pair(course["peak_nps"], "{:.1f}")}/s')
+    return '\n'.join(lines)
+
+
+class ChartPreviewWorker:
+    """背景預覽執行緒：只處理最新的要求，結果以 callback(speed, preview) 回報
+
+    callback 在工作執行緒中呼叫，GUI 需自行轉回主執行緒（例如 root.after）
+    """
+
+    def __init__(self, callback, error_callback=None):
+        self.callback = callback
+        self.error_callback = error_callback
+        self.model = None
+        self._path = None
+        self._request = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def load(self, tja_path):
+        """載入新的譜面（在工作執行緒中解析）"""
+        with self._condition:
+            self._path = tja_path
+            self.model = None
+            self._condition.notify()
+
+    def request(self, speed):
+        with self._condition:
+            self._request = speed
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and self._request is None and (self._path is None or self.model):
+                    self._condition.wait()
+                if self._closed:
+                    return
+                path, speed = self._path, self._request
+                self._request = None
+                model = self.model
+            try:
+                if model is None and path:
+                    model = load_chart(path)
+                    with self._condition:
+                        # 解析期間換了譜面時捨棄結果
+                        if self._path == path:
+                            self.model = model
+                if model is not None and speed is not None:
+                    self.callback(speed, model.preview(speed))
+            except Exception as e:
+                with self._condition:
+                    if self._path == path:
+                        # 無法解析的檔案不重複嘗試
+                        self._path = None
+                if self.error_callback:
+                    self.error_callback(e)
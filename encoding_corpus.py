@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Encoding Corpus
+產生已標記編碼的譜面資料（UTF-8、UTF-8 BOM、cp932、cp950、GBK、EUC-JP、Latin-1），
+包含實際的標題、副標題與 #LYRIC 歌詞；實際的歌曲包大多只有標題（與副標題）不是ASCII，
+因此每種編碼也產生無歌詞與只有標題的譜面。量測 detect_file_encoding 各編碼的正確率、每秒檔案數與最慢的延遲
+
+用法: python encoding_corpus.py [--per-codec 30] [--seed 0] [--out 資料夾] [--check] [--legacy]
+--check 時任一編碼低於 MIN_ACCURACY 即返回錯誤碼，避免偵測的效能改動破壞日文或中文譜面
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+from tja_io import detect_file_encoding
+
+
+# 每種編碼的標題、副標題、歌詞（皆可以該編碼表示）
+SAMPLES = {
+    'cp932': {
+        'titles': ['夜に駆ける', '紅蓮華', '千本桜', 'ドンだー！ハッピーバースデー', '残酷な天使のテーゼ',
+                   '太鼓の達人メドレー', '恋するフォーチュンクッキー', 'さいたま２０００'],
+        'subtitles': ['--YOASOBI', '--LiSA', '--黒うさＰ feat.初音ミク', '--ナムコオリジナル', '--高橋洋子'],
+        'lyrics': ['沈むように溶けてゆくように', '強くなれる理由を知った', '大胆不敵にハイカラ革命',
+                   'ドドンがドン！カッカッカ！', '少年よ神話になれ', 'きっと明日は晴れるでしょう'],
+    },
+    'cp950': {
+        'titles': ['孤勇者', '青花瓷', '稻香', '告白氣球', '小幸運', '夜曲', '太鼓達人主題曲'],
+        'subtitles': ['--陳奕迅', '--周杰倫', '--田馥甄', '--南夢宮原創', '--五月天'],
+        'lyrics': ['天青色等煙雨而我在等你', '還記得你說家是唯一的城堡', '原來你是我最想留住的幸運',
+                   '誰說站在光裡的才算英雄', '為你彈奏蕭邦的夜曲', '讓我們一起敲響太鼓吧'],
+    },
+    'gbk': {
+        'titles': ['孤勇者', '青花瓷', '稻香', '告白气球', '小幸运', '夜曲', '最炫民族风'],
+        'subtitles': ['--陈奕迅', '--周杰伦', '--凤凰传奇', '--南梦宫原创', '--五月天'],
+        'lyrics': ['天青色等烟雨而我在等你', '还记得你说家是唯一的城堡', '原来你是我最想留住的幸运',
+                   '谁说站在光里的才算英雄', '为你弹奏肖邦的夜曲', '苍茫的天涯是我的爱'],
+    },
+    'latin-1': {
+        'titles': ['Café Olé', 'Déjà Vu', 'La Niña Bonita', 'Über den Wolken', 'Señorita',
+                   'Fête de la Musique', 'Garçon Rêveur'],
+        'subtitles': ['--Chorale de Noël', '--Björn Ølsen', '--Amélie Poulain', '--José Ramírez'],
+        'lyrics': ['Où est la fête ce soir ?', 'Ça va très bien, merci', '¡Vamos a bailar, señorita!',
+                   'Schöne Grüße aus München', 'À bientôt, mon ami', 'Não há mal que sempre dure'],
+    },
+}
+SAMPLES['euc-jp'] = SAMPLES['cp932']
+# UTF-8 譜面常混合多種文字
+SAMPLES['utf-8'] = {key: SAMPLES['cp932'][key] + SAMPLES['cp950'][key] + SAMPLES['latin-1'][key] +
+                    (['강남스타일', '아리랑'] if key == 'titles' else [])
+                    for key in ('titles', 'subtitles', 'lyrics')}
+SAMPLES['utf-8-sig'] = SAMPLES['utf-8']
+
+CODECS = ('utf-8', 'utf-8-sig', 'cp932', 'cp950', 'gbk', 'euc-jp', 'latin-1')
+# --check 時各編碼的最低正確率（三種譜面類型合計）
+# 只有短標題的 EUC-JP 與 Latin-1 內容也能以 cp950 解碼，全形符號（！、２）的 EUC-JP 標題 chardet 無法辨識
+MIN_ACCURACY = {
+    'utf-8': 1.0,
+    'utf-8-sig': 1.0,
+    'cp932': 0.95,
+    'cp950': 0.95,
+    'gbk': 0.95,
+    'euc-jp': 0.75,
+    'latin-1': 0.85,
+}
+# 譜面類型：含歌詞、標題與副標題（無歌詞）、只有標題不是ASCII
+STYLES = ('full', 'no-lyrics', 'title-only')
+ASCII_SUBTITLES = ('--Namco Original', '--Taiko no Tatsujin', '--Various Artists')
+NOTE_PATTERNS = ('1000100010001000,', '1010201010102010,', '3000400030004000,', '11221122,',
+                 '1020102010201020,', '5000000000000008,', '0,', '7000000000080000,')
+
+
+def chart_text(codec, rng, style='full'):
+    """產生一份譜面：標題與副標題、數個難度，full 時每隔幾個小節插入一行歌詞"""
+    sample = SAMPLES[codec]
+    bpm = rng.choice((120, 150, 160, 174, 190, 200))
+    subtitles = ASCII_SUBTITLES if style == 'title-only' else sample['subtitles']
+    lines = [
+        f"TITLE:{rng.choice(sample['titles'])}",
+        f"SUBTITLE:{rng.choice(subtitles)}",
+        f'BPM:{bpm}',
+        'WAVE:song.ogg',
+        f'OFFSET:{-rng.uniform(0.5, 3.0):.3f}',
+        f'DEMOSTART:{rng.uniform(10, 60):.1f}',
+        '',
+    ]
+    for course, level in rng.sample([('Easy', 3), ('Normal', 5), ('Hard', 7), ('Oni', 9)], rng.randint(1, 3)):
+        lines += [f'COURSE:{course}', f'LEVEL:{level}', '#START']
+        for measure in range(rng.randint(40, 160)):
+            if style == 'full' and measure % 8 == 0:
+                lines.append(f"#LYRIC {rng.choice(sample['lyrics'])}")
+            if measure % 32 == 16:
+                lines.append(f'#BPMCHANGE {bpm * rng.choice((0.5, 1, 2))}')
+            lines.append(rng.choice(NOTE_PATTERNS))
+        lines += ['#END', '']
+    return '\n'.join(lines)
+
+
+def generate_corpus(folder, per_codec=30, seed=0, codecs=CODECS, styles=STYLES):
+    """產生已標記的譜面（各類型輪流），返回 [(路徑, 編碼, 類型, 原始文字)]"""
+    rng = random.Random(seed)
+    files = []
+    for codec in codecs:
+        for i in range(per_codec):
+            style = styles[i % len(styles)]
+            text = chart_text(codec, rng, style)
+            path = os.path.join(folder, f'{codec}_{style}_{i:03d}.tja')
+            with open(path, 'wb') as f:
+                f.write(text.encode(codec))
+            files.append((path, codec, style, text))
+    return files
+
+
+def is_correct(path, detected, text):
+    """偵測到的編碼能還原原始文字即視為正確（例如 cp932 與 shift_jis 對相同內容等價）"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return data.decode(detected) == text
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+
+def warm_up(files, detect=detect_file_encoding):
+    """先偵測每種編碼各一個檔案（chardet 第一次使用時才載入模型），返回耗時最久的一次"""
+    seen, slowest = set(), 0.0
+    for path, codec, _, _ in files:
+        if codec not in seen:
+            seen.add(codec)
+            start = time.perf_counter()
+            detect(path)
+            slowest = max(slowest, time.perf_counter() - start)
+    return slowest
+
+
+def evaluate(files, detect=detect_file_encoding):
+    """返回 {編碼: {'files', 'correct', 'accuracy', 'seconds', 'worst', 'worst_file', 'wrong', 'styles'}}
+
+    'styles' 為 {類型: [正確數, 檔案數]}
+    """
+    results = {}
+    for path, codec, style, text in files:
+        start = time.perf_counter()
+        detected = detect(path)
+        elapsed = time.perf_counter() - start
+        entry = results.setdefault(codec, {'files': 0, 'correct': 0, 'seconds': 0.0,
+                                           'worst': 0.0, 'worst_file': None, 'wrong': {}, 'styles': {}})
+        counts = entry['styles'].setdefault(style, [0, 0])
+        counts[1] += 1
+        entry['files'] += 1
+        entry['seconds'] += elapsed
+        if elapsed > entry['worst']:
+            entry['worst'], entry['worst_file'] = elapsed, os.path.basename(path)
+        if is_correct(path, detected, text):
+            entry['correct'] += 1
+            counts[0] += 1
+        else:
+            entry['wrong'][detected] = entry['wrong'].get(detected, 0) + 1
+    for entry in results.values():
+        entry['accuracy'] = entry['correct'] / entry['files']
+    return results
+
+
+def format_results(results):
+    lines = [f"{'codec':<11}{'files':>6}{'accuracy':>10}{'files/s':>10}{'worst ms':>10}  misdetected as"]
+    total_files = total_seconds = 0
+    worst = 0.0
+    for codec, entry in results.items():
+        total_files += entry['files']
+        total_seconds += entry['seconds']
+        worst = max(worst, entry['worst'])
+        wrong = ', '.join(f'{name} x{count}' for name, count in sorted(entry['wrong'].items()))
+        rate = entry['files'] / entry['seconds'] if entry['seconds'] else 0.0
+        lines.append(f"{codec:<11}{entry['files']:>6}{entry['accuracy']:>10.1%}{rate:>10.0f}"
+                     f"{entry['worst'] * 1000:>10.2f}  {wrong or '-'}")
+    correct = sum(entry['correct'] for entry in results.values())
+    rate = total_files / total_seconds if total_seconds else 0.0
+    lines.append(f"{'total':<11}{total_files:>6}{correct / total_files:>10.1%}{rate:>10.0f}{worst * 1000:>10.2f}")
+    lines.append('')
+    lines.append(f"{'codec':<11}" + ''.join(f'{style:>12}' for style in STYLES))
+    for codec, entry in results.items():
+        cells = []
+        for style in STYLES:
+            correct, files = entry['styles'].get(style, (0, 0))
+            cells.append(f'{correct / files:>12.1%}' if files else f"{'-':>12}")
+        lines.append(f'{codec:<11}' + ''.join(cells))
+    return '\n'.join(lines)
+
+
+def below_threshold(results, thresholds=MIN_ACCURACY):
+    """返回低於最低正確率的編碼"""
+    return [codec for codec, entry in results.items() if entry['accuracy'] < thresholds.get(codec, 1.0)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Encoding detection accuracy and throughput')
+    parser.add_argument('--per-codec', type=int, default=30, help='charts generated per codec')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='keep the generated corpus in this folder')
+    parser.add_argument('--check', action='store_true', help='exit with 1 if a codec is below MIN_ACCURACY')
+    parser.add_argument('--legacy', action='store_true', help='measure the previous GUI detector instead')
+    args = parser.parse_args()
+    if args.legacy:
+        from benchmark_encoding import legacy_detect_file_encoding as detect
+    else:
+        detect = detect_file_encoding
+
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = args.out or tmp
+        os.makedirs(folder, exist_ok=True)
+        files = generate_corpus(folder, args.per_codec, args.seed)
+        first_call = warm_up(files, detect)
+        results = evaluate(files, detect)
+    print(format_results(results))
+    print(f'\nfirst call (cold): {first_call * 1000:.2f} ms')
+    failed = below_threshold(results)
+    if failed:
+        print(f"\nBelow minimum accuracy: {', '.join(failed)}")
+    return 1 if args.check and failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
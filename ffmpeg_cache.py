@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+FFmpeg Cache
+打包後的程式不再把FFmpeg放進單一執行檔（每次啟動都要解壓約100MB到 _MEIPASS），
+改為與程式一起發佈（ffmpeg.exe 或 ffmpeg.zip），並依 ffmpeg_manifest.json 的版本與SHA-256：
+- ffmpeg.exe：驗證後直接使用
+- ffmpeg.zip：第一次啟動時解壓到每位使用者的版本化快取資料夾，之後直接使用快取
+驗證結果以 (路徑, 大小, mtime) 記錄，檔案未變動時不需每次重新計算雜湊
+"""
+
+import os
+import sys
+import json
+import uuid
+import shutil
+import hashlib
+import zipfile
+import threading
+
+from audio_probe import default_cache_dir
+
+
+FFMPEG_NAME = 'ffmpeg.exe' if sys.platform == 'win32' else 'ffmpeg'
+MANIFEST_NAME = 'ffmpeg_manifest.json'
+ARCHIVE_NAME = 'ffmpeg.zip'
+# 記錄已驗證檔案的戳記
+VERIFIED_NAME = 'verified.json'
+
+_lock = threading.Lock()
+
+
+def ffmpeg_cache_root():
+    return os.path.join(default_cache_dir(), 'ffmpeg')
+
+
+def app_dirs():
+    """可能放置FFmpeg與清單的資料夾：執行檔所在資料夾、PyInstaller解壓資料夾、原始碼資料夾"""
+    dirs = []
+    if getattr(sys, 'frozen', False):
+        dirs.append(os.path.dirname(sys.executable))
+        meipass = getattr(sys, '_MEIPASS', None)
+        if meipass:
+            dirs.append(meipass)
+    dirs.append(os.path.dirname(os.path.abspath(__file__)))
+    return list(dict.fromkeys(dirs))
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(ffmpeg_path, version=None):
+    """打包時產生清單：FFmpeg版本、SHA-256與大小"""
+    if version is None:
+        import subprocess
+        result = subprocess.run([ffmpeg_path, '-version'], capture_output=True, text=True)
+        words = result.stdout.split()
+        version = words[2] if result.returncode == 0 and len(words) > 2 else 'unknown'
+    return {
+        'version': version,
+        'sha256': file_sha256(ffmpeg_path),
+        'size': os.path.getsize(ffmpeg_path),
+        'name': FFMPEG_NAME,
+    }
+
+
+def load_manifest(dirs=None):
+    for dir_name in dirs or app_dirs():
+        path = os.path.join(dir_name, MANIFEST_NAME)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+class FFmpegCache:
+    """版本化的FFmpeg快取：<快取>/ffmpeg/<版本>-<SHA-256前12碼>/ffmpeg.exe"""
+
+    def __init__(self, root=None, manifest=None):
+        self.root = root or ffmpeg_cache_root()
+        self.manifest = manifest
+        self._verified = None
+
+    @property
+    def entry_dir(self):
+        version = ''.join(c if c.isalnum() or c in '.-_' else '_' for c in str(self.manifest['version']))
+        return os.path.join(self.root, f"{version}-{self.manifest['sha256'][:12]}")
+
+    @property
+    def cached_path(self):
+        return os.path.join(self.entry_dir, self.manifest.get('name', FFMPEG_NAME))
+
+    # ---- 驗證戳記 ----
+    def _stamp_path(self):
+        return os.path.join(self.root, VERIFIED_NAME)
+
+    def _load_stamps(self):
+        if self._verified is None:
+            try:
+                with open(self._stamp_path(), encoding='utf-8') as f:
+                    self._verified = json.load(f)
+            except (OSError, ValueError):
+                self._verified = {}
+        return self._verified
+
+    def _stamp_key(self, path):
+        st = os.stat(path)
+        return f'{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}'
+
+    def _record_stamp(self, path):
+        stamps = self._load_stamps()
+        stamps[self._stamp_key(path)] = self.manifest['sha256']
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            temp_path = f'{self._stamp_path()}.{uuid.uuid4().hex[:8]}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(stamps, f)
+            os.replace(temp_path, self._stamp_path())
+        except OSError:
+            # 快取資料夾無法寫入時只是下次需要重新驗證
+            pass
+
+    def verify(self, path):
+        """檢查檔案大小與SHA-256；已驗證且未變動的檔案只比對戳記"""
+        try:
+            if os.path.getsize(path) != self.manifest['size']:
+                return False
+            key = self._stamp_key(path)
+        except OSError:
+            return False
+        if self._load_stamps().get(key) == self.manifest['sha256']:
+            return True
+        if file_sha256(path) != self.manifest['sha256']:
+            return False
+        self._record_stamp(path)
+        return True
+
+    # ---- 安裝 ----
+    def install_from_archive(self, archive_path):
+        """從 ffmpeg.zip 解壓到快取（先寫暫存檔再改名），返回快取路徑或 None"""
+        name = self.manifest.get('name', FFMPEG_NAME)
+        os.makedirs(self.entry_dir, exist_ok=True)
+        temp_path = os.path.join(self.entry_dir, f'.{name}.{uuid.uuid4().hex[:8]}.tmp')
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                member = next((info for info in archive.infolist()
+                               if os.path.basename(info.filename) == name), None)
+                if member is None:
+                    return None
+                with archive.open(member) as source, open(temp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+            if file_sha256(temp_path) != self.manifest['sha256']:
+                return None
+            if sys.platform != 'win32':
+                os.chmod(temp_path, 0o755)
+            os.replace(temp_path, self.cached_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        self._record_stamp(self.cached_path)
+        # 新版本安裝完成後移除舊版本
+        self.prune()
+        return self.cached_path
+
+    def locate(self, dirs=None):
+        """依序使用：已驗證的快取、隨程式發佈的 ffmpeg.exe、解壓隨程式發佈的 ffmpeg.zip"""
+        if not self.manifest:
+            return None
+        with _lock:
+            if os.path.exists(self.cached_path) and self.verify(self.cached_path):
+                return self.cached_path
+            for dir_name in dirs or app_dirs():
+                sidecar = os.path.join(dir_name, self.manifest.get('name', FFMPEG_NAME))
+                if os.path.exists(sidecar) and self.verify(sidecar):
+                    return sidecar
+                archive = os.path.join(dir_name, ARCHIVE_NAME)
+                if os.path.exists(archive):
+                    try:
+                        installed = self.install_from_archive(archive)
+                    except (OSError, zipfile.BadZipFile):
+                        installed = None
+                    if installed:
+                        return installed
+        return None
+
+    def prune(self):
+        """刪除其他版本的快取"""
+        if not os.path.isdir(self.root):
+            return
+        keep = os.path.basename(self.entry_dir) if self.manifest else None
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name != keep:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def find_ffmpeg(dirs=None, cache_root=None):
+    """尋找FFmpeg：版本化快取或隨程式發佈的檔案優先，其次為舊版打包在 _MEIPASS 的檔案、
+    目前資料夾與系統PATH
+    """
+    dirs = dirs or app_dirs()
+    manifest = load_manifest(dirs)
+    if manifest:
+        found = FFmpegCache(cache_root, manifest).locate(dirs)
+        if found:
+            return found
+    # 舊版：FFmpeg 打包在單一執行檔內（每次啟動都會解壓）
+    meipass = getattr(sys, '_MEIPASS', None)
+    candidates = [os.path.join(meipass, FFMPEG_NAME)] if meipass else []
+    candidates += [os.path.join(dir_name, FFMPEG_NAME) for dir_name in dirs]
+    candidates.append(os.path.abspath(FFMPEG_NAME))
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+    return shutil.which('ffmpeg')
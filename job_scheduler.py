@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Job Scheduler
+共用的處理排程器：以有限的工作執行緒執行譜面工作，並另外限制同時執行的FFmpeg程序數
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from profiling import task_profile
+
+
+def default_ffmpeg_limit():
+    """預設FFmpeg並行上限：CPU核心數（libvorbis與atempo為單執行緒）"""
+    return max(1, os.cpu_count() or 1)
+
+
+class RenderScheduler:
+    """工作排程器 - 工作數量與FFmpeg程序數分別設上限"""
+
+    def __init__(self, max_workers=None, max_ffmpeg=None):
+        self.max_ffmpeg = max_ffmpeg or default_ffmpeg_limit()
+        self.max_workers = max_workers or self.max_ffmpeg
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='tja-job')
+        self._ffmpeg_slots = threading.BoundedSemaphore(self.max_ffmpeg)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.running_ffmpeg = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, func, *args, **kwargs):
+        """提交工作，返回 concurrent.futures.Future"""
+        with self._lock:
+            self.queued += 1
+        return self._executor.submit(self._run, func, args, kwargs)
+
+    def _run(self, func, args, kwargs):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            # 工作執行緒可能在 --profile 開始前就已啟動，由工作本身啟用分析
+            with task_profile():
+                result = func(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    @contextmanager
+    def ffmpeg_slot(self):
+        """取得一個FFmpeg執行名額（阻塞直到有空位）"""
+        self._ffmpeg_slots.acquire()
+        with self._lock:
+            self.running_ffmpeg += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running_ffmpeg -= 1
+            self._ffmpeg_slots.release()
+
+    def stats(self):
+        """目前的排程狀態"""
+        with self._lock:
+            return {
+                'queued': self.queued,
+                'running': self.running,
+                'running_ffmpeg': self.running_ffmpeg,
+                'completed': self.completed,
+                'failed': self.failed,
+                'max_workers': self.max_workers,
+                'max_ffmpeg': self.max_ffmpeg,
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
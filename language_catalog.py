@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Language Catalog
+每個語言一個已編譯的目錄檔（內建文字與 languages/<語言>.json 合併後的結果），
+需要時才載入並快取在記憶體中；啟動時只讀取目前語言，切換語言時只載入新語言
+
+目錄檔存放於 <快取>/languages/<命名空間>/<語言>.json，以來源檔案的 (大小, mtime) 判斷是否需要重新編譯
+"""
+
+import os
+import sys
+import json
+import uuid
+import threading
+
+from audio_probe import default_cache_dir
+
+
+# 目錄檔格式版本，格式改變時遞增使舊檔失效
+CATALOG_VERSION = 1
+
+
+def catalog_cache_dir():
+    return os.path.join(default_cache_dir(), 'languages')
+
+
+def _stat_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _source_stamp(source):
+    """內建文字所在模組的戳記；打包後沒有原始碼時改用執行檔"""
+    return _stat_stamp(source) if source and os.path.exists(source) else _stat_stamp(sys.executable)
+
+
+class LanguageCatalog:
+    """延遲載入的語言目錄
+
+    builtin 為返回 {語言: {鍵: 文字}} 的函式，只在需要重新編譯時才呼叫；
+    builtin_codes 為內建的語言代碼（不需建立內建文字即可列出可用語言）；
+    merge=True 時 JSON 覆蓋內建文字，False 時有 JSON 檔就只使用 JSON（舊版GUI的行為）
+    """
+
+    def __init__(self, builtin, builtin_codes, lang_dir=None, source=None, namespace='gui',
+                 cache_dir=None, merge=True):
+        self.builtin = builtin
+        self.builtin_codes = tuple(builtin_codes)
+        self.lang_dir = lang_dir
+        self.source = source
+        self.merge = merge
+        self.cache_dir = os.path.join(cache_dir or catalog_cache_dir(), namespace)
+        self.catalogs = {}
+        # 讀取過的檔案（目錄檔或來源），用於測試與診斷
+        self.reads = []
+        self._builtin = None
+        self._json_codes = None
+        self._lock = threading.Lock()
+
+    # ---- 可用語言 ----
+    def json_codes(self):
+        """languages/ 中的語言代碼（只列出檔名，不讀取內容）"""
+        if self._json_codes is None:
+            try:
+                names = sorted(os.listdir(self.lang_dir)) if self.lang_dir else []
+            except OSError:
+                names = []
+            self._json_codes = [name[:-len('.json')] for name in names if name.endswith('.json')]
+        return self._json_codes
+
+    def available(self):
+        if not self.merge and self.json_codes():
+            return list(self.json_codes())
+        codes = list(self.builtin_codes)
+        if self.merge:
+            codes += [code for code in self.json_codes() if code not in codes]
+        return codes
+
+    # ---- 載入 ----
+    def get(self, code):
+        """返回語言的 {鍵: 文字}，第一次使用時才載入"""
+        catalog = self.catalogs.get(code)
+        if catalog is None:
+            with self._lock:
+                catalog = self.catalogs.get(code)
+                if catalog is None:
+                    catalog = self._load(code) if code in self.available() else {}
+                    self.catalogs[code] = catalog
+        return catalog
+
+    def text(self, code, key, fallback='en'):
+        text = self.get(code).get(key)
+        if text is None and code != fallback:
+            text = self.get(fallback).get(key)
+        return text
+
+    def _json_path(self, code):
+        return os.path.join(self.lang_dir, f'{code}.json') if self.lang_dir else None
+
+    def _catalog_path(self, code):
+        return os.path.join(self.cache_dir, f'{code}.json')
+
+    def _fingerprint(self, code):
+        json_path = self._json_path(code)
+        return [CATALOG_VERSION, self.merge, _source_stamp(self.source),
+                _stat_stamp(json_path) if json_path else None,
+                bool(self.json_codes())]
+
+    def _load(self, code):
+        fingerprint = self._fingerprint(code)
+        path = self._catalog_path(code)
+        try:
+            with open(path, encoding='utf-8') as f:
+                compiled = json.load(f)
+            self.reads.append(path)
+            if compiled.get('fingerprint') == fingerprint:
+                return compiled['messages']
+        except (OSError, ValueError, AttributeError):
+            pass
+        messages = self._compile(code)
+        self._write(path, {'fingerprint': fingerprint, 'messages': messages})
+        return messages
+
+    def _compile(self, code):
+        """合併內建文字與 JSON 檔，產生一個語言的目錄"""
+        messages = {}
+        if self.merge or not self.json_codes():
+            if self._builtin is None:
+                self._builtin = self.builtin()
+            messages.update(self._builtin.get(code, {}))
+        json_path = self._json_path(code)
+        if json_path and os.path.exists(json_path):
+            try:
+                with open(json_path, 'r', encoding='utf-8') as f:
+                    messages.update(json.load(f))
+                self.reads.append(json_path)
+            except Exception as e:
+                print(f"載入語言檔案錯誤 {json_path}: {e}")
+        return messages
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{uuid.uuid4().hex[:8]}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        except OSError:
+            # 快取資料夾無法寫入時只是下次需要重新編譯
+            pass
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+TJA Library Index
+以SQLite記錄歌曲庫中的譜面、音源與已產生的變速檔案，
+批次處理、GUI與報表可直接查詢索引，不必重新掃描與解析整個目錄樹
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from TJASpeedChanger import detect_file_encoding, referenced_audio
+from audio_lookup import DirectoryListing, default_audio_index
+from audio_probe import default_cache_dir
+from tja_variants import parse_variant_name, speed_wave_filename
+
+# 索引中保存的標頭欄位
+HEADER_KEYS = ['TITLE', 'SUBTITLE', 'BPM', 'WAVE', 'OFFSET', 'DEMOSTART', 'GENRE', 'COURSE', 'LEVEL']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS charts (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    encoding TEXT,
+    title TEXT,
+    bpm REAL,
+    wave TEXT,
+    headers TEXT,
+    audio_path TEXT,
+    audio_mtime_ns INTEGER,
+    audio_duration REAL,
+    indexed_at REAL,
+    referenced TEXT,
+    audio_size INTEGER
+);
+CREATE TABLE IF NOT EXISTS variants (
+    chart_path TEXT NOT NULL,
+    speed REAL NOT NULL,
+    tja_path TEXT NOT NULL,
+    audio_path TEXT,
+    is_current INTEGER NOT NULL,
+    PRIMARY KEY (chart_path, speed)
+);
+CREATE INDEX IF NOT EXISTS idx_charts_dir ON charts(dir);
+"""
+
+
+def default_index_path():
+    """預設的索引資料庫（與探測快取放在同一個使用者快取資料夾）"""
+    return os.path.join(default_cache_dir(), 'library.db')
+
+
+def parse_tja_headers(tja_path, encoding):
+    """讀取TJA標頭（遇到第一個 #START 即停止）"""
+    headers = {}
+    with open(tja_path, 'r', encoding=encoding, errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if line.upper().startswith('#START'):
+                break
+            if ':' not in line or line.startswith('//'):
+                continue
+            key, value = line.split(':', 1)
+            key = key.strip().upper()
+            # 多難度譜面只記錄第一次出現的值
+            if key in HEADER_KEYS and key not in headers:
+                headers[key] = value.strip()
+    return headers
+
+
+def probe_audio_duration(audio_path):
+    """使用ffprobe取得音源長度（秒），無法取得時返回 None"""
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe or not audio_path:
+        return None
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-show_entries', 'format=duration',
+             '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+            capture_output=True, text=True
+        )
+        if result.returncode == 0 and result.stdout.strip():
+            return float(result.stdout.strip())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LibraryIndex:
+    """歌曲庫索引 - 平行 os.scandir 掃描，僅重新解析 mtime 有變動的檔案"""
+
+    def __init__(self, db_path, workers=8, detect_encoding=detect_file_encoding):
+        self.db_path = db_path
+        self.workers = workers
+        self.detect_encoding = detect_encoding
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        # 舊版資料庫沒有 referenced、audio_size 欄位：補上後這些譜面會在下次更新時重新解析
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(charts)")}
+        with self.conn:
+            for column, kind in (('referenced', 'TEXT'), ('audio_size', 'INTEGER')):
+                if column not in columns:
+                    self.conn.execute(f"ALTER TABLE charts ADD COLUMN {column} {kind}")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------------------------------------------
+    # 掃描
+    # ------------------------------------------------------------------
+    def _scan_dir(self, dir_path):
+        """掃描單一目錄，返回 (檔案 {名稱: stat}, 子目錄列表)"""
+        files = {}
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file():
+                            st = entry.stat()
+                            files[entry.name] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return dir_path, files, subdirs
+
+    def walk(self, root):
+        """平行掃描目錄樹，返回 {目錄: {檔名: (mtime_ns, size)}}"""
+        listings = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {pool.submit(self._scan_dir, os.path.abspath(root))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dir_path, files, subdirs = future.result()
+                    listings[dir_path] = files
+                    for sub in subdirs:
+                        pending.add(pool.submit(self._scan_dir, sub))
+        return listings
+
+    @staticmethod
+    def resolve_audio(dir_path, files, wave_filename):
+        """以目錄清單解析WAVE音源，不額外呼叫 os.path.exists"""
+        if not wave_filename:
+            return None
+        if os.path.dirname(wave_filename):
+            # WAVE指向子目錄時交給共用快取處理
+            return default_audio_index.find(dir_path, wave_filename)
+        actual = DirectoryListing(dir_path, files).match(wave_filename)
+        return os.path.join(dir_path, actual) if actual else None
+
+    @staticmethod
+    def audio_state(dir_path, files, audio_path):
+        """音源的 (mtime_ns, size)：同目錄的音源取自目錄清單，子目錄的音源另外 stat"""
+        if not audio_path:
+            return None, None
+        if os.path.dirname(audio_path) == dir_path and os.path.basename(audio_path) in files:
+            return files[os.path.basename(audio_path)]
+        try:
+            st = os.stat(audio_path)
+        except OSError:
+            return None, None
+        return st.st_mtime_ns, st.st_size
+
+    def _is_unchanged(self, dir_path, files, name, previous):
+        """譜面與其音源都未變動（音源被修改、新增或移除時也要重新解析）"""
+        if (not previous or (previous['mtime_ns'], previous['size']) != files[name]
+                or previous['referenced'] is None):
+            return False
+        audio_path = self.resolve_audio(dir_path, files, previous['wave'])
+        return (audio_path == previous['audio_path'] and
+                self.audio_state(dir_path, files, audio_path) == (previous['audio_mtime_ns'], previous['audio_size']))
+
+    def _index_chart(self, dir_path, files, name, previous):
+        """解析單一譜面，返回寫入charts表的資料列；掃描後被刪除或無法讀取時返回 None"""
+        path = os.path.join(dir_path, name)
+        mtime_ns, size = files[name]
+        try:
+            encoding = self.detect_encoding(path)
+            headers = parse_tja_headers(path, encoding)
+            # WAVE與段位道場各 #NEXTSONG 引用的音源（批次規劃不必再次解析譜面）
+            referenced = referenced_audio(path, encoding)
+        except (OSError, UnicodeError):
+            return None
+        wave = headers.get('WAVE')
+        audio_path = self.resolve_audio(dir_path, files, wave)
+        audio_mtime_ns, audio_size = self.audio_state(dir_path, files, audio_path)
+
+        # 音源未變動時沿用舊的長度，避免重新探測
+        if (previous and previous['audio_path'] == audio_path and
+                (previous['audio_mtime_ns'], previous['audio_size']) == (audio_mtime_ns, audio_size)):
+            duration = previous['audio_duration']
+        else:
+            duration = probe_audio_duration(audio_path)
+
+        return (path, dir_path, mtime_ns, size, encoding, headers.get('TITLE'),
+                _to_float(headers.get('BPM')), wave, json.dumps(headers, ensure_ascii=False),
+                audio_path, audio_mtime_ns, duration, time.time(), json.dumps(referenced, ensure_ascii=False),
+                audio_size)
+
+    def update(self, root):
+        """更新索引，返回 (重新解析數, 移除數)"""
+        listings = self.walk(root)
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        existing = {row['path']: row for row in self.conn.execute(
+            "SELECT * FROM charts WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+
+        seen = set()
+        to_index = []
+        for dir_path, files in listings.items():
+            for name in files:
+                if not name.lower().endswith('.tja') or parse_variant_name(name):
+                    continue
+                path = os.path.join(dir_path, name)
+                seen.add(path)
+                previous = existing.get(path)
+                if self._is_unchanged(dir_path, files, name, previous):
+                    continue
+                to_index.append((dir_path, files, name, previous))
+
+        # 無法解析的譜面保留原本的資料列（已刪除的譜面在下次更新時移除）
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            rows = [row for row in pool.map(lambda args: self._index_chart(*args), to_index) if row]
+
+        removed = [path for path in existing if path not in seen]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO charts VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self.conn.executemany("DELETE FROM charts WHERE path = ?", [(p,) for p in removed])
+            self.conn.executemany("DELETE FROM variants WHERE chart_path = ?", [(p,) for p in removed])
+            self._update_variants(listings)
+        return len(rows), len(removed)
+
+    def _update_variants(self, listings):
+        """依目錄清單重建變速檔案記錄（只比對 mtime，不解析檔案）"""
+        charts = {row['path']: row for row in self.conn.execute(
+            "SELECT path, mtime_ns, wave, audio_mtime_ns, referenced FROM charts")}
+        for dir_path, files in listings.items():
+            self.conn.execute("DELETE FROM variants WHERE chart_path IN (SELECT path FROM charts WHERE dir = ?)",
+                              (dir_path,))
+            for name, (mtime_ns, _) in files.items():
+                parsed = parse_variant_name(name)
+                if not parsed or not name.lower().endswith('.tja'):
+                    continue
+                base, speed = parsed
+                chart_path = os.path.join(dir_path, base + os.path.splitext(name)[1])
+                chart = charts.get(chart_path)
+                if chart is None:
+                    continue
+                is_current = mtime_ns >= chart['mtime_ns']
+                audio_path = None
+                # 段位道場的每個 #NEXTSONG 音源也必須已產生
+                for wave in json.loads(chart['referenced'] or 'null') or [chart['wave']]:
+                    if not wave:
+                        continue
+                    audio_name = speed_wave_filename(wave, speed)
+                    if audio_name not in files:
+                        is_current = False
+                    elif wave == chart['wave']:
+                        audio_path = os.path.join(dir_path, audio_name)
+                        if chart['audio_mtime_ns'] is not None:
+                            is_current = is_current and files[audio_name][0] >= chart['audio_mtime_ns']
+                self.conn.execute("INSERT OR REPLACE INTO variants VALUES (?,?,?,?,?)",
+                                  (chart_path, speed, os.path.join(dir_path, name), audio_path, int(is_current)))
+
+    # ------------------------------------------------------------------
+    # 查詢
+    # ------------------------------------------------------------------
+    def charts(self, root=None):
+        """列出索引中的譜面"""
+        if root:
+            prefix = os.path.join(os.path.abspath(root), '')
+            return self.conn.execute("SELECT * FROM charts WHERE substr(path, 1, ?) = ? ORDER BY path",
+                                     (len(prefix), prefix)).fetchall()
+        return self.conn.execute("SELECT * FROM charts ORDER BY path").fetchall()
+
+    def get_chart(self, path):
+        return self.conn.execute("SELECT * FROM charts WHERE path = ?", (os.path.abspath(path),)).fetchone()
+
+    def variants(self, chart_path):
+        return self.conn.execute("SELECT * FROM variants WHERE chart_path = ? ORDER BY speed",
+                                 (os.path.abspath(chart_path),)).fetchall()
+
+    def current_speeds(self, chart_path):
+        """此譜面已存在且為最新的變速速度（四捨五入到小數點後兩位，與檔名相同）"""
+        return {round(v['speed'], 2) for v in self.variants(chart_path) if v['is_current']}
+
+    def pending_variants(self, speeds, root=None):
+        """返回需要(重新)產生的 (譜面路徑, 速度) 列表：缺少或已過期"""
+        pending = []
+        for chart in self.charts(root):
+            current = self.current_speeds(chart['path'])
+            for speed in speeds:
+                if round(speed, 2) not in current:
+                    pending.append((chart['path'], speed))
+        return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the SQLite index of a TJA song library')
+    parser.add_argument('root', help='Song library root directory')
+    parser.add_argument('--db', default=default_index_path(), help='SQLite database path (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel scan workers')
+    parser.add_argument('--list', action='store_true', help='List indexed charts after updating')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with LibraryIndex(args.db, workers=args.workers) as index:
+        updated, removed = index.update(args.root)
+        elapsed = time.perf_counter() - start
+        print(f"✓ Indexed {args.root}: {updated} updated, {removed} removed ({elapsed:.2f}s)")
+        if args.list:
+            for chart in index.charts(args.root):
+                duration = f"{chart['audio_duration']:.1f}s" if chart['audio_duration'] else '-'
+                print(f"  {chart['title'] or '?'} | {chart['encoding']} | {chart['audio_path'] or '-'} | {duration}")
+                for variant in index.variants(chart['path']):
+                    state = 'current' if variant['is_current'] else 'stale'
+                    print(f"    - {variant['speed']:.2f}x ({state})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
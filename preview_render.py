@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Preview Render
+試聽片段：從 DEMOSTART 以輸入端快速定位（-ss 置於 -i 之前），只處理一小段，
+輸出WAV並以 (音源雜湊, 速度, 起點, 變速方式) 快取，重複試聽時不需重新處理
+"""
+
+import os
+import sys
+import uuid
+import shutil
+import subprocess
+
+from TJASpeedChanger import build_speed_filter, detect_file_encoding
+from audio_lookup import default_audio_index
+from audio_probe import content_hash, default_cache_dir
+from library_index import parse_tja_headers
+from tja_variants import resolve_source
+
+
+# 試聽片段長度（輸出秒數）
+PREVIEW_SECONDS = 15.0
+
+
+def preview_cache_dir():
+    return os.path.join(default_cache_dir(), 'previews')
+
+
+def build_preview_command(input_path, output_wav, speed, start=0.0, seconds=PREVIEW_SECONDS,
+                          stretch='atempo', ffmpeg='ffmpeg'):
+    """組合試聽片段的FFmpeg指令
+
+    start 為原始音源的秒數（即原始的 DEMOSTART，對應變速後的 DEMOSTART / speed）；
+    輸出 seconds 秒需要讀取 seconds * speed 秒的原始音源
+    """
+    return [
+        ffmpeg, '-v', 'error',
+        '-ss', f'{start:.3f}', '-t', f'{seconds * speed:.3f}', '-i', input_path,
+        # resample 模式不探測取樣率（省下一次FFmpeg啟動），統一重新取樣
+        '-filter:a', build_speed_filter(speed, stretch),
+        '-c:a', 'pcm_s16le', '-y', output_wav,
+    ]
+
+
+class PreviewRenderer:
+    """試聽片段產生器（含快取）"""
+
+    def __init__(self, cache_dir=None, ffmpeg='ffmpeg', seconds=PREVIEW_SECONDS, audio_index=None,
+                 max_entries=64, memo=None):
+        self.cache_dir = cache_dir or preview_cache_dir()
+        # 內容雜湊的記憶（預設為使用者快取資料夾中的記憶）
+        self.memo = memo
+        self.ffmpeg = ffmpeg
+        self.seconds = seconds
+        self.audio_index = audio_index or default_audio_index
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def cache_path(self, input_path, speed, start=0.0, stretch='atempo'):
+        digest = content_hash(input_path, memo=self.memo)
+        name = f'{digest}_{speed:.2f}x_{stretch}_{int(round(start * 1000))}_{self.seconds:g}s.wav'
+        return os.path.join(self.cache_dir, name)
+
+    def render(self, input_path, speed, start=0.0, stretch='atempo'):
+        """產生（或從快取取得）試聽片段，返回WAV路徑"""
+        path = self.cache_path(input_path, speed, start, stretch)
+        if os.path.exists(path):
+            self.hits += 1
+            # 更新時間戳記，清理時保留最近使用的片段
+            os.utime(path)
+            return path
+        self.misses += 1
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先寫入暫存檔再改名，中斷時不會留下不完整的快取
+        temp_path = os.path.join(self.cache_dir, f'.{uuid.uuid4().hex[:8]}.tmp.wav')
+        cmd = build_preview_command(input_path, temp_path, speed, start, self.seconds, stretch, self.ffmpeg)
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            if result.returncode != 0:
+                raise RuntimeError(f"FFmpeg error: {result.stderr.strip()}")
+            if os.path.getsize(temp_path) < 1024:
+                # 幾乎只有WAV標頭：DEMOSTART 超出音源長度
+                raise RuntimeError(f"DEMOSTART {start:.3f}s is past the end of {input_path}")
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        self._prune()
+        return path
+
+    def render_chart(self, tja_path, speed, stretch='atempo'):
+        """從譜面的 DEMOSTART 產生試聽片段；找不到音源時返回 None
+
+        譜面為變速輸出時從原始譜面的音源與 DEMOSTART 以合成後的速度產生
+        """
+        tja_path, speed, _ = resolve_source(tja_path, speed)
+        headers = parse_tja_headers(tja_path, detect_file_encoding(tja_path))
+        input_path = self.audio_index.find(os.path.dirname(tja_path), headers.get('WAVE'))
+        if not input_path:
+            return None
+        try:
+            start = max(float(headers.get('DEMOSTART') or 0.0), 0.0)
+        except ValueError:
+            start = 0.0
+        return self.render(input_path, speed, start, stretch)
+
+    def _prune(self):
+        """只保留最近的 max_entries 個片段"""
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir)
+                       if entry.is_file() and not entry.name.startswith('.')]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[self.max_entries:]:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class PreviewPlayer:
+    """以系統播放器非同步播放WAV（Windows使用 winsound，其他平台使用 afplay/ffplay/paplay/aplay）"""
+
+    def __init__(self):
+        self._process = None
+
+    @staticmethod
+    def _player_command(path):
+        if sys.platform == 'darwin':
+            return ['afplay', path]
+        for cmd in (['ffplay', '-nodisp', '-autoexit', '-loglevel', 'quiet', path],
+                    ['paplay', path], ['aplay', '-q', path]):
+            if shutil.which(cmd[0]):
+                return cmd
+        return None
+
+    def play(self, path):
+        """開始播放，返回是否有可用的播放器"""
+        self.stop()
+        if sys.platform == 'win32':
+            import winsound
+            winsound.PlaySound(path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            return True
+        cmd = self._player_command(path)
+        if not cmd:
+            return False
+        self._process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return True
+
+    def stop(self):
+        if sys.platform == 'win32':
+            import winsound
+            winsound.PlaySound(None, winsound.SND_PURGE)
+        elif self._process and self._process.poll() is None:
+            self._process.terminate()
+        self._process = None
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Profiling
+以 cProfile（可選 tracemalloc）包住一次執行，寫出 .pstats 與文字摘要（最耗時的函式與記憶體配置位置），
+使用者回報「處理很慢」時只需加上 --profile 即可收集資料，不需要開發環境
+"""
+
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from tja_io import write_bytes_atomic
+
+
+# 摘要中列出的函式與配置位置數量
+TOP_N = 30
+# Python 3.12 起 cProfile 改用 sys.monitoring，同時只能有一個分析器（但會涵蓋所有執行緒）
+PER_THREAD = sys.version_info < (3, 12)
+
+# 進行中的 Profiler（執行緒池的工作依此在自己的執行緒啟用分析）
+_active = []
+_active_lock = threading.Lock()
+# 目前執行緒上啟用的 (Profiler, cProfile.Profile)：分析結束後仍留在持續存在的執行緒上的分析器由此辨識並停用
+_thread_state = threading.local()
+
+
+def default_profile_base(prefix='tja_profile'):
+    return os.path.abspath(f"{prefix}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+
+class Profiler:
+    """分析一段程式的 context manager
+
+    with Profiler('run') as profiler: ...  # 結束時寫出 run.pstats 與 run.txt
+    平行處理的工作執行緒也會各自分析，最後合併為同一份統計
+    """
+
+    def __init__(self, base_path=None, memory=False, top=TOP_N):
+        base_path = base_path or default_profile_base()
+        # 使用者給了 xxx.pstats 時去掉副檔名
+        if base_path.endswith('.pstats'):
+            base_path = base_path[:-len('.pstats')]
+        self.base_path = base_path
+        self.memory = memory
+        self.top = top
+        self.pstats_path = base_path + '.pstats'
+        self.summary_path = base_path + '.txt'
+        self.elapsed = None
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+        self._memory_result = None
+        self.running = False
+
+    def _enable_thread_profile(self):
+        """在目前執行緒啟用屬於此 Profiler 的分析器"""
+        profile = cProfile.Profile()
+        with self._lock:
+            self._thread_profiles.append(profile)
+        _thread_state.owner = (self, profile)
+        profile.enable()
+        return profile
+
+    def _thread_hook(self, frame, event, arg):
+        # 新執行緒第一次呼叫時為它建立獨立的分析器
+        sys.setprofile(None)
+        if self.running:
+            self._enable_thread_profile()
+
+    def start(self):
+        if self.memory:
+            tracemalloc.start(10)
+        if PER_THREAD:
+            threading.setprofile(self._thread_hook)
+            with _active_lock:
+                _active.append(self)
+        self.running = True
+        self._started = time.perf_counter()
+        self._profile.enable()
+        return self
+
+    def stop(self):
+        # 其他執行緒的分析器無法從這裡停用：標記為結束，由該執行緒的下一個工作停用（見 task_profile）
+        self.running = False
+        self._profile.disable()
+        self.elapsed = time.perf_counter() - self._started
+        if PER_THREAD:
+            threading.setprofile(None)
+            with _active_lock:
+                _active.remove(self)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            self._memory_result = (current, peak, snapshot)
+        self.write()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def stats(self, stream=None):
+        stats = pstats.Stats(self._profile, stream=stream)
+        with self._lock:
+            profiles = list(self._thread_profiles)
+        for profile in profiles:
+            stats.add(profile)
+        return stats
+
+    def summary(self):
+        """文字摘要：累積時間與自身時間最多的函式，以及記憶體高峰與配置位置"""
+        stream = io.StringIO()
+        stream.write(f'Elapsed: {self.elapsed:.3f}s, threads profiled: {len(self._thread_profiles) + 1}\n\n')
+        stats = self.stats(stream).strip_dirs()
+        stream.write(f'== Top {self.top} by cumulative time ==\n')
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        stream.write(f'== Top {self.top} by own time ==\n')
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+        if self._memory_result:
+            current, peak, snapshot = self._memory_result
+            stream.write(f'== Memory: peak {peak / 1024 / 1024:.1f} MiB, '
+                         f'still allocated {current / 1024 / 1024:.1f} MiB ==\n')
+            # tracemalloc 只能取得結束時仍存在的配置，快取與讀入的內容通常就是高峰的來源
+            stream.write(f'== Top {self.top} allocation sites held at stop ==\n')
+            snapshot = snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ])
+            for statistic in snapshot.statistics('lineno')[:self.top]:
+                stream.write(f'{statistic}\n')
+        return stream.getvalue()
+
+    def write(self):
+        """寫出 .pstats（可用 python -m pstats 或 snakeviz 開啟）與文字摘要"""
+        self.stats().dump_stats(self.pstats_path)
+        write_bytes_atomic(self.summary_path, self.summary().encode('utf-8'))
+        return self.pstats_path, self.summary_path
+
+
+@contextmanager
+def task_profile():
+    """在已存在的工作執行緒中分析一個工作
+
+    Python 3.12 以前 threading.setprofile 只影響之後才啟動的執行緒，
+    持續存在的執行緒池（例如 GUI 的 RenderScheduler）在分析開始前就已啟動，
+    因此每個工作在自己的執行緒啟用分析器，結果併入進行中的 Profiler。
+    前一次分析期間才啟動的執行緒仍留著已結束的分析器，在這裡先停用
+    """
+    with _active_lock:
+        profiler = _active[-1] if _active else None
+    owner, profile = getattr(_thread_state, 'owner', None) or (None, None)
+    if owner is not None and not owner.running:
+        profile.disable()
+        _thread_state.owner = owner = None
+    # 此執行緒已由進行中的 Profiler 分析（分析開始後才啟動的執行緒）時不重複啟用
+    if profiler is None or owner is profiler:
+        yield
+        return
+    if owner is not None:
+        profile.disable()
+    profile = profiler._enable_thread_profile()
+    try:
+        yield
+    finally:
+        profile.disable()
+        _thread_state.owner = None
+
+
+def profile_call(base_path, func, *args, memory=False, **kwargs):
+    """分析單次呼叫，返回 (函式結果, Profiler)"""
+    with Profiler(base_path, memory=memory) as profiler:
+        result = func(*args, **kwargs)
+    return result, profiler
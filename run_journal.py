@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Run Journal
+批次處理的只附加日誌：每個工作開始與完成各寫一行JSON並 fsync，
+程序中斷後可以 --resume 略過已完成且輸出完整的工作，未完成的工作會重新處理
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from audio_probe import content_hash
+
+
+def input_fingerprint(paths, memo=None):
+    """輸入檔案（譜面與音源）的內容指紋；檔案不存在時以 'missing' 代替
+
+    memo 為內容雜湊的記憶（預設為使用者快取資料夾中的記憶）
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for path in paths:
+        try:
+            value = content_hash(path, memo=memo)
+        except OSError:
+            value = 'missing'
+        digest.update(f'{os.path.abspath(path)}={value};'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def job_key(chart, speed, profile, stretch='atempo', inputs=None, memo=None):
+    """工作識別鍵（預設的 atempo 變速方式不加入鍵中）
+
+    inputs 為來源檔案（譜面與其音源）時加入內容指紋：來源被修改後 --resume 會重新處理
+    """
+    key = f'{os.path.abspath(chart)}|{speed:.2f}|{profile}'
+    if stretch != 'atempo':
+        key = f'{key}|{stretch}'
+    return f'{key}|{input_fingerprint(inputs, memo)}' if inputs else key
+
+
+def describe_output(path, memo=None):
+    """記錄輸出檔案的大小與內容雜湊"""
+    return {'path': os.path.abspath(path), 'size': os.path.getsize(path), 'hash': content_hash(path, memo=memo)}
+
+
+def output_intact(output, memo=None):
+    """檢查輸出檔案是否仍存在且內容與紀錄相同"""
+    path = output['path']
+    try:
+        if os.path.getsize(path) != output['size']:
+            return False
+        return content_hash(path, memo=memo) == output['hash']
+    except OSError:
+        return False
+
+
+class RunJournal:
+    """只附加的工作日誌（JSON Lines）；memo 為檢查輸出時使用的內容雜湊記憶"""
+
+    def __init__(self, path, resume=False, memo=None):
+        self.path = path
+        self.memo = memo
+        self.completed = {}
+        self.started = set()
+        if resume:
+            self._load()
+        # 非續傳時從新的日誌開始
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        self._lock = threading.Lock()
+        if resume and self._file.tell() > 0 and not self._ends_with_newline():
+            # 上次中斷在一行的中間，先換行避免與新紀錄黏在一起
+            self._file.write('\n')
+            self._file.flush()
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 中斷時寫到一半的最後一行
+                        continue
+                    key = entry.get('key')
+                    if entry.get('event') == 'start':
+                        self.started.add(key)
+                        self.completed.pop(key, None)
+                    elif entry.get('event') == 'done':
+                        self.started.discard(key)
+                        self.completed[key] = entry
+        except OSError:
+            pass
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def is_complete(self, key):
+        """已完成且所有輸出仍完整"""
+        entry = self.completed.get(key)
+        return bool(entry) and all(output_intact(output, self.memo) for output in entry['outputs'])
+
+    def was_interrupted(self, key):
+        """上次執行時已開始但未完成"""
+        return key in self.started
+
+    def start(self, key):
+        self._append({'event': 'start', 'key': key, 'time': time.time()})
+
+    def done(self, key, output_paths):
+        outputs = [describe_output(path, self.memo) for path in output_paths if path]
+        entry = {'event': 'done', 'key': key, 'time': time.time(), 'outputs': outputs}
+        self._append(entry)
+        self.completed[key] = entry
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Segment Render
+單一長音源的分段平行處理：在低能量處切成N段（段與段之間重疊），
+各段以獨立的FFmpeg程序平行變速，最後以短交叉淡化接合並只編碼一次
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+
+from TJASpeedChanger import AUDIO_PROFILES, build_speed_filter
+from audio_probe import probe_audio
+from job_scheduler import default_ffmpeg_limit
+from run_report import stage
+
+
+# 每段最短長度（秒），太短的音源不值得分段
+MIN_SEGMENT_SECONDS = 20.0
+# 能量分析的視窗長度（秒）
+ENERGY_WINDOW_SECONDS = 0.05
+ENERGY_SAMPLE_RATE = 8000
+
+
+class SegmentRenderError(Exception):
+    """分段處理失敗"""
+
+
+def _run_ffmpeg(cmd, scheduler=None, timer=None, name='encode'):
+    """執行FFmpeg；timer 只記錄程序本身的時間（不含等待執行名額）"""
+    with (scheduler.ffmpeg_slot() if scheduler else nullcontext()):
+        with stage(timer, name):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SegmentRenderError(result.stderr.strip())
+    return result
+
+
+def analyze_energy(input_path, ffmpeg='ffmpeg', timer=None):
+    """以FFmpeg的astats計算每個視窗的RMS（dB），返回 [(時間, RMS)]"""
+    window = int(ENERGY_SAMPLE_RATE * ENERGY_WINDOW_SECONDS)
+    cmd = [
+        ffmpeg, '-v', 'error', '-i', input_path, '-af',
+        f'aresample={ENERGY_SAMPLE_RATE},asetnsamples=n={window}:p=0,'
+        'astats=metadata=1:reset=1,ametadata=print:key=lavfi.astats.Overall.RMS_level:file=-',
+        '-f', 'null', '-'
+    ]
+    result = _run_ffmpeg(cmd, timer=timer, name='probe')
+    energy = []
+    current_time = None
+    for line in result.stdout.splitlines():
+        if line.startswith('frame:'):
+            for part in line.split():
+                if part.startswith('pts_time:'):
+                    current_time = float(part.split(':', 1)[1])
+        elif line.startswith('lavfi.astats.Overall.RMS_level=') and current_time is not None:
+            value = line.split('=', 1)[1]
+            energy.append((current_time, float('-inf') if value in ('-inf', 'nan') else float(value)))
+    return energy
+
+
+def choose_cut_points(duration, segments, energy, search_seconds=5.0):
+    """在每個等分點附近尋找能量最低的位置作為切點，返回包含0與總長的切點列表"""
+    cuts = [0.0]
+    for i in range(1, segments):
+        target = duration * i / segments
+        candidates = [(rms, t) for t, rms in energy
+                      if abs(t - target) <= search_seconds and t > cuts[-1] + 1.0]
+        cuts.append(min(candidates)[1] if candidates else target)
+    cuts.append(duration)
+    return cuts
+
+
+def build_crossfade_graph(count, crossfade):
+    """組合將 count 個輸入依序交叉淡化的 filter_complex"""
+    if count == 1:
+        return '[0:a]anull[out]'
+    parts = []
+    previous = '[0:a]'
+    for i in range(1, count):
+        label = '[out]' if i == count - 1 else f'[x{i}]'
+        parts.append(f'{previous}[{i}:a]acrossfade=d={crossfade:.6f}:c1=tri:c2=tri{label}')
+        previous = label
+    return ';'.join(parts)
+
+
+def render_segmented(input_path, output_path, speed, segments=None, profile='default',
+                     overlap=0.5, ffmpeg='ffmpeg', scheduler=None, stretch='atempo', timer=None):
+    """分段平行變速並編碼為OGG，返回實際輸出路徑
+
+    timer 為 run_report.StageTimer 時，探測與能量分析計入 probe，各FFmpeg程序計入 encode
+    （平行的分段各自計時後加總，等待執行名額的時間不計入）
+    """
+    output_path_ogg = os.path.splitext(output_path)[0] + '.ogg'
+    with stage(timer, 'probe'):
+        info = probe_audio(input_path, ffmpeg) or {}
+    duration = info.get('duration')
+    if not duration:
+        raise SegmentRenderError(f'cannot determine duration: {input_path}')
+    speed_filter = build_speed_filter(speed, stretch, info.get('sample_rate'))
+
+    segments = segments or default_ffmpeg_limit()
+    segments = max(1, min(segments, int(duration // MIN_SEGMENT_SECONDS)))
+    if segments == 1:
+        # 太短不分段，直接單一程序處理
+        _run_ffmpeg([ffmpeg, '-i', input_path, '-filter:a', speed_filter,
+                     *AUDIO_PROFILES[profile], '-y', output_path_ogg], scheduler, timer)
+        return output_path_ogg
+
+    cuts = choose_cut_points(duration, segments, analyze_energy(input_path, ffmpeg, timer))
+    work_dir = tempfile.mkdtemp(prefix='tja_segments_')
+    try:
+        def render_segment(index):
+            start = cuts[index]
+            # 除了最後一段，每段向後延伸 overlap 秒作為交叉淡化區
+            end = cuts[index + 1] + (overlap if index < segments - 1 else 0.0)
+            segment_path = os.path.join(work_dir, f'segment_{index:03d}.wav')
+            _run_ffmpeg([ffmpeg, '-v', 'error', '-ss', f'{start:.6f}', '-t', f'{end - start:.6f}',
+                         '-i', input_path, '-filter:a', speed_filter,
+                         '-c:a', 'pcm_f32le', '-y', segment_path], scheduler, timer)
+            return segment_path
+
+        with ThreadPoolExecutor(max_workers=segments) as pool:
+            segment_paths = list(pool.map(render_segment, range(segments)))
+
+        cmd = [ffmpeg, '-v', 'error']
+        for segment_path in segment_paths:
+            cmd += ['-i', segment_path]
+        cmd += ['-filter_complex', build_crossfade_graph(segments, overlap / speed),
+                '-map', '[out]', *AUDIO_PROFILES[profile], '-y', output_path_ogg]
+        _run_ffmpeg(cmd, scheduler, timer)
+        return output_path_ogg
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
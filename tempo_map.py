@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Tempo Map
+將譜面的音符、#BPMCHANGE、#MEASURE、#DELAY、#SCROLL 轉為NumPy陣列，
+以累積和計算每個音符與小節的時間，並一次以廣播計算整個速度列表的長度與音符密度。
+譜面的解析（parse_courses）不需要NumPy，chart_preview 也使用同一個解析結果
+
+用法: python tempo_map.py <譜面或資料夾> [--speeds 0.5,0.6,...] [--max-nps 12]
+"""
+
+import os
+import sys
+import argparse
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+from TJASpeedChanger import detect_file_encoding, parse_speed_list
+
+
+# 需要敲擊的音符與大音符
+HIT_NOTES = '1234AB'
+BIG_NOTES = '34B'
+NOTE_CHARS = frozenset('0123456789ABCDEFG')
+# 計算音符密度的視窗長度（秒）
+DENSITY_WINDOW = 1.0
+# 預設的速度列表 0.50x ~ 2.00x
+DEFAULT_LADDER = [round(0.5 + 0.05 * i, 2) for i in range(31)]
+
+
+def _float(value, default=0.0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def require_numpy():
+    if not HAS_NUMPY:
+        raise ImportError('tempo_map requires NumPy (pip install numpy)')
+
+
+class CourseMap:
+    """一個難度的時間軸
+
+    每個「格」是小節中的一個字元（空小節為一格），以陣列保存：
+    slot_seconds 該格在1x速度的秒數、delays 該格之前的 #DELAY、bpms 與 scrolls 該格的狀態、
+    codes 字元。音符時間 = 累積秒數 / 速度 + 累積延遲 * 速度（與改寫規則相同）
+    """
+
+    def __init__(self, name, level, slots, player=None):
+        slot_seconds, delays, bpms, scrolls, codes, measure_slots = slots
+        slot_seconds = np.array(slot_seconds)
+        delays = np.array(delays)
+        codes = np.array(codes, dtype=np.uint8)
+        self.name = name
+        self.level = level
+        self.player = player
+        self.bpms = np.array(bpms)
+        self.scrolls = np.array(scrolls)
+        self.codes = codes
+        # 排除目前這一格的累積和 = 該格開始的時間
+        ends = np.cumsum(slot_seconds)
+        self.slot_starts = ends - slot_seconds
+        self.slot_delays = np.cumsum(delays)
+        self.length_beats = float(ends[-1]) if len(ends) else 0.0
+        self.length_delay = float(self.slot_delays[-1]) if len(ends) else 0.0
+        self.measure_slots = np.array(measure_slots, dtype=np.int64)
+        self.hit_mask = np.isin(codes, np.frombuffer(HIT_NOTES.encode(), dtype=np.uint8))
+        self.big_mask = np.isin(codes, np.frombuffer(BIG_NOTES.encode(), dtype=np.uint8))
+
+    @property
+    def key(self):
+        """(難度, 玩家)：雙人譜面的 #START P1 與 #START P2 分開計算"""
+        return self.name, self.player
+
+    @property
+    def notes(self):
+        return int(self.hit_mask.sum())
+
+    def note_times(self, speeds=1.0):
+        """返回 (速度數, 音符數) 的音符時間矩陣（speeds 可為單一數值）"""
+        speeds = np.atleast_1d(np.asarray(speeds, dtype=float))[:, None]
+        return self.slot_starts[self.hit_mask] / speeds + self.slot_delays[self.hit_mask] * speeds
+
+    def measure_times(self, speed=1.0):
+        """每個小節開始的時間"""
+        return self.slot_starts[self.measure_slots] / speed + self.slot_delays[self.measure_slots] * speed
+
+    def lengths(self, speeds):
+        speeds = np.asarray(speeds, dtype=float)
+        return self.length_beats / speeds + self.length_delay * speeds
+
+    def nps_curve(self, speed=1.0, window=DENSITY_WINDOW):
+        """每 window 秒的音符數（每秒音符數曲線）"""
+        times = self.note_times(speed)[0]
+        if not len(times):
+            return np.zeros(0)
+        bins = np.floor(np.maximum(times, 0.0) / window).astype(np.int64)
+        return np.bincount(bins) / window
+
+    def peak_density(self, speeds, window=DENSITY_WINDOW):
+        """任意 window 秒內的最多音符數（每秒），對每個速度各算一次"""
+        return peak_density(self.note_times(speeds), window)
+
+    def indicators(self, speed=1.0):
+        """難度指標：音符數、長度、平均與最高密度、BPM 與視覺速度（BPM×SCROLL）範圍、大音符比例"""
+        notes = self.notes
+        length = float(self.lengths(speed))
+        visual = self.bpms * np.abs(self.scrolls)
+        return {
+            'notes': notes,
+            'length': length,
+            'average_nps': notes / length if length else 0.0,
+            'peak_nps': float(self.peak_density(speed)[0]),
+            'bpm_range': (float(self.bpms.min()) * speed, float(self.bpms.max()) * speed),
+            'max_visual_speed': float(visual.max()) * speed,
+            'big_ratio': float(self.big_mask.sum()) / notes if notes else 0.0,
+        }
+
+
+def peak_density(times, window=DENSITY_WINDOW):
+    """times 為 (速度數, 音符數) 已排序的矩陣，返回每個速度的最高每秒音符數
+
+    將每一列平移到互不重疊的區間後攤平，只需一次 searchsorted 即可處理所有速度
+    """
+    times = np.atleast_2d(times)
+    rows, count = times.shape
+    if count == 0:
+        return np.zeros(rows)
+    span = float(times.max() - times.min()) + window * 2
+    flat = (times - times.min() + np.arange(rows)[:, None] * span).ravel()
+    # 延遲為負時時間可能倒退，排序後再計算
+    flat.sort()
+    ends = np.searchsorted(flat, flat + window, side='left')
+    counts = (ends - np.arange(flat.size)).reshape(rows, count)
+    return counts.max(axis=1) / window
+
+
+def _walk_course(lines, bpm):
+    """依TJA規則走過 #START 到 #END 之間的內容（只計算達人分歧 #M），
+    返回 (slot_seconds, delays, bpms, scrolls, codes, measure_slots) 六個列表
+    """
+    slot_seconds, delays, bpms, scrolls, codes, measure_slots = [], [], [], [], [], []
+    measure = 1.0        # 小節長度（以全音符為單位：#MEASURE 4/4 = 1.0）
+    next_measure = None
+    scroll = 1.0
+    pending_delay = 0.0
+    branch = None
+    measure_chars = []   # 目前小節的 (字元, bpm, scroll, 之前的延遲)
+
+    def flush_measure():
+        nonlocal measure, next_measure
+        measure_slots.append(len(codes))
+        if not measure_chars:
+            measure_chars.append((ord('0'), bpm, scroll, 0.0))
+        step = measure * 4.0 / len(measure_chars)
+        for code, slot_bpm, slot_scroll, delay in measure_chars:
+            slot_seconds.append(step * 60.0 / slot_bpm)
+            delays.append(delay)
+            bpms.append(slot_bpm)
+            scrolls.append(slot_scroll)
+            codes.append(code)
+        measure_chars.clear()
+        if next_measure is not None:
+            measure, next_measure = next_measure, None
+
+    def take_delay():
+        nonlocal pending_delay
+        delay, pending_delay = pending_delay, 0.0
+        return delay
+
+    for raw in lines:
+        line = raw.split('//', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            command, _, arg = line.partition(' ')
+            command = command.upper()
+            if command in ('#N', '#E', '#M'):
+                branch = command
+            elif command in ('#BRANCHSTART', '#BRANCHEND'):
+                branch = None
+            elif branch in ('#N', '#E'):
+                continue
+            elif command == '#BPMCHANGE':
+                value = _float(arg)
+                if value > 0:
+                    bpm = value
+            elif command == '#SCROLL':
+                scroll = _float(arg, 1.0)
+            elif command == '#DELAY':
+                pending_delay += _float(arg)
+            elif command == '#MEASURE' and '/' in arg:
+                num, den = (_float(part) for part in arg.split('/', 1))
+                if num > 0 and den > 0:
+                    # 拍號在下一個小節生效
+                    if measure_chars:
+                        next_measure = num / den
+                    else:
+                        measure = num / den
+            elif command == '#END':
+                break
+            continue
+        if branch in ('#N', '#E'):
+            continue
+        for char in line:
+            if char in NOTE_CHARS:
+                measure_chars.append((ord(char), bpm, scroll, take_delay()))
+            elif char == ',':
+                if not measure_chars and pending_delay:
+                    measure_chars.append((ord('0'), bpm, scroll, take_delay()))
+                flush_measure()
+    # 結尾剩下的延遲也計入長度
+    slot_seconds.append(0.0)
+    delays.append(take_delay())
+    bpms.append(bpm)
+    scrolls.append(scroll)
+    codes.append(ord('0'))
+    return slot_seconds, delays, bpms, scrolls, codes, measure_slots
+
+
+class TempoMap:
+    """整個譜面的時間軸"""
+
+    def __init__(self, headers, courses):
+        self.headers = headers
+        self.courses = courses
+
+    @property
+    def bpm(self):
+        return _float(self.headers.get('BPM'), 120.0)
+
+    @property
+    def offset(self):
+        return _float(self.headers.get('OFFSET'))
+
+    def evaluate(self, speeds, window=DENSITY_WINDOW):
+        """一次計算整個速度列表，返回每個速度的長度與各難度的最高密度
+
+        {'speeds': (S,), 'length': (S,), 'bpm': (S,), 'peak_nps': {(難度, 玩家): (S,)}}
+        """
+        require_numpy()
+        speeds = np.asarray(speeds, dtype=float)
+        lengths = [course.lengths(speeds) for course in self.courses]
+        return {
+            'speeds': speeds,
+            'length': np.max(lengths, axis=0) if lengths else np.zeros_like(speeds),
+            'bpm': self.bpm * speeds,
+            'peak_nps': {course.key: course.peak_density(speeds, window) for course in self.courses},
+        }
+
+    def suggest_speed(self, speeds, max_nps, course=None):
+        """最高密度不超過 max_nps 的最快速度（全部超過時返回 None）
+
+        course 可為難度名稱（包含所有玩家）或 (難度, 玩家)
+        """
+        ladder = self.evaluate(speeds)
+        keys = [key for key in ladder['peak_nps'] if course is None or course in (key, key[0])]
+        if not keys:
+            return None
+        worst = np.max([ladder['peak_nps'][key] for key in keys], axis=0)
+        allowed = ladder['speeds'][worst <= max_nps]
+        return float(allowed.max()) if allowed.size else None
+
+
+def parse_courses(lines):
+    """解析TJA內容（不需要NumPy），返回 (標頭, [(難度, 等級, 玩家, 格資料)])
+
+    難度的標頭（COURSE、LEVEL 等）在 #END 之後出現新的標頭時重設，
+    沒有寫 LEVEL 的難度不會沿用上一個難度的等級；
+    同一難度的 #START P1 / #START P2 之間沒有標頭，沿用相同的難度與等級
+    """
+    headers = {}
+    courses = []
+    course_headers = {}
+    block = None
+    player = None
+    ended = False
+    for raw in lines:
+        line = raw.split('//', 1)[0].strip()
+        if block is not None:
+            block.append(line)
+            if line.upper().startswith('#END'):
+                name = course_headers.get('COURSE', str(len(courses)))
+                bpm = _float(course_headers.get('BPM', headers.get('BPM')), 120.0)
+                courses.append((name, course_headers.get('LEVEL'), player, _walk_course(block, bpm)))
+                block = None
+                ended = True
+            continue
+        if line.upper().startswith('#START'):
+            block = []
+            player = line[len('#START'):].strip().upper() or None
+        elif ':' in line and not line.startswith('#'):
+            key, value = line.split(':', 1)
+            key = key.strip().upper()
+            if ended:
+                course_headers = {}
+                ended = False
+            if key in ('COURSE', 'LEVEL') or courses or course_headers:
+                course_headers[key] = value.strip()
+            if key not in ('COURSE', 'LEVEL'):
+                headers.setdefault(key, value.strip())
+    return headers, courses
+
+
+def parse_tempo_map(lines):
+    """解析TJA內容為 TempoMap"""
+    require_numpy()
+    headers, courses = parse_courses(lines)
+    return TempoMap(headers, [CourseMap(name, level, slots, player) for name, level, player, slots in courses])
+
+
+def load_tempo_map(tja_path):
+    with open(tja_path, 'r', encoding=detect_file_encoding(tja_path), errors='replace') as f:
+        return parse_tempo_map(f.readlines())
+
+
+def main():
+    from batch_runner import find_charts
+    from library_index import LibraryIndex, default_index_path
+
+    parser = argparse.ArgumentParser(description='Chart statistics and practice speed suggestions')
+    parser.add_argument('path', help='TJA file or folder')
+    parser.add_argument('--speeds', type=parse_speed_list, default=DEFAULT_LADDER)
+    parser.add_argument('--max-nps', type=float, help='suggest the fastest speed whose peak density stays below this')
+    args = parser.parse_args()
+
+    require_numpy()
+    if os.path.isdir(args.path):
+        # 譜面清單由歌曲庫索引查詢（只重新解析有變動的譜面）
+        with LibraryIndex(default_index_path()) as index:
+            charts = find_charts(args.path, index)
+    else:
+        charts = [args.path]
+    for chart in charts:
+        tempo_map = load_tempo_map(chart)
+        print(os.path.relpath(chart, args.path) if os.path.isdir(args.path) else chart)
+        for course in tempo_map.courses:
+            stats = course.indicators()
+            level = f' ★{course.level}' if course.level else ''
+            player = f' {course.player}' if course.player else ''
+            print(f"  {course.name}{player}{level}: {stats['notes']} notes, {stats['length']:.1f}s, "
+                  f"avg {stats['average_nps']:.1f}/s, peak {stats['peak_nps']:.1f}/s, "
+                  f"BPM {stats['bpm_range'][0]:g}-{stats['bpm_range'][1]:g}, big {stats['big_ratio']:.0%}")
+        if args.max_nps:
+            speed = tempo_map.suggest_speed(args.speeds, args.max_nps)
+            print(f"  suggested speed: {speed:.2f}x" if speed else '  suggested speed: none')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
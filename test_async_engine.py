@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+測試 asyncio 處理介面
+"""
+
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+import subprocess
+from pathlib import Path
+
+from async_engine import (AsyncProcessor, FFmpegError, adjust_audio_speed_async, parse_progress_line,
+                          process_files_async)
+
+
+def create_charts(song_dir, count, wave=None):
+    charts = []
+    for i in range(count):
+        tja = Path(song_dir, f'song{i}.tja')
+        wave_line = f"WAVE:{wave}\n" if wave else ""
+        tja.write_text(f"TITLE:Song {i}\nBPM:120\n{wave_line}OFFSET:-1.0\n\n#START\n1010,\n#END\n",
+                       encoding='utf-8')
+        charts.append(str(tja))
+    return charts
+
+
+def test_parse_progress_line():
+    assert parse_progress_line('out_time_us=1500000\n') == ('out_time_us', '1500000')
+    assert parse_progress_line('progress=end') == ('progress', 'end')
+    assert parse_progress_line('garbage') is None
+
+
+def test_iter_results():
+    """測試多個工作並行處理並依完成順序產生結果"""
+    print("測試非同步批次處理...")
+    with tempfile.TemporaryDirectory() as song_dir:
+        charts = create_charts(song_dir, 4)
+        jobs = [(chart, speed) for chart in charts for speed in (0.9, 1.1)]
+
+        async def run():
+            processor = AsyncProcessor(concurrency=3)
+            return [item async for item in processor.iter_results(jobs)]
+
+        results = asyncio.run(run())
+        assert len(results) == len(jobs)
+        for job, result in results:
+            assert not isinstance(result, Exception), result
+            new_tja_path, new_audio_path = result
+            assert Path(new_tja_path).exists() and new_audio_path is None
+        print(f"✓ {len(results)} 個工作完成")
+
+
+def test_audio_progress():
+    """有FFmpeg時測試音源處理與進度串流"""
+    if not shutil.which('ffmpeg'):
+        print("略過音源測試（找不到FFmpeg）")
+        return
+    print("測試非同步音源處理...")
+    with tempfile.TemporaryDirectory() as song_dir:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=3',
+                        str(Path(song_dir, 'tone.wav'))], check=True)
+        charts = create_charts(song_dir, 1, wave='tone.wav')
+        updates = []
+
+        async def run():
+            processor = AsyncProcessor(concurrency=2)
+            return await processor.process_many([(charts[0], 1.5, 'draft')],
+                                                lambda job, seconds, fraction: updates.append(fraction))
+
+        [(job, result)] = asyncio.run(run())
+        assert not isinstance(result, Exception), result
+        assert Path(result[1]).exists()
+        assert updates and updates[-1] == 1.0
+        print(f"✓ 音源處理完成，共 {len(updates)} 次進度回報")
+
+
+def running_ffmpeg(output_path):
+    """仍在執行且輸出為 output_path 的FFmpeg程序（只在Linux以 /proc 檢查）"""
+    pids = []
+    for pid in os.listdir('/proc'):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                if output_path.encode() in f.read():
+                    pids.append(pid)
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+def test_cancel_kills_ffmpeg():
+    """工作被取消時結束FFmpeg並刪除不完整的輸出"""
+    if not shutil.which('ffmpeg') or not sys.platform.startswith('linux'):
+        print("略過取消測試（找不到FFmpeg或非Linux）")
+        return
+    with tempfile.TemporaryDirectory() as song_dir:
+        source = str(Path(song_dir, 'long.wav'))
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=600', source], check=True)
+        output = str(Path(song_dir, 'long_0.90x.ogg'))
+
+        async def run():
+            task = asyncio.create_task(adjust_audio_speed_async(source, output, 0.9, 'high'))
+            while not os.path.exists(output):
+                await asyncio.sleep(0.02)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return True
+            return False
+
+        assert asyncio.run(run())
+        assert not os.path.exists(output)
+        assert running_ffmpeg(output) == []
+        print("✓ 取消時FFmpeg已結束且沒有留下不完整的輸出")
+
+
+def test_failed_ffmpeg_removes_output():
+    """FFmpeg以非零代碼結束時刪除寫到一半的輸出"""
+    with tempfile.TemporaryDirectory() as song_dir:
+        # 寫出部分輸出後失敗的FFmpeg
+        fake = Path(song_dir, 'fake_ffmpeg.py')
+        fake.write_text(f"#!{sys.executable}\nimport sys\nopen(sys.argv[-1], 'wb').write(b'OggS')\n"
+                        "sys.stderr.write('boom')\nsys.exit(1)\n", encoding='utf-8')
+        fake.chmod(0o755)
+        source = Path(song_dir, 'song.wav')
+        source.write_bytes(b'RIFF')
+        output = str(Path(song_dir, 'song_0.90x.ogg'))
+        try:
+            asyncio.run(adjust_audio_speed_async(str(source), output, 0.9, ffmpeg=str(fake)))
+        except FFmpegError as e:
+            assert 'boom' in str(e)
+        else:
+            raise AssertionError('FFmpegError expected')
+        assert not os.path.exists(output)
+        print("✓ FFmpeg失敗時沒有留下不完整的輸出")
+
+
+def test_failure_cancels_siblings():
+    """段位道場其中一個音源失敗時，其餘仍在執行的FFmpeg被結束並刪除輸出"""
+    if not shutil.which('ffmpeg') or not sys.platform.startswith('linux'):
+        print("略過失敗取消測試（找不到FFmpeg或非Linux）")
+        return
+    with tempfile.TemporaryDirectory() as song_dir:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=600',
+                        str(Path(song_dir, 'long.wav'))], check=True)
+        Path(song_dir, 'bad.ogg').write_bytes(b'not audio')
+        chart = Path(song_dir, 'dan.tja')
+        chart.write_text("TITLE:Dan\nBPM:120\nWAVE:long.wav\n\n#START\n#NEXTSONG Bad,,,bad.ogg,0,0\n#END\n",
+                         encoding='utf-8')
+        output = str(Path(song_dir, 'long_0.90x.ogg'))
+
+        async def run():
+            try:
+                await process_files_async(str(chart), 0.9, 'high')
+            except FFmpegError:
+                pass
+            else:
+                raise AssertionError('FFmpegError expected')
+            # 事件迴圈仍在執行時檢查（asyncio.run 結束時本來就會取消剩下的工作）
+            return os.path.exists(output), running_ffmpeg(output)
+
+        assert asyncio.run(run()) == (False, [])
+        print("✓ 其中一個音源失敗時其餘的FFmpeg已結束")
+
+
+if __name__ == '__main__':
+    test_parse_progress_line()
+    test_iter_results()
+    test_audio_progress()
+    test_cancel_kills_ffmpeg()
+    test_failed_ffmpeg_removes_output()
+    test_failure_cancels_siblings()
+    print("\n測試完成!")
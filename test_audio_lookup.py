@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+測試音源目錄清單快取
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+from audio_lookup import AudioDirectoryIndex
+
+
+def test_audio_lookup():
+    """測試大小寫不敏感查詢、副檔名優先順序與快取重用"""
+    print("測試音源目錄清單快取...")
+    with tempfile.TemporaryDirectory() as song_dir:
+        for name in ['Song.OGG', 'song.flac', 'other.mp3']:
+            Path(song_dir, name).write_bytes(b'\0')
+
+        index = AudioDirectoryIndex()
+
+        # 精確比對
+        assert index.find(song_dir, 'other.mp3') == os.path.join(song_dir, 'other.mp3')
+        # 大小寫不同也能找到
+        assert index.find(song_dir, 'song.ogg') == os.path.join(song_dir, 'Song.OGG')
+        print("✓ 不分大小寫比對")
+
+        # WAVE指定的副檔名不存在時依優先順序尋找
+        assert index.find(song_dir, 'song.wav') == os.path.join(song_dir, 'Song.OGG')
+        flac_first = AudioDirectoryIndex(extensions=['.flac', '.ogg'])
+        assert flac_first.find(song_dir, 'song.wav') == os.path.join(song_dir, 'song.flac')
+        print("✓ 副檔名優先順序")
+
+        assert index.find(song_dir, 'missing.ogg') is None
+        assert index.find(song_dir, None) is None
+
+        # 同一目錄只掃描一次
+        stats = index.stats()
+        assert stats['misses'] == 1 and stats['directories'] == 1, stats
+        print(f"✓ 目錄清單重用: {stats}")
+
+        # 目錄變動後重新列出
+        Path(song_dir, 'new.wav').write_bytes(b'\0')
+        os.utime(song_dir, ns=(0, 0))
+        assert index.find(song_dir, 'new.wav') == os.path.join(song_dir, 'new.wav')
+        print("✓ 目錄變動後重新建立清單")
+
+
+if __name__ == '__main__':
+    test_audio_lookup()
+    print("\n測試完成!")
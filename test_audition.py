@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+測試即時試聽的PCM快取與變速
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from audio_probe import ContentHashMemo
+from audition import AuditionSession, DecodedClipCache, BYTES_PER_SECOND
+
+
+class SilentPlayer:
+    """測試用播放器：只記錄播放的檔案"""
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, path):
+        self.played.append(path)
+        return True
+
+    def stop(self):
+        pass
+
+
+def wav_seconds(path):
+    # WAV標頭（含FFmpeg的LIST區塊）遠小於一秒的資料量
+    return os.path.getsize(path) / BYTES_PER_SECOND
+
+
+def test_audition_session():
+    """有FFmpeg時測試只解碼一次、各速度輸出長度相同"""
+    if not shutil.which('ffmpeg'):
+        print("略過即時試聽測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=40', '-ac', '2',
+                        os.path.join(tmp, 'song.ogg')], check=True)
+        chart = Path(tmp, 'song.tja')
+        chart.write_text("TITLE:Song\nWAVE:song.ogg\nDEMOSTART:10\n\n#START\n1,\n#END\n", encoding='utf-8')
+
+        player = SilentPlayer()
+        cache = DecodedClipCache(memo=ContentHashMemo(os.path.join(tmp, 'content_hash.json')))
+        session = AuditionSession(seconds=3.0, player=player, cache=cache)
+        assert session.load_chart(str(chart))
+        for speed in [0.8, 1.0, 1.25, 1.5, 2.0]:
+            path = session.play(speed)
+            assert abs(wav_seconds(path) - 3.0) < 0.05, (speed, wav_seconds(path))
+        # 2x 以內的速度只需要解碼一次
+        assert session.cache.stats()['misses'] == 1
+        # 同一速度直接使用已變速的結果
+        assert session.play(1.25) == player.played[2]
+
+        # 需要更長的片段時重新解碼；超過音源結尾時返回剩餘部分
+        path = session.play(8.0)
+        assert session.cache.stats()['misses'] == 2
+        assert 3.0 < wav_seconds(path) + 0.05
+        session.load(session.input_path, 38.0)
+        assert wav_seconds(session.render(1.0)) < 2.1
+        session.close()
+        assert session._work_dir is None
+        print("✓ 只解碼一次，滑桿移動時只重新變速")
+
+
+def test_audition_variant_chart():
+    """變速輸出的譜面沿用原始音源已解碼的片段，速度再乘上該譜面的速度"""
+    if not shutil.which('ffmpeg'):
+        print("略過變速譜面試聽測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=20', '-ac', '2',
+                        os.path.join(tmp, 'song.ogg')], check=True)
+        Path(tmp, 'song.tja').write_text("TITLE:Song\nWAVE:song.ogg\nDEMOSTART:10\n\n#START\n1,\n#END\n",
+                                         encoding='utf-8')
+        # 變速輸出引用的音源尚未產生
+        variant = Path(tmp, 'song_1.25x.tja')
+        variant.write_text("TITLE:Song (1.25x)\nWAVE:song_1.25x.ogg\nDEMOSTART:8\n\n#START\n1,\n#END\n",
+                           encoding='utf-8')
+
+        cache = DecodedClipCache(memo=ContentHashMemo(os.path.join(tmp, 'content_hash.json')))
+        session = AuditionSession(seconds=2.0, player=SilentPlayer(), cache=cache)
+        assert session.load_chart(os.path.join(tmp, 'song.tja'))
+        session.render(1.25)
+        assert session.load_chart(str(variant))
+        assert (session.input_path, session.start, session.speed_scale) == (os.path.join(tmp, 'song.ogg'), 10.0, 1.25)
+        assert session.render(1.0).endswith('audition_1.25x_atempo.wav')
+        assert session.cache.stats()['misses'] == 1
+        session.close()
+        print("✓ 變速譜面使用原始音源試聽")
+
+
+if __name__ == '__main__':
+    test_audition_session()
+    test_audition_variant_chart()
+    print("\n測試完成!")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+測試音源探測快取、耗時模型與批次排程
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from audio_probe import AudioProbeCache, ContentHashMemo, CostModel, content_hash
+from batch_runner import BatchJob, BatchRunner, find_charts
+from library_index import LibraryIndex
+from run_journal import RunJournal, job_key
+
+
+def test_cost_model():
+    """測試耗時模型的校正與預測"""
+    print("測試耗時模型...")
+    with tempfile.TemporaryDirectory() as tmp:
+        model = CostModel(os.path.join(tmp, 'model.json'))
+        # 沒有紀錄時使用預設值
+        assert model.predict(120.0, 1.0) is not None
+        assert model.predict(None, 1.0) is None
+        # 實際耗時 = 0.05 * 輸出長度 + 1
+        for duration, speed in [(60, 1.0), (120, 0.5), (200, 2.0), (90, 1.5)]:
+            model.record(duration, speed, 'default', 0.05 * duration / speed + 1)
+        assert abs(model.predict(100.0, 1.0) - 6.0) < 1e-6
+        model.save()
+        assert abs(CostModel(os.path.join(tmp, 'model.json')).predict(100.0, 1.0) - 6.0) < 1e-6
+        print("✓ 模型校正後預測正確並可保存")
+
+
+def test_content_hash_memo():
+    """內容雜湊的記憶保存在探測快取旁，下次執行時未變動的檔案不重新讀取"""
+    print("\n測試內容雜湊記憶...")
+    with tempfile.TemporaryDirectory() as tmp:
+        audio = Path(tmp, 'song.ogg')
+        audio.write_bytes(b'audio' * 1000)
+        cache = AudioProbeCache(os.path.join(tmp, 'probe.json'))
+        digest = cache.get(str(audio))['hash']
+        cache.save()
+        assert os.path.exists(os.path.join(tmp, 'content_hash.json'))
+        # 新的程序：大小與mtime未變時直接使用保存的雜湊
+        memo = ContentHashMemo(os.path.join(tmp, 'content_hash.json'))
+        assert memo.lookup(str(audio), audio.stat()) == digest
+        assert content_hash(str(audio), memo=memo) == digest
+        # 內容改變後重新計算
+        audio.write_bytes(b'other' * 1001)
+        assert memo.lookup(str(audio), audio.stat()) is None
+        assert content_hash(str(audio), memo=memo) != digest
+        print("✓ 雜湊記憶跨執行保存")
+
+
+def test_plan_budget():
+    """測試最長工作優先與時間預算"""
+    print("\n測試批次排程...")
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = BatchRunner([1.0], workers=2, budget=10.0,
+                             probe_cache=AudioProbeCache(os.path.join(tmp, 'probe.json')),
+                             cost_model=CostModel(os.path.join(tmp, 'model.json')))
+        runner.scheduler.max_ffmpeg = 2
+        jobs = [BatchJob(f'{name}.tja', 1.0, 'default', predicted=cost)
+                for name, cost in [('a', 3.0), ('b', 8.0), ('c', 12.0), ('d', 4.0)]]
+        accepted, refused, eta = runner.plan(jobs)
+        assert [job.chart for job in accepted] == ['b.tja', 'd.tja', 'a.tja']
+        assert [job.chart for job in refused] == ['c.tja']
+        assert eta == 8.0
+        runner.scheduler.shutdown()
+        print(f"✓ 預估總時間 {eta}s，超出預算的工作被拒絕")
+
+
+def test_dan_jobs():
+    """段位道場：預期輸出與預估耗時包含每個 #NEXTSONG 的音源"""
+    print("\n測試段位道場工作...")
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = Path(tmp, 'songs')
+        songs.mkdir()
+        for name in ['one.ogg', 'two.ogg', 'three.ogg']:
+            (songs / name).write_bytes(b'')
+        (songs / 'dan.tja').write_text("TITLE:Dan\nBPM:120\nWAVE:one.ogg\n\n#START\n#NEXTSONG Two,,,two.ogg,0,0\n"
+                                       "#NEXTSONG Three,,,three.ogg,0,0\n#NEXTSONG Again,,,two.ogg,0,0\n#END\n",
+                                       encoding='utf-8')
+        (songs / 'single.tja').write_text("TITLE:One\nBPM:120\nWAVE:one.ogg\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        runner = BatchRunner([0.9], workers=1, probe_cache=AudioProbeCache(os.path.join(tmp, 'probe.json')),
+                             cost_model=CostModel(os.path.join(tmp, 'model.json')))
+        dan, single = runner.build_jobs(find_charts(str(songs)))
+        assert [name for name, _, _ in dan.audio] == ['one.ogg', 'two.ogg', 'three.ogg']
+        assert dan.expected_outputs() == [str(songs / name) for name in
+                                          ['dan_0.90x.tja', 'one_0.90x.ogg', 'two_0.90x.ogg', 'three_0.90x.ogg']]
+        assert abs(dan.predicted - 3 * single.predicted) < 1e-6
+        # 兩者的 WAVE 相同：共用 WAVE 的輸出，但 #NEXTSONG 的耗時仍計入
+        leaders, followers = runner.group_identical([single, dan])
+        assert leaders == [single] and followers[single.key] == [dan]
+        assert dan.predicted > 2 * single.predicted
+        runner.scheduler.shutdown()
+        print("✓ #NEXTSONG 的音源計入輸出與預估耗時")
+
+
+def test_index_planning():
+    """批次由歌曲庫索引取得譜面清單，並可略過索引中已為最新的變速輸出"""
+    print("\n測試以索引規劃批次...")
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = Path(tmp, 'songs')
+        songs.mkdir()
+        for name in ['a', 'b']:
+            (songs / f'{name}.tja').write_text(f"TITLE:{name}\nBPM:120\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        (songs / 'a_1.10x.tja').write_text("TITLE:a (1.10x)\n", encoding='utf-8')
+
+        with LibraryIndex(os.path.join(tmp, 'library.db')) as index:
+            charts = find_charts(str(songs), index)
+            assert charts == [str(songs / 'a.tja'), str(songs / 'b.tja')]
+            runner = BatchRunner([0.9, 1.1], workers=1, index=index, skip_current=True,
+                                 probe_cache=AudioProbeCache(os.path.join(tmp, 'probe.json')),
+                                 cost_model=CostModel(os.path.join(tmp, 'model.json')))
+            summary = runner.run(charts)
+            assert summary['completed'] == 3 and summary['skipped'] == 1, summary
+            # 新產生的變速檔案在更新索引後視為最新
+            index.update(str(songs))
+            assert index.pending_variants([0.9, 1.1], str(songs)) == []
+        print("✓ 索引提供譜面清單並略過已為最新的變速輸出")
+
+
+def test_probe_and_batch():
+    """有FFmpeg時測試音源探測快取與實際批次執行"""
+    if not shutil.which('ffmpeg'):
+        print("略過批次執行測試（找不到FFmpeg）")
+        return
+    print("\n測試音源探測與批次執行...")
+    with tempfile.TemporaryDirectory() as tmp:
+        song_dir = Path(tmp, 'songs', 'a')
+        song_dir.mkdir(parents=True)
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=2',
+                        '-ac', '2', str(song_dir / 'a.wav')], check=True)
+        (song_dir / 'a.tja').write_text("TITLE:A\nBPM:120\nWAVE:a.wav\n\n#START\n1010,\n#END\n", encoding='utf-8')
+
+        cache = AudioProbeCache(os.path.join(tmp, 'probe.json'))
+        info = cache.get(str(song_dir / 'a.wav'))
+        assert abs(info['duration'] - 2.0) < 0.1 and info['channels'] == 2, info
+        assert cache.get(str(song_dir / 'a.wav'))['hash'] == info['hash']
+        assert cache.stats()['hits'] == 1
+        print(f"✓ 探測結果已快取: {info}")
+
+        model = CostModel(os.path.join(tmp, 'model.json'))
+        runner = BatchRunner([0.9, 1.1], workers=2, probe_cache=cache, cost_model=model)
+        summary = runner.run(find_charts(os.path.join(tmp, 'songs')))
+        assert summary['completed'] == 2 and summary['failed'] == 0, summary
+        assert (song_dir / 'a_0.90x.ogg').exists() and (song_dir / 'a_1.10x.ogg').exists()
+        assert len(model.samples['default']) == 2
+        print("✓ 批次完成並記錄實際耗時")
+
+
+def test_resume_journal():
+    """測試日誌續傳：略過完整的工作，重新處理被修改或中斷的工作"""
+    print("\n測試批次續傳...")
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = Path(tmp, 'songs')
+        songs.mkdir()
+        for name in ['a', 'b']:
+            (songs / f'{name}.tja').write_text(f"TITLE:{name}\nBPM:120\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        journal_path = os.path.join(tmp, 'journal.jsonl')
+        # 雜湊記憶放在暫存資料夾，不寫入使用者的快取
+        probe_cache = AudioProbeCache(os.path.join(tmp, 'probe.json'))
+
+        def run(resume):
+            runner = BatchRunner([0.9], workers=1, probe_cache=probe_cache,
+                                 journal=RunJournal(journal_path, resume=resume, memo=probe_cache.hash_memo),
+                                 cost_model=CostModel(os.path.join(tmp, 'model.json')))
+            return runner.run(find_charts(str(songs)))
+
+        assert run(resume=False)['completed'] == 2
+        summary = run(resume=True)
+        assert summary['skipped'] == 2 and summary['completed'] == 0, summary
+        print("✓ 已完成的工作被略過")
+
+        # 輸出被修改 -> 重新處理
+        (songs / 'a_0.90x.tja').write_text("TITLE:broken\n", encoding='utf-8')
+        # 模擬中斷：b 只有開始紀錄，且留下不完整的輸出
+        key = job_key(str(songs / 'b.tja'), 0.9, 'default', inputs=[str(songs / 'b.tja')], memo=probe_cache.hash_memo)
+        with open(journal_path, 'a', encoding='utf-8') as f:
+            f.write('{"event": "start", "key": "%s"}\n{"event": "do' % key)
+        (songs / 'b_0.90x.tja').write_text("TITLE:partial", encoding='utf-8')
+
+        summary = run(resume=True)
+        assert summary['completed'] == 2 and summary['skipped'] == 0, summary
+        assert 'BPM:108.000' in (songs / 'a_0.90x.tja').read_text(encoding='utf-8')
+        assert 'BPM:108.000' in (songs / 'b_0.90x.tja').read_text(encoding='utf-8')
+        assert run(resume=True)['skipped'] == 2
+        print("✓ 被修改與中斷的工作已重新處理")
+
+        # 來源譜面被修改 -> 即使輸出完整也重新處理
+        (songs / 'a.tja').write_text("TITLE:a\nBPM:100.0\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        summary = run(resume=True)
+        assert summary['completed'] == 1 and summary['skipped'] == 1, summary
+        assert 'BPM:90.000' in (songs / 'a_0.90x.tja').read_text(encoding='utf-8')
+        print("✓ 來源被修改的工作已重新處理")
+
+
+def test_dedupe_identical_audio():
+    """測試內容相同的音源在每個速度只編碼一次"""
+    if not shutil.which('ffmpeg'):
+        print("略過音源去重測試（找不到FFmpeg）")
+        return
+    print("\n測試相同音源去重...")
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = Path(tmp, 'songs')
+        for folder, chart, wave in [('orig', 'song', 'song.wav'), ('orig', 'song_ura', 'song.wav'),
+                                    ('dan', 'course', 'track1.wav')]:
+            (songs / folder).mkdir(parents=True, exist_ok=True)
+            (songs / folder / f'{chart}.tja').write_text(
+                f"TITLE:{chart}\nBPM:120\nWAVE:{wave}\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=2',
+                        str(songs / 'orig' / 'song.wav')], check=True)
+        shutil.copy(songs / 'orig' / 'song.wav', songs / 'dan' / 'track1.wav')
+
+        model = CostModel(os.path.join(tmp, 'model.json'))
+        runner = BatchRunner([0.9, 1.1], workers=2, cost_model=model,
+                             probe_cache=AudioProbeCache(os.path.join(tmp, 'probe.json')))
+        summary = runner.run(find_charts(str(songs)))
+        assert summary['completed'] == 6 and summary['failed'] == 0 and summary['shared'] == 4, summary
+        # 每個速度只編碼一次
+        assert len(model.samples['default']) == 2
+        for speed in ['0.90', '1.10']:
+            original = songs / 'orig' / f'song_{speed}x.ogg'
+            copy = songs / 'dan' / f'track1_{speed}x.ogg'
+            assert original.read_bytes() == copy.read_bytes()
+            # 各自獨立的檔案：之後重新輸出其中一個不會影響其他輸出
+            assert not os.path.samefile(original, copy)
+            assert (songs / 'orig' / f'song_ura_{speed}x.tja').exists()
+            assert (songs / 'dan' / f'course_{speed}x.tja').exists()
+        assert not [name for name in os.listdir(songs / 'dan') if name.endswith('.tmp')]
+        print("✓ 相同音源只編碼一次，其他輸出以複製取得")
+
+
+def test_failed_render_counted():
+    """FFmpeg失敗（沒有拋出例外）的工作計為失敗，不記錄為完成"""
+    print("\n測試失敗的音源輸出...")
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = Path(tmp, 'songs')
+        songs.mkdir()
+        (songs / 'bad.ogg').write_bytes(b'not audio')
+        (songs / 'bad.tja').write_text("TITLE:Bad\nBPM:120\nWAVE:bad.ogg\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        (songs / 'plain.tja').write_text("TITLE:Plain\nBPM:120\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        probe_cache = AudioProbeCache(os.path.join(tmp, 'probe.json'))
+        journal = RunJournal(os.path.join(tmp, 'journal.jsonl'), memo=probe_cache.hash_memo)
+        runner = BatchRunner([0.9], workers=1, journal=journal, probe_cache=probe_cache,
+                             cost_model=CostModel(os.path.join(tmp, 'model.json')))
+        summary = runner.run(find_charts(str(songs)))
+        assert summary['completed'] == 1 and summary['failed'] == 1, summary
+        assert len(journal.completed) == 1
+        print("✓ FFmpeg失敗的工作計為失敗")
+
+
+if __name__ == '__main__':
+    test_cost_model()
+    test_content_hash_memo()
+    test_plan_budget()
+    test_dan_jobs()
+    test_index_planning()
+    test_probe_and_batch()
+    test_resume_journal()
+    test_dedupe_identical_audio()
+    test_failed_render_counted()
+    print("\n測試完成!")
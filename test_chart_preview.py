@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+測試譜面預覽：解析結果與實際改寫後的譜面一致，背景工作只處理最新的要求
+"""
+
+import os
+import tempfile
+import threading
+
+from TJASpeedChanger import rewrite_tja_lines
+from chart_preview import parse_chart_lines, format_preview, ChartPreviewWorker
+
+CHART = """TITLE:Preview
+BPM:120
+OFFSET:-1.5
+DEMOSTART:10
+
+COURSE:Oni
+LEVEL:8
+#START
+1111,
+#BPMCHANGE 240
+1111,
+#MEASURE 3/4
+#DELAY 1
+101,
+,
+#BRANCHSTART p,50,80
+#N
+1111111111111111,
+#E
+1111111111111111,
+#M
+3030,
+#BRANCHEND
+#END
+"""
+
+
+def test_parse_chart():
+    """測試音符時間、#BPMCHANGE、#MEASURE、#DELAY 與分歧"""
+    model = parse_chart_lines(CHART.splitlines())
+    course = model.courses[0]
+    assert (course.name, course.level, course.notes) == ('Oni', '8', 12)
+    times = [float(time) for time in course.note_times()[0]]
+    assert times[:8] == [0.0, 0.5, 1.0, 1.5, 2.0, 2.25, 2.5, 2.75]
+    # 3/4 拍的小節加上1秒延遲
+    assert times[8:10] == [4.0, 4.5]
+    # 只計算達人譜面
+    assert times[10:] == [5.5, 5.875]
+    assert float(course.lengths(1.0)) == 6.25
+    print("✓ 譜面時間解析正確")
+
+
+def test_preview_matches_rewrite():
+    """預覽數值與實際改寫後的譜面一致"""
+    lines = CHART.splitlines(keepends=True)
+    model = parse_chart_lines(lines)
+    preview = model.preview(1.5)
+    rewritten = parse_chart_lines(rewrite_tja_lines(lines, 1.5)[0])
+    assert abs(preview['bpm'][1] - rewritten.bpm) < 1e-3
+    assert abs(preview['offset'][1] - rewritten.offset) < 1e-3
+    assert abs(preview['demostart'][1] - rewritten.demostart) < 1e-3
+    assert abs(preview['duration'][1] - float(rewritten.courses[0].lengths(1.0))) < 1e-3
+    expected = rewritten.courses[0].note_times()[0]
+    actual = model.courses[0].note_times(1.5)[0]
+    assert all(abs(a - b) < 1e-3 for a, b in zip(actual, expected))
+    assert preview['courses'][('Oni', None)]['peak_nps'][1] == float(rewritten.courses[0].peak_density(1.0)[0])
+    # 同一速度的結果會被重複使用
+    assert model.preview(1.5) is preview
+    assert 'BPM       120.000 → 180.000' in format_preview(preview, 1.5)
+    print("✓ 預覽與改寫結果一致")
+
+
+def test_worker_latest_request():
+    """背景工作只回報最新的速度"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = os.path.join(tmp, 'preview.tja')
+        with open(chart, 'w', encoding='utf-8') as f:
+            f.write(CHART)
+        results = []
+        done = threading.Event()
+
+        def callback(speed, preview):
+            results.append(speed)
+            if speed == 2.0:
+                done.set()
+
+        worker = ChartPreviewWorker(callback)
+        worker.load(chart)
+        for speed in (1.1, 1.2, 1.3, 2.0):
+            worker.request(speed)
+        assert done.wait(5)
+        worker.close()
+        assert results[-1] == 2.0
+        assert len(results) <= 4
+        assert worker.model is not None
+        print("✓ 背景預覽只處理最新的要求")
+
+
+def test_worker_error():
+    """無法讀取的檔案回報錯誤"""
+    errors = []
+    done = threading.Event()
+    worker = ChartPreviewWorker(lambda speed, preview: None,
+                                lambda error: (errors.append(error), done.set()))
+    worker.load('/nonexistent/chart.tja')
+    worker.request(1.5)
+    assert done.wait(5)
+    worker.close()
+    assert errors
+    print("✓ 讀取失敗時回報錯誤")
+
+
+if __name__ == '__main__':
+    test_parse_chart()
+    test_preview_matches_rewrite()
+    test_worker_latest_request()
+    test_worker_error()
+    print("\n測試完成!")
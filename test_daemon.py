@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+測試本機常駐服務的JSON API
+"""
+
+import json
+import time
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from pathlib import Path
+
+from tja_daemon import create_server
+
+
+def request(server, method, path, payload=None, headers=None):
+    url = f"http://127.0.0.1:{server.server_port}{path}"
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method,
+                                 headers=headers or {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def wait_for(server, job_id, timeout=5):
+    """輪詢直到工作結束"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, job = request(server, 'GET', f'/jobs/{job_id}')
+        if job['status'] in ('done', 'failed'):
+            break
+        time.sleep(0.05)
+    return job
+
+
+def test_daemon_jobs():
+    """測試提交工作、輪詢進度與錯誤處理"""
+    print("測試常駐服務...")
+    server = create_server(port=0, workers=2, max_queue=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with tempfile.TemporaryDirectory() as song_dir:
+            tja = Path(song_dir, 'song.tja')
+            tja.write_text("TITLE:Song\nBPM:120\nOFFSET:-1.0\n\n#START\n1010,\n#END\n", encoding='utf-8')
+
+            status, job = request(server, 'POST', '/jobs', {'paths': [str(tja)], 'speeds': [0.9, 1.1]})
+            assert status == 202, job
+            print(f"✓ 工作已排入: {job['id']}")
+
+            job = wait_for(server, job['id'])
+            assert job['status'] == 'done', job
+            assert job['progress'] == {'completed': 2, 'total': 2}
+            assert Path(song_dir, 'song_0.90x.tja').exists()
+            assert Path(song_dir, 'song_1.10x.tja').exists()
+            print("✓ 工作完成並產生變速譜面")
+
+            status, body = request(server, 'POST', '/jobs', {'paths': [str(tja)], 'speeds': [5.0]})
+            assert status == 400, body
+            status, body = request(server, 'POST', '/jobs', {'paths': [str(tja)], 'speeds': [1.0], 'profile': 'nope'})
+            assert status == 400, body
+            status, body = request(server, 'GET', '/jobs/unknown')
+            assert status == 404
+            # 佇列上限以譜面 x 速度計算
+            status, body = request(server, 'POST', '/jobs', {'paths': [str(tja)], 'speeds': [0.8, 0.9, 1.1]})
+            assert status == 429, body
+            print("✓ 不合法的工作被拒絕")
+
+            # 任意網頁可送出的跨站請求
+            payload = {'paths': [str(tja)], 'speeds': [0.9]}
+            status, body = request(server, 'POST', '/jobs', payload, {'Content-Type': 'text/plain'})
+            assert status == 415, body
+            status, body = request(server, 'POST', '/jobs', payload,
+                                   {'Content-Type': 'application/json', 'Origin': 'https://example.com'})
+            assert status == 403, body
+            status, body = request(server, 'POST', '/jobs', payload,
+                                   {'Content-Type': 'application/json; charset=utf-8',
+                                    'Origin': f'http://localhost:{server.server_port}'})
+            assert status == 202, body
+            wait_for(server, body['id'])
+            print("✓ 跨站請求被拒絕")
+
+            # 引用的音源處理失敗時工作失敗
+            broken = Path(song_dir, 'broken.tja')
+            broken.write_text("TITLE:Broken\nBPM:120\nWAVE:missing.ogg\n\n#START\n1010,\n#END\n",
+                              encoding='utf-8')
+            status, job = request(server, 'POST', '/jobs', {'paths': [str(broken)], 'speeds': [0.9]})
+            assert status == 202, job
+            job = wait_for(server, job['id'])
+            assert job['status'] == 'failed' and 'audio' in job['errors'][0]['error'], job
+            print("✓ 音源處理失敗時工作失敗")
+
+            status, body = request(server, 'GET', '/status')
+            assert status == 200 and body['scheduler']['completed'] == 4, body
+            print(f"✓ 服務狀態: {body}")
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    test_daemon_jobs()
+    print("\n測試完成!")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+測試編碼偵測的正確率（以產生的已標記譜面資料）
+"""
+
+import tempfile
+
+import tja_io
+from encoding_corpus import CODECS, STYLES, generate_corpus, evaluate, below_threshold, is_correct
+
+
+def test_corpus_labels():
+    """產生的資料以標記的編碼可還原原始文字"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = generate_corpus(tmp, per_codec=3, seed=1)
+        assert len(files) == 3 * len(CODECS)
+        for path, codec, style, text in files:
+            assert is_correct(path, codec, text)
+            assert text.startswith('TITLE:')
+            assert ('#LYRIC' in text) == (style == 'full')
+            if style == 'title-only' and codec != 'utf-8-sig':
+                assert [line for line in text.splitlines() if not line.isascii()][0] == text.splitlines()[0]
+                assert sum(not line.isascii() for line in text.splitlines()) == 1
+        assert {style for _, _, style, _ in files} == set(STYLES)
+        # UTF-8 BOM 檔案以 utf-8 解讀時會多出 BOM，不算正確
+        path, _, _, text = next(item for item in files if item[1] == 'utf-8-sig')
+        assert not is_correct(path, 'utf-8', text)
+        print("✓ 已標記的譜面資料正確")
+
+
+def test_detection_accuracy():
+    """各編碼的偵測正確率不低於 MIN_ACCURACY"""
+    with tempfile.TemporaryDirectory() as tmp:
+        files = generate_corpus(tmp, per_codec=30, seed=0)
+        if tja_io.chardet is None:
+            # 沒有 chardet 時只能保證 BOM、ASCII與UTF-8的快速路徑
+            files = [item for item in files if item[1] in ('utf-8', 'utf-8-sig')]
+        results = evaluate(files)
+        assert below_threshold(results) == [], results
+        for codec, entry in results.items():
+            print(f"  {codec:<10}{entry['accuracy']:.0%}  worst {entry['worst'] * 1000:.2f}ms")
+        print("✓ 各編碼偵測正確率達標")
+
+
+def test_gbk_title_only():
+    """只有標題是GBK的譜面不會被當成 cp950（亂碼）"""
+    if tja_io.chardet is None:
+        print("略過GBK標題測試（未安裝 chardet）")
+        return
+    for title in ('稻香', '告白气球', '最炫民族风'):
+        data = f'TITLE:{title}\nSUBTITLE:--Namco Original\nBPM:120\nWAVE:song.ogg\n\n#START\n1010,\n#END\n'
+        assert tja_io.detect_bytes_encoding(data.encode('gbk')) == 'gbk', title
+    print("✓ 只有GBK標題的譜面偵測正確")
+
+
+if __name__ == '__main__':
+    test_corpus_labels()
+    test_detection_accuracy()
+    test_gbk_title_only()
+    print("\n測試完成!")
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+測試FFmpeg版本化快取：隨程式發佈的執行檔、壓縮檔解壓、戳記與雜湊驗證
+"""
+
+import os
+import json
+import zipfile
+import tempfile
+
+from ffmpeg_cache import (FFMPEG_NAME, MANIFEST_NAME, ARCHIVE_NAME, FFmpegCache,
+                          build_manifest, find_ffmpeg, load_manifest)
+
+
+def make_app(tmp, content=b'fake ffmpeg binary' * 100, version='7.1', archive=False):
+    """建立模擬的發佈資料夾：清單 + ffmpeg 或 ffmpeg.zip"""
+    app_dir = os.path.join(tmp, 'app')
+    os.makedirs(app_dir, exist_ok=True)
+    binary = os.path.join(tmp, FFMPEG_NAME)
+    with open(binary, 'wb') as f:
+        f.write(content)
+    manifest = build_manifest(binary, version=version)
+    with open(os.path.join(app_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    if archive:
+        with zipfile.ZipFile(os.path.join(app_dir, ARCHIVE_NAME), 'w') as zf:
+            zf.write(binary, f'bin/{FFMPEG_NAME}')
+    else:
+        os.replace(binary, os.path.join(app_dir, FFMPEG_NAME))
+    return app_dir, manifest
+
+
+def test_sidecar_binary():
+    """隨程式發佈的 ffmpeg 通過驗證後直接使用，第二次只比對戳記"""
+    with tempfile.TemporaryDirectory() as tmp:
+        app_dir, manifest = make_app(tmp)
+        cache_root = os.path.join(tmp, 'cache')
+        assert load_manifest([app_dir]) == manifest
+        found = find_ffmpeg([app_dir], cache_root)
+        assert found == os.path.join(app_dir, FFMPEG_NAME)
+        with open(os.path.join(cache_root, 'verified.json'), encoding='utf-8') as f:
+            assert list(json.load(f).values()) == [manifest['sha256']]
+        print("✓ 隨程式發佈的FFmpeg已驗證")
+
+
+def test_archive_install():
+    """ffmpeg.zip 第一次解壓到版本化快取，之後直接使用快取"""
+    with tempfile.TemporaryDirectory() as tmp:
+        app_dir, manifest = make_app(tmp, archive=True)
+        cache_root = os.path.join(tmp, 'cache')
+        cache = FFmpegCache(cache_root, manifest)
+        assert os.path.basename(cache.entry_dir) == f"7.1-{manifest['sha256'][:12]}"
+
+        found = find_ffmpeg([app_dir], cache_root)
+        assert found == cache.cached_path
+        # 移除壓縮檔後仍可從快取找到
+        os.unlink(os.path.join(app_dir, ARCHIVE_NAME))
+        assert find_ffmpeg([app_dir], cache_root) == cache.cached_path
+
+        # 新版本安裝後舊版本的快取被移除
+        app_dir2, manifest2 = make_app(os.path.join(tmp, 'v2'), content=b'newer build' * 100,
+                                       version='7.2', archive=True)
+        found2 = find_ffmpeg([app_dir2], cache_root)
+        assert found2 == FFmpegCache(cache_root, manifest2).cached_path
+        assert not os.path.exists(cache.entry_dir)
+        print("✓ 壓縮檔解壓到版本化快取並清除舊版本")
+
+
+def test_hash_mismatch():
+    """內容與清單不符時不使用該檔案"""
+    with tempfile.TemporaryDirectory() as tmp:
+        app_dir, manifest = make_app(tmp)
+        sidecar = os.path.join(app_dir, FFMPEG_NAME)
+        with open(sidecar, 'r+b') as f:
+            f.write(b'X')  # 大小不變但內容不同
+        cache = FFmpegCache(os.path.join(tmp, 'cache'), manifest)
+        assert not cache.verify(sidecar)
+        assert cache.locate([app_dir]) is None
+
+        # 壓縮檔內容不符時不寫入快取
+        os.unlink(sidecar)
+        with zipfile.ZipFile(os.path.join(app_dir, ARCHIVE_NAME), 'w') as zf:
+            zf.writestr(FFMPEG_NAME, b'Y' * manifest['size'])
+        assert cache.locate([app_dir]) is None
+        assert not os.path.exists(cache.cached_path)
+        assert os.listdir(cache.entry_dir) == []
+        print("✓ 雜湊不符的FFmpeg被拒絕")
+
+
+if __name__ == '__main__':
+    test_sidecar_binary()
+    test_archive_install()
+    test_hash_mismatch()
+    print("\n測試完成!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+測試延遲載入的語言目錄：啟動時只讀取一個目錄檔、切換語言只載入新語言、來源改變時重新編譯
+"""
+
+import os
+import json
+import tempfile
+
+from language_catalog import LanguageCatalog
+
+BUILTIN = {
+    'en': {'hello': 'Hello', 'only_en': 'English only'},
+    'ja': {'hello': 'こんにちは'},
+}
+
+
+def make_catalog(tmp, merge=True, calls=None):
+    def builtin():
+        if calls is not None:
+            calls.append(1)
+        return BUILTIN
+    return LanguageCatalog(builtin, ('en', 'ja'), lang_dir=os.path.join(tmp, 'languages'),
+                           source=os.path.join(tmp, 'module.py'), cache_dir=os.path.join(tmp, 'cache'),
+                           merge=merge)
+
+
+def setup_sources(tmp):
+    os.makedirs(os.path.join(tmp, 'languages'))
+    with open(os.path.join(tmp, 'module.py'), 'w', encoding='utf-8') as f:
+        f.write('# builtin texts\n')
+    with open(os.path.join(tmp, 'languages', 'ja.json'), 'w', encoding='utf-8') as f:
+        json.dump({'hello': 'やあ'}, f, ensure_ascii=False)
+    with open(os.path.join(tmp, 'languages', 'zh-tw.json'), 'w', encoding='utf-8') as f:
+        json.dump({'hello': '你好'}, f, ensure_ascii=False)
+
+
+def test_lazy_loading():
+    """建立時不讀取任何檔案，只載入使用到的語言"""
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_sources(tmp)
+        calls = []
+        catalog = make_catalog(tmp, calls=calls)
+        assert catalog.available() == ['en', 'ja', 'zh-tw']
+        assert catalog.reads == [] and calls == []
+
+        assert catalog.text('ja', 'hello') == 'やあ'        # JSON 覆蓋內建文字
+        assert catalog.text('ja', 'only_en') == 'English only'  # 缺少的鍵使用英文
+        assert catalog.text('zh-tw', 'hello') == '你好'
+        assert catalog.get('xx') == {}
+        assert sorted(catalog.catalogs) == ['en', 'ja', 'xx', 'zh-tw']
+        assert calls == [1]  # 內建文字只建立一次
+        print("✓ 語言目錄延遲載入")
+
+
+def test_startup_reads_one_catalog():
+    """第二次啟動只讀取目前語言的已編譯目錄檔，不建立內建文字也不讀取 JSON"""
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_sources(tmp)
+        make_catalog(tmp).text('ja', 'hello')
+
+        calls = []
+        catalog = make_catalog(tmp, calls=calls)
+        assert catalog.text('ja', 'hello') == 'やあ'
+        assert catalog.reads == [os.path.join(tmp, 'cache', 'gui', 'ja.json')]
+        assert calls == []
+
+        # 切換語言只載入新語言
+        catalog.text('zh-tw', 'hello')
+        # 新語言還沒有目錄檔：編譯時讀取 JSON
+        assert catalog.reads[1:] == [os.path.join(tmp, 'languages', 'zh-tw.json')]
+        print("✓ 啟動時只讀取一個目錄檔")
+
+
+def test_gui_language_manager():
+    """GUI的 LanguageManager 啟動時只讀取一個目錄檔"""
+    try:
+        from TJASpeedChangerGUI_Final import LanguageManager
+    except ImportError:
+        print("⚠ 無法載入GUI，跳過 LanguageManager 測試")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        saved = {name: os.environ.get(name) for name in ('XDG_CACHE_HOME', 'LOCALAPPDATA')}
+        os.environ['XDG_CACHE_HOME'] = os.environ['LOCALAPPDATA'] = tmp
+        try:
+            # 第一次啟動時編譯目錄檔
+            first = LanguageManager()
+            first.current_language = 'zh-tw'
+            first.get_text('process_button')
+            lang_mgr = LanguageManager()
+            lang_mgr.current_language = 'zh-tw'
+            assert lang_mgr.get_text('process_button')
+            assert lang_mgr.get_text('status_ready')
+            assert len(lang_mgr.catalog.reads) == 1
+            assert lang_mgr.catalog.reads[0].endswith(os.path.join('TJASpeedChangerGUI_Final', 'zh-tw.json'))
+            assert lang_mgr.get_available_languages() == ['en', 'zh-tw', 'ja']
+            print("✓ GUI啟動時只讀取一個語言目錄檔")
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+
+def test_recompile_on_change():
+    """JSON 檔改變後重新編譯"""
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_sources(tmp)
+        make_catalog(tmp).text('ja', 'hello')
+        path = os.path.join(tmp, 'languages', 'ja.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'hello': 'もしもし!'}, f, ensure_ascii=False)
+        assert make_catalog(tmp).text('ja', 'hello') == 'もしもし!'
+
+        # merge=False：有 JSON 檔時只使用 JSON
+        catalog = make_catalog(tmp, merge=False)
+        assert catalog.available() == ['ja', 'zh-tw']
+        assert catalog.text('ja', 'only_en') is None
+        print("✓ 來源改變時重新編譯")
+
+
+if __name__ == '__main__':
+    test_lazy_loading()
+    test_startup_reads_one_catalog()
+    test_gui_language_manager()
+    test_recompile_on_change()
+    print("\n測試完成!")
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+測試歌曲庫索引
+"""
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+
+from library_index import LibraryIndex, parse_variant_name
+from tja_io import detect_file_encoding
+
+
+def create_song(song_dir, name, title, wave):
+    """建立測試用譜面與音源"""
+    song_dir.mkdir(parents=True, exist_ok=True)
+    (song_dir / f"{name}.tja").write_text(
+        f"TITLE:{title}\nBPM:150\nWAVE:{wave}\nOFFSET:-1.0\n\n#START\n1010,\n#END\n", encoding='utf-8')
+    (song_dir / wave).write_bytes(b'OggS')
+
+
+def test_parse_variant_name():
+    """測試變速檔名辨識"""
+    print("測試變速檔名辨識...")
+    assert parse_variant_name('song_1.20x.tja') == ('song', 1.2)
+    assert parse_variant_name('song.tja') is None
+    print("✓ 變速檔名辨識正確")
+
+
+def test_index_and_reindex():
+    """測試建立索引與增量更新"""
+    print("\n測試建立索引與增量更新...")
+    with tempfile.TemporaryDirectory() as root:
+        root_path = Path(root)
+        create_song(root_path / 'pack' / 'a', 'a', '歌曲A', 'a.ogg')
+        create_song(root_path / 'pack' / 'b', 'b', 'Song B', 'b.ogg')
+
+        # 已產生的變速檔案
+        (root_path / 'pack' / 'a' / 'a_0.90x.tja').write_text("TITLE:歌曲A (0.90x)\n", encoding='utf-8')
+        (root_path / 'pack' / 'a' / 'a_0.90x.ogg').write_bytes(b'OggS')
+
+        db_path = os.path.join(root, 'library.db')
+        with LibraryIndex(db_path, workers=4) as index:
+            updated, removed = index.update(root)
+            assert (updated, removed) == (2, 0), (updated, removed)
+
+            chart = index.get_chart(root_path / 'pack' / 'a' / 'a.tja')
+            assert chart['title'] == '歌曲A'
+            assert chart['bpm'] == 150.0
+            assert chart['audio_path'].endswith('a.ogg')
+            print(f"✓ 索引譜面: {chart['title']} ({chart['encoding']})")
+
+            variants = index.variants(chart['path'])
+            assert len(variants) == 1 and variants[0]['is_current']
+            print("✓ 變速檔案已記錄且為最新")
+
+            # 沒有變動時不重新解析
+            assert index.update(root) == (0, 0)
+            print("✓ 未變動檔案不重新解析")
+
+            # 修改原始譜面後，舊的變速檔案應標記為過期
+            tja = root_path / 'pack' / 'a' / 'a.tja'
+            future = time.time() + 10
+            os.utime(tja, (future, future))
+            assert index.update(root) == (1, 0)
+            assert not index.variants(chart['path'])[0]['is_current']
+            assert (chart['path'], 0.9) in index.pending_variants([0.9])
+            print("✓ 修改後變速檔案標記為過期")
+
+            # 刪除譜面
+            (root_path / 'pack' / 'b' / 'b.tja').unlink()
+            assert index.update(root) == (0, 1)
+            print("✓ 刪除的譜面已從索引移除")
+
+
+def test_dan_variants():
+    """段位道場：記錄引用的所有音源，缺少任一 #NEXTSONG 的變速音源時不是最新"""
+    print("\n測試段位道場的變速檔案...")
+    with tempfile.TemporaryDirectory() as root:
+        dan = Path(root, 'dan')
+        create_song(dan, 'dan', '段位', 'one.ogg')
+        (dan / 'dan.tja').write_text("TITLE:段位\nBPM:120\nWAVE:one.ogg\n\n#START\n"
+                                     "#NEXTSONG Two,,,two.ogg,0,0\n1010,\n#END\n", encoding='utf-8')
+        for name in ['dan_0.90x.tja', 'one_0.90x.ogg']:
+            (dan / name).write_bytes(b'OggS')
+        with LibraryIndex(os.path.join(root, 'library.db')) as index:
+            index.update(root)
+            chart = index.get_chart(dan / 'dan.tja')
+            assert json.loads(chart['referenced']) == ['one.ogg', 'two.ogg']
+            assert index.current_speeds(chart['path']) == set()
+            (dan / 'two_0.90x.ogg').write_bytes(b'OggS')
+            index.update(root)
+            assert index.current_speeds(chart['path']) == {0.9}
+            assert index.pending_variants([0.9, 1.1], root) == [(chart['path'], 1.1)]
+        print("✓ #NEXTSONG 的變速音源也列入檢查")
+
+
+def test_audio_changes():
+    """譜面未變動但音源被修改或後來才加入時重新解析，變速檔案依新的音源判斷"""
+    print("\n測試音源變動...")
+    with tempfile.TemporaryDirectory() as root:
+        song = Path(root, 'song')
+        create_song(song, 'a', 'A', 'a.ogg')
+        song.joinpath('late.tja').write_text("TITLE:Late\nBPM:120\nWAVE:late.ogg\n\n#START\n#END\n", encoding='utf-8')
+        for name in ['a_0.90x.tja', 'a_0.90x.ogg']:
+            (song / name).write_bytes(b'OggS')
+        with LibraryIndex(os.path.join(root, 'library.db')) as index:
+            assert index.update(root) == (2, 0)
+            assert index.current_speeds(song / 'a.tja') == {0.9}
+            assert index.get_chart(song / 'late.tja')['audio_path'] is None
+
+            # 音源被替換（大小與時間都改變）
+            future = time.time() + 10
+            (song / 'a.ogg').write_bytes(b'OggS' * 100)
+            os.utime(song / 'a.ogg', (future, future))
+            # 音源後來才加入
+            (song / 'late.ogg').write_bytes(b'OggS')
+            assert index.update(root) == (2, 0)
+            chart = index.get_chart(song / 'a.tja')
+            assert chart['audio_size'] == 400
+            assert index.current_speeds(chart['path']) == set()
+            assert index.get_chart(song / 'late.tja')['audio_path'] == str(song / 'late.ogg')
+            assert index.update(root) == (0, 0)
+        print("✓ 音源變動時重新解析，舊的變速輸出標記為過期")
+
+
+def test_unreadable_chart():
+    """掃描後無法讀取的譜面不會中斷整次更新"""
+    print("\n測試無法讀取的譜面...")
+    with tempfile.TemporaryDirectory() as root:
+        create_song(Path(root, 'a'), 'a', 'A', 'a.ogg')
+        create_song(Path(root, 'b'), 'b', 'B', 'b.ogg')
+
+        def detect(path):
+            if path.endswith('b.tja'):
+                raise FileNotFoundError(path)
+            return detect_file_encoding(path)
+
+        with LibraryIndex(os.path.join(root, 'library.db'), detect_encoding=detect) as index:
+            assert index.update(root) == (1, 0)
+            assert index.get_chart(Path(root, 'a', 'a.tja'))['title'] == 'A'
+            assert index.get_chart(Path(root, 'b', 'b.tja')) is None
+        print("✓ 其他譜面的索引照常寫入")
+
+
+if __name__ == '__main__':
+    test_parse_variant_name()
+    test_index_and_reindex()
+    test_dan_variants()
+    test_audio_changes()
+    test_unreadable_chart()
+    print("\n測試完成!")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+測試段位道場 #NEXTSONG 的改寫與多音源處理
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from TJASpeedChanger import rescale_nextsong, rewrite_tja_lines, process_files
+
+DAN_CHART = """TITLE:段位道場 初段
+WAVE:song1.ogg
+BPM:120
+OFFSET:-1.5
+
+COURSE:Dan
+#START
+#BPMCHANGE 120
+1010,
+#NEXTSONG 曲二,サブ,ナムコ,song2.wav,1000,200,8,3
+#BPMCHANGE 150
+#DELAY 1.000
+1111,
+#NEXTSONG 曲三,,,song3.mp3,1000,200
+#BPMCHANGE 90
+2020,
+#END
+"""
+
+
+def test_rescale_nextsong():
+    """測試 #NEXTSONG 欄位改寫"""
+    line, wave, new_wave = rescale_nextsong('#NEXTSONG 曲二,サブ,ナムコ,song2.wav,1000,200,8,3\n', 1.1)
+    assert line == '#NEXTSONG 曲二 (1.10x),サブ,ナムコ,song2_1.10x.ogg,1000,200,8,3\n'
+    assert (wave, new_wave) == ('song2.wav', 'song2_1.10x.ogg')
+    # 缺少音源欄位時保持原樣
+    assert rescale_nextsong('#NEXTSONG title,sub\n', 1.1) == ('#NEXTSONG title,sub\n', None, None)
+    print("✓ #NEXTSONG 改寫正確")
+
+
+def test_rewrite_dan_chart():
+    """測試段位譜面的所有音源與BPM都被改寫"""
+    new_lines, wave, nextsongs = rewrite_tja_lines(DAN_CHART.splitlines(keepends=True), 0.8)
+    text = ''.join(new_lines)
+    assert wave == ('song1.ogg', 'song1_0.80x.ogg')
+    assert nextsongs == [('song2.wav', 'song2_0.80x.ogg'), ('song3.mp3', 'song3_0.80x.ogg')]
+    assert '#BPMCHANGE 120.000' in text and '#BPMCHANGE 72.000' in text
+    assert '#NEXTSONG 曲三 (0.80x),,,song3_0.80x.ogg,1000,200\n' in text
+    print("✓ 段位譜面改寫正確")
+
+
+def test_process_dan_course():
+    """有FFmpeg時測試所有引用的音源都被處理"""
+    if not shutil.which('ffmpeg'):
+        print("略過段位音源處理測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = Path(tmp, 'dan.tja')
+        chart.write_text(DAN_CHART, encoding='utf-8')
+        for name in ['song1.ogg', 'song2.wav', 'song3.mp3']:
+            subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=1',
+                            os.path.join(tmp, name)], check=True)
+        new_tja_path, audio_path = process_files(str(chart), 1.25)
+        assert audio_path == os.path.join(tmp, 'song1_1.25x.ogg')
+        for name in ['song1_1.25x.ogg', 'song2_1.25x.ogg', 'song3_1.25x.ogg']:
+            assert os.path.exists(os.path.join(tmp, name)), name
+
+        # 任一首找不到音源時視為失敗
+        os.unlink(os.path.join(tmp, 'song3.mp3'))
+        assert process_files(str(chart), 0.9)[1] is None
+        print("✓ 段位道場所有音源皆已處理")
+
+
+if __name__ == '__main__':
+    test_rescale_nextsong()
+    test_rewrite_dan_chart()
+    test_process_dan_course()
+    print("\n測試完成!")
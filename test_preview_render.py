@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+測試試聽片段產生與快取
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from audio_probe import ContentHashMemo
+from preview_render import build_preview_command, PreviewRenderer
+
+
+def test_preview_command():
+    """測試輸入端定位與讀取長度"""
+    cmd = build_preview_command('song.flac', 'clip.wav', 1.5, start=42.0, seconds=10)
+    # -ss 與 -t 必須在 -i 之前（輸入端快速定位）
+    assert cmd.index('-ss') < cmd.index('-i') and cmd.index('-t') < cmd.index('-i')
+    assert cmd[cmd.index('-ss') + 1] == '42.000'
+    assert cmd[cmd.index('-t') + 1] == '15.000'
+    assert cmd[cmd.index('-filter:a') + 1] == 'atempo=1.5'
+    print("✓ 試聽指令正確")
+
+
+def test_preview_render():
+    """有FFmpeg時測試片段長度、快取與超出長度的 DEMOSTART"""
+    if not shutil.which('ffmpeg'):
+        print("略過試聽片段測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=30',
+                        os.path.join(tmp, 'song.flac')], check=True)
+        chart = Path(tmp, 'song.tja')
+        chart.write_text("TITLE:Song\nWAVE:song.flac\nDEMOSTART:12.5\n\n#START\n1,\n#END\n", encoding='utf-8')
+        renderer = PreviewRenderer(cache_dir=os.path.join(tmp, 'cache'), seconds=4, max_entries=2,
+                                   memo=ContentHashMemo(os.path.join(tmp, 'content_hash.json')))
+
+        clip = renderer.render_chart(str(chart), 1.25)
+        # 4秒輸出 = 5秒原始音源 x 44.1kHz 單聲道 16bit
+        assert abs((os.path.getsize(clip) - 44) / 2 / 44100 - 4.0) < 0.05
+        assert renderer.render_chart(str(chart), 1.25) == clip
+        assert renderer.stats() == {'hits': 1, 'misses': 1}
+
+        # 只保留最近的片段，且不留下暫存檔
+        renderer.render_chart(str(chart), 0.8)
+        renderer.render_chart(str(chart), 0.9)
+        assert len(os.listdir(renderer.cache_dir)) == 2
+
+        chart.write_text("TITLE:Song\nWAVE:song.flac\nDEMOSTART:99\n\n#START\n1,\n#END\n", encoding='utf-8')
+        try:
+            renderer.render_chart(str(chart), 1.25)
+            assert False, 'DEMOSTART past the end should fail'
+        except RuntimeError:
+            pass
+        assert len(os.listdir(renderer.cache_dir)) == 2
+        print("✓ 試聽片段長度與快取正確")
+
+
+if __name__ == '__main__':
+    test_preview_command()
+    test_preview_render()
+    print("\n測試完成!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+測試內建的效能分析（cProfile + tracemalloc）
+"""
+
+import os
+import sys
+import pstats
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from profiling import Profiler
+from job_scheduler import RenderScheduler
+
+
+def busy_worker():
+    return sum(i * i for i in range(20000))
+
+
+def allocate_blocks():
+    return [bytearray(64 * 1024) for _ in range(16)]
+
+
+def test_profiler_threads_and_memory():
+    """工作執行緒也會被分析，並記錄記憶體高峰"""
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'run')
+        with Profiler(base + '.pstats', memory=True) as profiler:
+            thread = threading.Thread(target=busy_worker)
+            thread.start()
+            thread.join()
+            blocks = allocate_blocks()
+        assert os.path.exists(base + '.pstats') and os.path.exists(base + '.txt')
+        functions = {name for _, _, name in pstats.Stats(profiler.pstats_path).stats}
+        assert 'allocate_blocks' in functions
+        assert 'busy_worker' in functions
+        summary = Path(profiler.summary_path).read_text(encoding='utf-8')
+        assert 'by cumulative time' in summary
+        assert 'Memory: peak' in summary
+        assert 'test_profiling.py' in summary.split('allocation sites')[1]
+        del blocks
+        print("✓ 效能分析包含工作執行緒與記憶體配置")
+
+
+def test_profiler_existing_pool():
+    """分析開始前就已啟動的執行緒池（GUI 的排程器）中的工作也會被分析"""
+    scheduler = RenderScheduler(max_workers=1)
+    try:
+        scheduler.submit(len, 'warm-up').result()
+        with tempfile.TemporaryDirectory() as tmp:
+            for _ in range(2):
+                with Profiler(os.path.join(tmp, 'pool')) as profiler:
+                    scheduler.submit(busy_worker).result()
+                functions = {name for _, _, name in pstats.Stats(profiler.pstats_path).stats}
+                assert 'busy_worker' in functions
+    finally:
+        scheduler.shutdown()
+    print("✓ 效能分析包含既有執行緒池中的工作")
+
+
+def test_profiler_pool_started_while_profiling():
+    """第一次分析期間才啟動的執行緒池，在之後的分析中仍會被分析"""
+    scheduler = RenderScheduler(max_workers=2)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in range(3):
+                with Profiler(os.path.join(tmp, f'run{run}')) as profiler:
+                    for future in [scheduler.submit(busy_worker) for _ in range(4)]:
+                        future.result()
+                stats = pstats.Stats(profiler.pstats_path).stats
+                calls = sum(entry[1] for (_, _, name), entry in stats.items() if name == 'busy_worker')
+                assert calls == 4, (run, calls)
+    finally:
+        scheduler.shutdown()
+    print("✓ 分析期間啟動的執行緒池在下一次分析仍會被分析")
+
+
+def test_cli_profile():
+    """CLI --profile 寫出 .pstats 與摘要"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = Path(tmp) / 'profile.tja'
+        chart.write_text('TITLE:Profile\nBPM:120\n\n#START\n1010,\n#END\n', encoding='utf-8')
+        base = os.path.join(tmp, 'cli')
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TJASpeedChanger.py')
+        subprocess.run([sys.executable, script, str(chart), '1.1', '--profile', base, '--lang', 'en'],
+                       check=True, capture_output=True)
+        functions = {name for _, _, name in pstats.Stats(base + '.pstats').stats}
+        assert 'rewrite_tja_lines' in functions
+        assert os.path.exists(base + '.txt')
+        print("✓ CLI --profile 已寫出分析檔案")
+
+
+if __name__ == '__main__':
+    test_profiler_threads_and_memory()
+    test_profiler_existing_pool()
+    test_profiler_pool_started_while_profiling()
+    test_cli_profile()
+    print("\n測試完成!")
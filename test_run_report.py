@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+測試各階段計時與JSON耗時報告
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from TJASpeedChanger import process_files
+from run_report import RunReport, StageTimer, STAGES
+
+CHART = """TITLE:Report
+WAVE:song.wav
+BPM:120
+OFFSET:-1.0
+
+COURSE:Oni
+#START
+1010,
+#END
+"""
+
+
+def test_stage_timer():
+    """測試計時、計數與階段排序"""
+    timer = StageTimer('a.tja', 1.5)
+    with timer.stage('encode'):
+        pass
+    with timer.stage('detect'):
+        pass
+    timer.add_time('detect', 0.5)
+    timer.count('tja_lines', 10)
+    timer.count('tja_lines', 5)
+    data = timer.finish().to_dict()
+    assert list(data['stages']) == ['detect', 'encode']
+    assert data['stages']['detect'] >= 0.5
+    assert data['counters'] == {'tja_lines': 15}
+    assert data['elapsed'] is not None
+    assert timer.summary().startswith('detect ')
+    print("✓ 階段計時正確")
+
+
+def test_process_report():
+    """process_files 記錄每個階段，報告包含每個檔案與總計"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = Path(tmp) / 'report.tja'
+        chart.write_text(CHART, encoding='utf-8')
+        has_ffmpeg = shutil.which('ffmpeg') is not None
+        if has_ffmpeg:
+            subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=1',
+                            os.path.join(tmp, 'song.wav')], check=True)
+        report = RunReport()
+        for speed in (0.9, 1.1):
+            process_files(str(chart), speed, report=report)
+        path = report.write(os.path.join(tmp, 'run.json'))
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        assert len(data['files']) == 2
+        first = data['files'][0]
+        assert first['speed'] == 0.9
+        expected = ['detect', 'read', 'rewrite', 'write', 'find_audio'] + (['encode'] if has_ffmpeg else [])
+        assert list(first['stages']) == expected
+        assert first['counters']['tja_lines'] == CHART.count('\n')
+        assert data['aggregate']['counters']['tja_lines'] == 2 * CHART.count('\n')
+        assert data['aggregate']['files'] == 2
+        assert set(data['aggregate']['stages']) <= set(STAGES)
+        if has_ffmpeg:
+            assert first['counters']['audio_bytes_out'] > 0
+        print("✓ 耗時報告包含每個檔案與總計")
+
+
+def test_cli_report():
+    """CLI --report 寫出報告"""
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = Path(tmp) / 'report.tja'
+        chart.write_text(CHART.replace('WAVE:song.wav\n', ''), encoding='utf-8')
+        report_path = os.path.join(tmp, 'run.json')
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'TJASpeedChanger.py')
+        subprocess.run([sys.executable, script, str(chart), '1.25', '--report', report_path, '--lang', 'en'],
+                       check=True, capture_output=True)
+        with open(report_path, encoding='utf-8') as f:
+            data = json.load(f)
+        assert data['files'][0]['speed'] == 1.25
+        assert 'rewrite' in data['aggregate']['stages']
+        print("✓ CLI 已寫出耗時報告")
+
+
+if __name__ == '__main__':
+    test_stage_timer()
+    test_process_report()
+    test_cli_report()
+    print("\n測試完成!")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+測試分段平行處理
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+from segment_render import choose_cut_points, build_crossfade_graph, render_segmented
+from audio_probe import probe_audio
+from run_report import StageTimer
+
+# 模擬排程器等待FFmpeg執行名額的時間（秒）
+SLOT_WAIT = 1.0
+
+
+class SlowScheduler:
+    """每次取得執行名額前都要等待的排程器"""
+
+    @contextmanager
+    def ffmpeg_slot(self):
+        time.sleep(SLOT_WAIT)
+        yield
+
+
+def test_cut_points():
+    """測試切點選在等分點附近能量最低處"""
+    energy = [(t / 10, -20.0) for t in range(0, 600)]
+    energy[195] = (19.5, -90.0)   # 20秒附近的靜音
+    energy[480] = (48.0, -80.0)   # 距離40秒超過搜尋範圍
+    cuts = choose_cut_points(60.0, 3, energy, search_seconds=5.0)
+    assert cuts[0] == 0.0 and cuts[-1] == 60.0
+    assert cuts[1] == 19.5
+    assert 35.0 <= cuts[2] <= 45.0
+    # 沒有能量資料時使用等分點
+    assert choose_cut_points(60.0, 2, []) == [0.0, 30.0, 60.0]
+    print("✓ 切點選擇正確")
+
+
+def test_crossfade_graph():
+    """測試交叉淡化濾鏡串接"""
+    graph = build_crossfade_graph(3, 0.4)
+    assert graph.count('acrossfade') == 2
+    assert graph.startswith('[0:a][1:a]acrossfade=d=0.400000') and graph.endswith('[out]')
+    assert '[x1][2:a]' in graph
+    print("✓ 交叉淡化濾鏡正確")
+
+
+def test_render_segmented():
+    """測試分段輸出長度與單一程序相同"""
+    if not shutil.which('ffmpeg'):
+        print("⚠️ 找不到FFmpeg，略過分段處理測試")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'long.wav')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=f=440:d=50', '-y', source],
+                       check=True)
+        timer = StageTimer()
+        output = render_segmented(source, os.path.join(tmp, 'long_1.25x.wav'), 1.25, segments=2,
+                                  scheduler=SlowScheduler(), timer=timer)
+        assert output.endswith('long_1.25x.ogg')
+        # 兩段與最後的編碼共三個程序：等待名額的時間不計入 encode
+        assert 0 < timer.stages['encode'] < 3 * SLOT_WAIT, timer.stages
+        assert timer.stages['probe'] > 0
+        duration = probe_audio(output)['duration']
+        assert abs(duration - 40.0) < 0.2, duration
+        # 暫存的分段檔案已清除
+        assert sorted(os.listdir(tmp)) == ['long.wav', 'long_1.25x.ogg']
+        print("✓ 分段處理輸出長度正確")
+
+
+if __name__ == '__main__':
+    test_cut_points()
+    test_crossfade_graph()
+    test_render_segmented()
+    print("\n測試完成!")
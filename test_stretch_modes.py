@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+測試 atempo 與 resample 兩種變速方式
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+
+from TJASpeedChanger import build_speed_filter, build_ffmpeg_command, adjust_audio_speed_ffmpeg
+from audio_probe import probe_audio
+from run_journal import job_key
+from tja_daemon import JobManager
+
+
+def test_speed_filter():
+    """測試變速濾鏡"""
+    assert build_speed_filter(1.2) == 'atempo=1.2'
+    assert build_speed_filter(1.2, 'resample', 44100) == 'asetrate=52920,aresample=44100'
+    # 不知道取樣率時先統一為48kHz
+    assert build_speed_filter(0.8, 'resample') == 'aresample=48000,asetrate=38400,aresample=48000'
+    try:
+        build_speed_filter(1.2, 'rubberband')
+        assert False, 'unknown mode should raise'
+    except ValueError:
+        pass
+    cmd = build_ffmpeg_command('in.wav', 'out.ogg', 1.5, stretch='resample', sample_rate=48000)
+    assert cmd[cmd.index('-filter:a') + 1] == 'asetrate=72000,aresample=48000'
+    print("✓ 變速濾鏡正確")
+
+
+def test_stretch_keys():
+    """測試變速方式加入工作鍵與常駐服務的驗證"""
+    assert job_key('a.tja', 1.1, 'default') == job_key('a.tja', 1.1, 'default', 'atempo')
+    assert job_key('a.tja', 1.1, 'default', 'resample').endswith('|resample')
+    with tempfile.TemporaryDirectory() as tmp:
+        chart = os.path.join(tmp, 'a.tja')
+        open(chart, 'w', encoding='utf-8').close()
+        assert JobManager.validate({'paths': [chart], 'speeds': [1.1], 'stretch': 'resample'})[3] == 'resample'
+        try:
+            JobManager.validate({'paths': [chart], 'speeds': [1.1], 'stretch': 'bogus'})
+            assert False, 'unknown stretch should be rejected'
+        except ValueError:
+            pass
+    print("✓ 變速方式的工作鍵與驗證正確")
+
+
+def test_resample_render():
+    """有FFmpeg時測試 resample 輸出長度與取樣率"""
+    if not shutil.which('ffmpeg'):
+        print("略過 resample 處理測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'song.wav')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=3', '-ar', '44100', source],
+                       check=True)
+        success, output = adjust_audio_speed_ffmpeg(source, os.path.join(tmp, 'song_1.50x.ogg'), 1.5,
+                                                    stretch='resample')
+        assert success
+        info = probe_audio(output)
+        assert abs(info['duration'] - 2.0) < 0.05, info
+        assert info['sample_rate'] == 44100
+        print("✓ resample 輸出長度與取樣率正確")
+
+
+if __name__ == '__main__':
+    test_speed_filter()
+    test_stretch_keys()
+    test_resample_render()
+    print("\n測試完成!")
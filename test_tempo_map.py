@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+測試向量化的時間軸：與沒有NumPy時的逐音符計算結果一致，並可一次計算整個速度列表
+"""
+
+from chart_preview import CourseTiming, parse_chart_lines
+from tempo_map import HAS_NUMPY, parse_courses, parse_tempo_map, peak_density
+from test_chart_preview import CHART
+
+SPEEDS = [0.5, 0.75, 1.0, 1.5, 2.0]
+
+MULTI_COURSE = """TITLE:Multi
+BPM:150
+
+COURSE:Oni
+LEVEL:9
+STYLE:Double
+#START P1
+1111,
+#END
+#START P2
+11,
+#END
+
+COURSE:Hard
+#START
+1,
+#END
+"""
+
+
+def test_matches_fallback():
+    """NumPy時間軸的音符時間、長度與最高密度與沒有NumPy時的計算相同"""
+    if not HAS_NUMPY:
+        print("⚠ 未安裝NumPy，略過測試")
+        return
+    tempo_map = parse_tempo_map(CHART.splitlines())
+    course = tempo_map.courses[0]
+    name, level, player, slots = parse_courses(CHART.splitlines())[1][0]
+    reference = CourseTiming(name, level, slots, player)
+    times = course.note_times(SPEEDS)
+    assert times.shape == (len(SPEEDS), reference.notes)
+    for row, speed in zip(times, SPEEDS):
+        assert max(abs(a - b) for a, b in zip(row, reference.note_times(speed)[0])) < 1e-9
+        assert float(course.peak_density(speed)[0]) == reference.peak_density(speed)[0]
+    assert [round(x, 6) for x in course.lengths(SPEEDS)] == [round(reference.lengths(s), 6) for s in SPEEDS]
+    assert list(course.measure_times()) == [0.0, 2.0, 4.0, 4.75, 5.5]
+    print("✓ 時間軸與逐音符計算一致")
+
+
+def test_course_headers():
+    """沒有 LEVEL 的難度不沿用上一個難度的等級；P1 與 P2 分開計算"""
+    _, courses = parse_courses(MULTI_COURSE.splitlines())
+    assert [(name, level, player) for name, level, player, _ in courses] == [
+        ('Oni', '9', 'P1'), ('Oni', '9', 'P2'), ('Hard', None, None)]
+    preview = parse_chart_lines(MULTI_COURSE.splitlines()).preview(1.0)
+    assert [key for key in preview['courses']] == [('Oni', 'P1'), ('Oni', 'P2'), ('Hard', None)]
+    if HAS_NUMPY:
+        ladder = parse_tempo_map(MULTI_COURSE.splitlines()).evaluate([1.0])
+        assert list(ladder['peak_nps']) == [('Oni', 'P1'), ('Oni', 'P2'), ('Hard', None)]
+        assert ladder['peak_nps'][('Oni', 'P1')][0] != ladder['peak_nps'][('Oni', 'P2')][0]
+    print("✓ 難度標頭與雙人譜面分開記錄")
+
+
+def test_speed_ladder():
+    """整個速度列表一次計算，並選出密度不超過上限的最快速度"""
+    if not HAS_NUMPY:
+        print("⚠ 未安裝NumPy，略過測試")
+        return
+    tempo_map = parse_tempo_map(CHART.splitlines())
+    ladder = tempo_map.evaluate(SPEEDS)
+    assert list(ladder['bpm']) == [60.0, 90.0, 120.0, 180.0, 240.0]
+    assert list(ladder['peak_nps'][('Oni', None)]) == [2.0, 3.0, 4.0, 5.0, 6.0]
+    assert tempo_map.suggest_speed(SPEEDS, 5.0) == 1.5
+    assert tempo_map.suggest_speed(SPEEDS, 5.0, course='Oni') == 1.5
+    assert tempo_map.suggest_speed(SPEEDS, 1.0) is None
+    stats = tempo_map.courses[0].indicators()
+    assert stats['notes'] == 12
+    assert stats['bpm_range'] == (120.0, 240.0)
+    assert round(stats['big_ratio'], 3) == round(2 / 12, 3)
+    # 每列各自計算
+    assert list(peak_density([[0.0, 0.1, 0.2, 5.0], [0.0, 2.0, 4.0, 6.0]])) == [3.0, 1.0]
+    print("✓ 速度列表計算正確")
+
+
+if __name__ == '__main__':
+    test_matches_fallback()
+    test_course_headers()
+    test_speed_ladder()
+    print("\n測試完成!")
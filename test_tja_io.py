@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+測試TJA一次編碼與原子寫入
+"""
+
+import os
+import tempfile
+
+import tja_io
+from tja_io import encode_text, write_bytes_atomic, write_tja_lines, detect_bytes_encoding
+
+
+def test_encode_text():
+    """測試錯誤處理策略只依一次檢查選擇"""
+    assert encode_text('TITLE:テスト\n', 'cp932') == ('TITLE:テスト\n'.encode('cp932'), 'cp932', 'strict')
+    data, encoding, errors = encode_text('TITLE:한국어\n', 'cp932')
+    assert errors == 'xmlcharrefreplace' and b'&#54620;' in data
+    data, encoding, errors = encode_text('TITLE:テスト\n', 'iso-8859-1')
+    assert errors == 'replace' and data == b'TITLE:???\n'
+    assert encode_text('x', 'no-such-codec')[1] == 'utf-8'
+    print("✓ 編碼策略選擇正確")
+
+
+def test_write_tja_lines():
+    """測試原子寫入：成功時不留下暫存檔，失敗時不改動既有檔案"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'song_1.50x.tja')
+        assert write_tja_lines(path, ['TITLE:測試歌曲\n', 'BPM:180.000\n'], 'cp950') == ('cp950', 'strict')
+        with open(path, 'r', encoding='cp950') as f:
+            assert f.read() == 'TITLE:測試歌曲\nBPM:180.000\n'
+        assert os.listdir(tmp) == ['song_1.50x.tja']
+
+        # 寫入途中失敗（模擬 fsync 錯誤）
+        original_fsync = os.fsync
+        def failing_fsync(fd):
+            raise OSError('disk full')
+        os.fsync = failing_fsync
+        try:
+            write_bytes_atomic(path, b'TITLE:partial')
+        except OSError:
+            pass
+        finally:
+            os.fsync = original_fsync
+        with open(path, 'r', encoding='cp950') as f:
+            assert f.read().startswith('TITLE:測試歌曲')
+        assert os.listdir(tmp) == ['song_1.50x.tja']
+        print("✓ 原子寫入不留下不完整檔案")
+
+
+def test_detect_bytes_encoding():
+    """測試快速路徑：BOM、純ASCII與UTF-8不需要 chardet，其餘才試解ANSI編碼"""
+    chart = 'TITLE:{}\nBPM:150\n#START\n' + '1010,\n' * 200 + '#END\n'
+    saved = tja_io.chardet
+    tja_io.chardet = None  # 快速路徑不應使用 chardet
+    try:
+        assert detect_bytes_encoding(chart.format('Song').encode('ascii')) == 'utf-8'
+        assert detect_bytes_encoding(chart.format('夜に駆ける').encode('utf-8')) == 'utf-8'
+        assert detect_bytes_encoding(chart.format('紅蓮華').encode('utf-8-sig')) == 'utf-8-sig'
+        assert detect_bytes_encoding(chart.format('Song').encode('utf-16')) == 'utf-16'
+        # 沒有 chardet 時依序試解
+        assert detect_bytes_encoding(chart.format('測試歌曲').encode('cp950')) == 'cp950'
+        assert detect_bytes_encoding(b'TITLE:Caf\xe9\n') == 'iso-8859-1'
+    finally:
+        tja_io.chardet = saved
+    if saved is not None:
+        assert detect_bytes_encoding(chart.format('テスト楽曲です').encode('cp932')) == 'cp932'
+    print("✓ 編碼偵測快速路徑正確")
+
+
+if __name__ == '__main__':
+    test_encode_text()
+    test_write_tja_lines()
+    test_detect_bytes_encoding()
+    print("\n測試完成!")
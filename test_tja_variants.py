@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+測試變速檔案的辨識：再次處理變速輸出時從原始譜面與音源以合成後的速度產生
+"""
+
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from tja_variants import (provenance_line, read_provenance, resolve_source, variant_tja_path,
+                          speed_wave_filename)
+from TJASpeedChanger import process_files, rewrite_tja_file
+
+CHART = "TITLE:テスト\nBPM:150\nWAVE:song.wav\nOFFSET:-1.5\nDEMOSTART:30\n\n#START\n1010,\n#END\n"
+
+
+def test_naming():
+    """變速檔名"""
+    assert variant_tja_path(os.path.join('pack', 'song.tja'), 1.2) == os.path.join('pack', 'song_1.20x.tja')
+    assert speed_wave_filename('song.wav', 0.9) == 'song_0.90x.ogg'
+    print("✓ 變速檔名正確")
+
+
+def test_resolve_by_suffix_and_provenance():
+    """以檔名後綴或第一行的來源記錄找出原始譜面，並合成速度"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = Path(tmp, 'song.tja')
+        original.write_text(CHART, encoding='utf-8')
+        assert resolve_source(str(original), 1.2) == (str(original), 1.2, 1.0)
+
+        # 只有檔名後綴（舊版產生的檔案）
+        Path(tmp, 'song_1.20x.tja').write_text(CHART, encoding='utf-8')
+        assert resolve_source(os.path.join(tmp, 'song_1.20x.tja'), 0.9) == (str(original), 1.08, 1.2)
+
+        # 改名後仍可由來源記錄找到原始譜面
+        renamed = Path(tmp, 'practice.tja')
+        renamed.write_text(provenance_line(str(original), 0.8) + CHART, encoding='cp932')
+        assert read_provenance(str(renamed)) == ('song.tja', 0.8)
+        assert resolve_source(str(renamed), 1.25) == (str(original), 1.0, 0.8)
+
+        # 找不到原始譜面時照舊處理
+        orphan = Path(tmp, 'other_1.10x.tja')
+        orphan.write_text(CHART, encoding='utf-8')
+        assert resolve_source(str(orphan), 1.1) == (str(orphan), 1.1, 1.0)
+        print("✓ 變速檔案辨識與速度合成正確")
+
+
+def test_rewrite_records_provenance():
+    """輸出的第一行記錄原始譜面，舊的記錄不會重複"""
+    with tempfile.TemporaryDirectory() as tmp:
+        orphan = Path(tmp, 'other_1.10x.tja')
+        orphan.write_text(provenance_line('other.tja', 1.1) + CHART, encoding='utf-8')
+        new_tja_path, _, _ = rewrite_tja_file(str(orphan), 0.9)
+        lines = Path(new_tja_path).read_text(encoding='utf-8').splitlines()
+        assert read_provenance(new_tja_path) == ('other_1.10x.tja', 0.9)
+        assert sum(1 for line in lines if line.startswith('//TJASpeedChanger:')) == 1
+        print("✓ 來源記錄正確")
+
+
+def test_process_variant_uses_original():
+    """再次處理變速輸出時從原始譜面產生，不疊加後綴"""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = Path(tmp, 'song.tja')
+        original.write_text(CHART, encoding='utf-8')
+        variant_path, _ = process_files(str(original), 1.2)  # 沒有音源：只改寫譜面
+        assert variant_path == os.path.join(tmp, 'song_1.20x.tja')
+
+        new_tja_path, _ = process_files(variant_path, 1.25)
+        assert new_tja_path == os.path.join(tmp, 'song_1.50x.tja')
+        text = Path(new_tja_path).read_text(encoding='utf-8')
+        assert 'TITLE:テスト (1.50x)\n' in text and 'BPM:225.000\n' in text
+        assert 'WAVE:song_1.50x.ogg\n' in text
+        assert read_provenance(new_tja_path) == ('song.tja', 1.5)
+        assert not any('x_' in name for name in os.listdir(tmp))
+        print("✓ 變速輸出從原始譜面重新產生")
+
+
+def test_process_variant_audio():
+    """有FFmpeg時音源也由原始音源變速，而非已變速的音源"""
+    if not shutil.which('ffmpeg'):
+        print("略過變速音源測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, 'song.tja').write_text(CHART, encoding='utf-8')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=3',
+                        os.path.join(tmp, 'song.wav')], check=True)
+        variant_path, _ = process_files(os.path.join(tmp, 'song.tja'), 1.5)
+        # 已變速的音源被替換成無法解碼的內容：若被使用則處理失敗
+        Path(tmp, 'song_1.50x.ogg').write_bytes(b'not audio')
+        new_tja_path, audio_path = process_files(variant_path, 0.5)
+        assert new_tja_path == os.path.join(tmp, 'song_0.75x.tja')
+        assert audio_path == os.path.join(tmp, 'song_0.75x.ogg')
+        print("✓ 音源從原始音源變速")
+
+
+if __name__ == '__main__':
+    test_naming()
+    test_resolve_by_suffix_and_provenance()
+    test_rewrite_records_provenance()
+    test_process_variant_uses_original()
+    test_process_variant_audio()
+    print("\n測試完成!")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+測試事件迴圈延遲監測與診斷面板文字（不需要顯示器）
+"""
+
+from job_scheduler import RenderScheduler
+from run_report import StageTimer
+from tk_diagnostics import EventLoopMonitor, format_diagnostics
+
+
+class FakeRoot:
+    """只記錄 after() 排程的回呼"""
+
+    def __init__(self):
+        self.pending = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.pending[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_next(self):
+        after_id = min(self.pending)
+        self.pending.pop(after_id)()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_event_loop_lag():
+    """延遲為實際執行時間減去預定時間，並保留最嚴重的卡頓"""
+    root, clock = FakeRoot(), FakeClock()
+    monitor = EventLoopMonitor(root, interval_ms=100, keep=2, clock=clock).start()
+    for delay in (0.1, 0.105, 0.6, 0.1, 0.35):
+        clock.now += delay
+        root.run_next()
+    stats = monitor.stats()
+    assert stats['samples'] == 5
+    assert [round(lag, 3) for lag, _ in stats['worst']] == [0.5, 0.25]
+    assert stats['stalls'] == 2
+    assert round(stats['last'], 3) == 0.25
+    monitor.stop()
+    assert not root.pending
+    print("✓ 事件迴圈延遲量測正確")
+
+
+def test_callback_measure_and_format():
+    """主執行緒回呼耗時與診斷面板文字"""
+    root, clock = FakeRoot(), FakeClock()
+    monitor = EventLoopMonitor(root, clock=clock)
+    for cost in (0.01, 0.2):
+        with monitor.measure('log_message'):
+            clock.now += cost
+    monitor.record_lag(0.3)
+    scheduler = RenderScheduler(max_workers=2, max_ffmpeg=1)
+    scheduler.submit(lambda: None).result()
+    scheduler.shutdown()
+    timer = StageTimer('a.tja', 1.2)
+    timer.add_time('encode', 1.5)
+    text = format_diagnostics(monitor.stats(), scheduler.stats(),
+                              {'preview clips': {'hits': 3, 'misses': 1}, 'empty': {'hits': 0, 'misses': 0}},
+                              timer)
+    assert 'log_message' in text and '200.0ms' in text
+    assert '300ms' in text
+    assert 'done 1, failed 0' in text
+    assert '3/4 (75%)' in text
+    assert 'running: encode 1500.0ms' in text
+    print("✓ 診斷面板內容正確")
+
+
+if __name__ == '__main__':
+    test_event_loop_lag()
+    test_callback_measure_and_format()
+    print("\n測試完成!")
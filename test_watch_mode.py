@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+測試監看模式
+"""
+
+import os
+import sys
+import time
+import tempfile
+from pathlib import Path
+
+from job_scheduler import RenderScheduler
+from watch_mode import PollingWatcher, WatchQueue, create_watcher, is_watched_file, watch_directory
+
+
+def run_until(watcher, queue, condition, timeout=5.0):
+    """執行監看迴圈直到條件成立或逾時"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        for path in watcher.read_events(timeout=0.05):
+            queue.note(path)
+        queue.flush()
+        if condition():
+            return True
+    return False
+
+
+def check_watcher(watcher, root):
+    scheduler = RenderScheduler(max_workers=2)
+    queue = WatchQueue([0.9, 1.1], scheduler, debounce=0.1)
+    try:
+        Path(root, 'new.tja').write_text("TITLE:New\nBPM:120\n\n#START\n1010,\n#END\n", encoding='utf-8')
+        outputs = [Path(root, 'new_0.90x.tja'), Path(root, 'new_1.10x.tja')]
+        assert run_until(watcher, queue, lambda: all(p.exists() for p in outputs)), "變速檔案未產生"
+        print(f"✓ {watcher.name}: 新譜面已自動處理")
+
+        # 產生的變速檔案不應再觸發處理
+        time.sleep(0.3)
+        for path in watcher.read_events(timeout=0.2):
+            queue.note(path)
+        time.sleep(0.2)
+        assert queue.flush() == 0
+        print(f"✓ {watcher.name}: 輸出檔案不會重新觸發")
+    finally:
+        watcher.close()
+        scheduler.shutdown()
+
+
+def test_is_watched_file():
+    assert is_watched_file('song.tja')
+    assert is_watched_file('Song.OGG')
+    assert not is_watched_file('song_0.90x.tja')
+    assert not is_watched_file('notes.txt')
+
+
+def test_polling_watcher():
+    print("測試輪詢監看...")
+    with tempfile.TemporaryDirectory() as root:
+        check_watcher(PollingWatcher(root, interval=0.05), root)
+
+
+def test_inotify_watcher():
+    if not sys.platform.startswith('linux'):
+        print("略過inotify測試（非Linux）")
+        return
+    print("測試inotify監看...")
+    with tempfile.TemporaryDirectory() as root:
+        watcher = create_watcher(root)
+        check_watcher(watcher, root)
+
+
+def test_vanished_paths():
+    """去抖動期間被刪除的資料夾或譜面只略過，不會中止監看"""
+    scheduler = RenderScheduler(max_workers=1)
+    queue = WatchQueue([0.9], scheduler, debounce=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            gone_dir = os.path.join(root, 'gone')
+            queue.note(os.path.join(gone_dir, 'song.ogg'))
+            assert queue.flush() == 0
+
+            # 譜面在讀取前被刪除：以無法讀取的路徑模擬（資料夾名稱結尾為 .tja）
+            os.mkdir(os.path.join(root, 'broken.tja'))
+            Path(root, 'song.ogg').write_bytes(b'OggS')
+            queue.note(os.path.join(root, 'song.ogg'))
+            assert queue.flush() == 0
+        print("✓ 已消失的路徑被略過")
+    finally:
+        scheduler.shutdown()
+
+
+def test_nextsong_audio():
+    """段位道場以 #NEXTSONG 引用的音源變動時也找到譜面；debounce 必須大於0"""
+    scheduler = RenderScheduler(max_workers=1)
+    queue = WatchQueue([0.9], scheduler, debounce=0.0)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            Path(root, 'dan.tja').write_text("TITLE:Dan\nBPM:120\nWAVE:one.ogg\n\n#START\n"
+                                             "#NEXTSONG Two,,,two.ogg,0,0\n1010,\n#END\n", encoding='utf-8')
+            Path(root, 'single.tja').write_text("TITLE:One\nBPM:120\nWAVE:one.ogg\n\n#START\n#END\n",
+                                                encoding='utf-8')
+            for name in ['one.ogg', 'two.ogg']:
+                Path(root, name).write_bytes(b'OggS')
+            assert queue.charts_for(os.path.join(root, 'two.ogg')) == [os.path.join(root, 'dan.tja')]
+            assert sorted(queue.charts_for(os.path.join(root, 'one.ogg'))) == [
+                os.path.join(root, 'dan.tja'), os.path.join(root, 'single.tja')]
+            try:
+                watch_directory(root, [0.9], debounce=0)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError('debounce=0 should be rejected')
+        print("✓ #NEXTSONG 音源變動時重新處理段位道場譜面")
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    test_is_watched_file()
+    test_polling_watcher()
+    test_inotify_watcher()
+    test_vanished_paths()
+    test_nextsong_audio()
+    print("\n測試完成!")
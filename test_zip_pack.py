@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+測試直接從zip歌曲包處理譜面與音源（不解壓縮）
+"""
+
+import os
+import shutil
+import zipfile
+import tempfile
+import subprocess
+
+from zip_pack import ZipPack, process_zip, safe_member_path
+from tja_variants import read_provenance
+
+CHART = "TITLE:夜に駆ける\r\nBPM:130\r\nWAVE:Song.ogg\r\nOFFSET:-1.2\r\n\r\n#START\r\n1010,\r\n#END\r\n"
+
+
+def make_pack(tmp, audio=None):
+    """建立歌曲包：cp932 譜面、已產生的變速檔案，以及（可選的）音源"""
+    path = os.path.join(tmp, 'pack.zip')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('Pack/Yoru/yoru.tja', CHART.encode('cp932'))
+        zf.writestr('Pack/Yoru/yoru_1.20x.tja', 'TITLE:x (1.20x)\n')
+        zf.writestr('Pack/Other/other.tja', 'TITLE:Other\nBPM:100\nWAVE:missing.ogg\n#START\n#END\n')
+        if audio:
+            zf.write(audio, 'Pack/Yoru/song.wav')
+    return path
+
+
+def test_zip_pack_listing():
+    """譜面清單略過變速檔案，音源查詢不分大小寫並嘗試其他副檔名"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_pack(tmp, audio=__file__)
+        with ZipPack(path) as pack:
+            assert pack.charts() == ['Pack/Other/other.tja', 'Pack/Yoru/yoru.tja']
+            lines, encoding = pack.read_chart('Pack/Yoru/yoru.tja')
+            assert encoding == 'cp932' and lines[0] == 'TITLE:夜に駆ける\n'
+            assert pack.find_audio('Pack/Yoru/yoru.tja', 'Song.ogg') == 'Pack/Yoru/song.wav'
+            assert pack.find_audio('Pack/Yoru/yoru.tja', '..\\Yoru\\song.wav') == 'Pack/Yoru/song.wav'
+            assert pack.find_audio('Pack/Other/other.tja', 'missing.ogg') is None
+        print("✓ 歌曲包清單與音源查詢正確")
+
+
+def test_process_zip_charts():
+    """沒有音源時只寫出譜面；輸出到資料夾與zip的內容相同"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = make_pack(tmp)
+        summary = process_zip(path, [0.8, 1.2], ffmpeg='ffmpeg-does-not-exist')
+        assert summary == {'charts': 4, 'audio': 0, 'failed': []}
+        out_dir = os.path.join(tmp, 'pack_variants')
+        chart = os.path.join(out_dir, 'Pack', 'Yoru', 'yoru_1.20x.tja')
+        with open(chart, encoding='utf-8') as f:
+            text = f.read()
+        assert 'TITLE:夜に駆ける (1.20x)\n' in text and 'WAVE:Song_1.20x.ogg\n' in text
+        assert read_provenance(chart) == ('yoru.tja', 1.2)
+        assert not os.path.exists(os.path.join(out_dir, 'Pack', 'Yoru', 'yoru_1.20x_0.80x.tja'))
+
+        out_zip = os.path.join(tmp, 'out.zip')
+        process_zip(path, [0.8, 1.2], output=out_zip)
+        with zipfile.ZipFile(out_zip) as zf:
+            assert sorted(zf.namelist()) == ['Pack/Other/other_0.80x.tja', 'Pack/Other/other_1.20x.tja',
+                                             'Pack/Yoru/yoru_0.80x.tja', 'Pack/Yoru/yoru_1.20x.tja']
+            with open(chart, 'rb') as f:
+                assert zf.read('Pack/Yoru/yoru_1.20x.tja') == f.read()
+        assert [name for name in os.listdir(tmp) if name.endswith('.tmp')] == []
+        print("✓ 歌曲包譜面寫出到資料夾與zip")
+
+
+def test_process_zip_audio():
+    """有FFmpeg時音源從zip串流給FFmpeg，結果寫入zip"""
+    if not shutil.which('ffmpeg'):
+        print("略過歌曲包音源測試（找不到FFmpeg）")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        audio = os.path.join(tmp, 'song.wav')
+        subprocess.run(['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'sine=duration=2', audio], check=True)
+        path = make_pack(tmp, audio)
+        out_zip = os.path.join(tmp, 'out.zip')
+        summary = process_zip(path, [0.8, 1.25], output=out_zip, workers=2)
+        assert summary == {'charts': 4, 'audio': 2, 'failed': []}
+        with zipfile.ZipFile(out_zip) as zf:
+            for name in ['Pack/Yoru/Song_0.80x.ogg', 'Pack/Yoru/Song_1.25x.ogg']:
+                assert zf.read(name).startswith(b'OggS'), name
+        print("✓ 音源從zip串流處理")
+
+
+def test_process_zip_unsafe_names():
+    """成員名稱與WAVE中的 .. 、絕對路徑不會寫到輸出位置之外（與 ZipFile.extract 相同的整理方式）"""
+    assert safe_member_path('../escape.tja') == 'escape.tja'
+    assert safe_member_path('/abs/./x.tja') == 'abs/x.tja'
+    assert safe_member_path('C:\\Songs\\..\\x.ogg') == 'Songs/x.ogg'
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'pack.zip')
+        with zipfile.ZipFile(path, 'w') as zf:
+            zf.writestr('../escape.tja', 'TITLE:Escape\nBPM:120\n#START\n#END\n')
+            zf.writestr('Pack/Deep/deep.tja', 'TITLE:Deep\nBPM:120\nWAVE:..\\..\\..\\x.wav\n#START\n#END\n')
+            zf.writestr('../x.wav', b'RIFF')
+        out_dir = os.path.join(tmp, 'out', 'variants')
+        summary = process_zip(path, [1.5], output=out_dir, ffmpeg='ffmpeg-does-not-exist')
+        assert summary == {'charts': 2, 'audio': 0, 'failed': ['x_1.50x.ogg']}
+        assert os.path.exists(os.path.join(out_dir, 'escape_1.50x.tja'))
+        assert sorted(os.listdir(os.path.join(tmp, 'out'))) == ['variants']
+
+        out_zip = os.path.join(tmp, 'out.zip')
+        process_zip(path, [1.5], output=out_zip, ffmpeg='ffmpeg-does-not-exist')
+        with zipfile.ZipFile(out_zip) as zf:
+            assert sorted(zf.namelist()) == ['Pack/Deep/deep_1.50x.tja', 'escape_1.50x.tja']
+        print("✓ 不安全的成員名稱與WAVE路徑不會寫到輸出位置之外")
+
+
+if __name__ == '__main__':
+    test_zip_pack_listing()
+    test_process_zip_charts()
+    test_process_zip_audio()
+    test_process_zip_unsafe_names()
+    print("\n測試完成!")
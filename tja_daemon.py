@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+TJA Speed Changer Daemon
+本機常駐服務：以JSON over HTTP接收 process_files 工作，
+所有客戶端共用同一個排程器（FFmpeg並行上限）與已暖機的快取
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from urllib.parse import urlsplit
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from TJASpeedChanger import AUDIO_PROFILES, STRETCH_MODES, process_files, referenced_audio
+from job_scheduler import RenderScheduler
+
+
+DEFAULT_PORT = 8765
+# 佇列上限以工作項目（譜面 x 速度）計算
+DEFAULT_MAX_QUEUE = 256
+# 允許的 Origin 主機（瀏覽器中任意網頁都能向本機服務發出跨站請求）
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+
+
+class QueueFullError(Exception):
+    """工作佇列已滿"""
+
+
+class Job:
+    """一個工作：多個譜面 x 多個速度"""
+
+    def __init__(self, paths, speeds, profile, stretch='atempo'):
+        self.id = uuid.uuid4().hex[:12]
+        self.paths = paths
+        self.speeds = speeds
+        self.profile = profile
+        self.stretch = stretch
+        self.status = 'queued'
+        self.total = len(paths) * len(speeds)
+        self.completed = 0
+        self.results = []
+        self.errors = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self, detail=True):
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'profile': self.profile,
+            'stretch': self.stretch,
+            'progress': {'completed': self.completed, 'total': self.total},
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if detail:
+            data.update({'paths': self.paths, 'speeds': self.speeds,
+                         'results': self.results, 'errors': self.errors})
+        return data
+
+
+class JobManager:
+    """工作管理：驗證、排入共用排程器、追蹤進度"""
+
+    def __init__(self, scheduler, max_queue=DEFAULT_MAX_QUEUE, keep_finished=200):
+        self.scheduler = scheduler
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self._lock = threading.Lock()
+
+    def _active_count(self):
+        return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def _active_tasks(self):
+        """尚未完成的工作項目數（譜面 x 速度）"""
+        return sum(job.total - job.completed for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    @staticmethod
+    def validate(payload):
+        """驗證工作內容，返回 (paths, speeds, profile, stretch)，不合法時拋出 ValueError"""
+        paths = payload.get('paths')
+        speeds = payload.get('speeds')
+        profile = payload.get('profile', 'default')
+        stretch = payload.get('stretch', 'atempo')
+        if not isinstance(paths, list) or not paths:
+            raise ValueError("'paths' must be a non-empty list")
+        if not isinstance(speeds, list) or not speeds:
+            raise ValueError("'speeds' must be a non-empty list")
+        for path in paths:
+            if not isinstance(path, str) or not path.lower().endswith('.tja') or not os.path.isfile(path):
+                raise ValueError(f"not a TJA file: {path}")
+        try:
+            speeds = [float(speed) for speed in speeds]
+        except (TypeError, ValueError):
+            raise ValueError("'speeds' must contain numbers")
+        if not all(0.5 <= speed <= 2.0 for speed in speeds):
+            raise ValueError("speeds must be between 0.5 and 2.0")
+        if profile not in AUDIO_PROFILES:
+            raise ValueError(f"unknown profile: {profile} (available: {', '.join(AUDIO_PROFILES)})")
+        if stretch not in STRETCH_MODES:
+            raise ValueError(f"unknown stretch mode: {stretch} (available: {', '.join(STRETCH_MODES)})")
+        return [os.path.abspath(path) for path in paths], speeds, profile, stretch
+
+    def submit(self, payload):
+        paths, speeds, profile, stretch = self.validate(payload)
+        with self._lock:
+            tasks = len(paths) * len(speeds)
+            if self._active_tasks() + tasks > self.max_queue:
+                raise QueueFullError(f"queue is full ({self._active_tasks()} of {self.max_queue} tasks active, "
+                                     f"job has {tasks})")
+            job = Job(paths, speeds, profile, stretch)
+            self.jobs[job.id] = job
+            self._prune()
+        for path in paths:
+            for speed in speeds:
+                self.scheduler.submit(self._run_task, job, path, speed)
+        return job
+
+    def _run_task(self, job, path, speed):
+        with self._lock:
+            if job.status == 'queued':
+                job.status = 'running'
+                job.started_at = time.time()
+        try:
+            new_tja_path, new_audio_path = process_files(path, speed, scheduler=self.scheduler, profile=job.profile,
+                                                         stretch=job.stretch)
+            # 譜面引用音源卻沒有輸出代表音源處理失敗
+            # 沒有引用音源時 process_files 返回的音源路徑本來就是None
+            if new_audio_path is None and referenced_audio(path):
+                raise RuntimeError(f'audio processing failed (chart written to {new_tja_path})')
+            result = {'path': path, 'speed': speed, 'tja': new_tja_path, 'audio': new_audio_path}
+            error = None
+        except Exception as e:
+            result = None
+            error = {'path': path, 'speed': speed, 'error': str(e)}
+        with self._lock:
+            if result:
+                job.results.append(result)
+            else:
+                job.errors.append(error)
+            job.completed += 1
+            if job.completed == job.total:
+                job.status = 'failed' if job.errors else 'done'
+                job.finished_at = time.time()
+
+    def _prune(self):
+        """只保留最近的已完成工作"""
+        finished = [job for job in self.jobs.values() if job.status in ('done', 'failed')]
+        for job in sorted(finished, key=lambda j: j.finished_at)[:-self.keep_finished or None]:
+            del self.jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict(detail=False) for job in self.jobs.values()]
+
+    def status(self):
+        with self._lock:
+            active = self._active_count()
+            tasks = self._active_tasks()
+        return {'active_jobs': active, 'active_tasks': tasks, 'max_queue': self.max_queue,
+                'scheduler': self.scheduler.stats()}
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """JSON API：POST /jobs、GET /jobs、GET /jobs/<id>、GET /status"""
+
+    server_version = 'TJASpeedChangerDaemon/1.0'
+
+    @property
+    def manager(self):
+        return self.server.manager
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path == '/status':
+            self._send_json(200, self.manager.status())
+        elif path == '/jobs':
+            self._send_json(200, {'jobs': self.manager.list()})
+        elif path.startswith('/jobs/'):
+            job = self.manager.get(path[len('/jobs/'):])
+            if job:
+                self._send_json(200, job)
+            else:
+                self._send_json(404, {'error': 'job not found'})
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def _foreign_origin(self):
+        """瀏覽器發出的請求帶有 Origin；只接受本機服務自己的來源"""
+        origin = self.headers.get('Origin')
+        if origin is None:
+            return False
+        parts = urlsplit(origin)
+        try:
+            port = parts.port or {'http': 80, 'https': 443}.get(parts.scheme)
+        except ValueError:
+            return True
+        return parts.hostname not in LOCAL_HOSTS or port != self.server.server_port
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            self._send_json(404, {'error': 'not found'})
+            return
+        # 只接受JSON：text/plain 等「簡單請求」可由任意網頁跨站送出而不經過CORS預檢
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send_json(415, {'error': 'Content-Type must be application/json'})
+            return
+        if self._foreign_origin():
+            self._send_json(403, {'error': 'cross-origin requests are not allowed'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError('request body must be a JSON object')
+            job = self.manager.submit(payload)
+        except QueueFullError as e:
+            self._send_json(429, {'error': str(e)})
+        except ValueError as e:
+            self._send_json(400, {'error': str(e)})
+        else:
+            self._send_json(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(host='127.0.0.1', port=DEFAULT_PORT, workers=None, max_ffmpeg=None, max_queue=DEFAULT_MAX_QUEUE,
+                  verbose=False):
+    """建立服務（尚未開始服務）"""
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    server.scheduler = RenderScheduler(max_workers=workers, max_ffmpeg=max_ffmpeg)
+    server.manager = JobManager(server.scheduler, max_queue=max_queue)
+    server.verbose = verbose
+    return server
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=None, max_ffmpeg=None, max_queue=DEFAULT_MAX_QUEUE,
+          verbose=True):
+    """啟動服務直到 Ctrl+C"""
+    server = create_server(host, port, workers, max_ffmpeg, max_queue, verbose)
+    print(f"🚀 TJA Speed Changer daemon listening on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.scheduler.shutdown(wait=True)
+        print("🛑 Daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the TJA Speed Changer job daemon on localhost')
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: localhost only)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Listen port')
+    parser.add_argument('--workers', type=int, default=None, help='Maximum concurrent jobs')
+    parser.add_argument('--max-ffmpeg', type=int, default=None, help='Maximum concurrent FFmpeg processes')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help='Maximum number of queued or running tasks (charts x speeds)')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.max_ffmpeg, args.max_queue)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
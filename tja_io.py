@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+TJA I/O
+TJA檔案讀寫共用工具：快速偵測編碼；在記憶體中一次編碼，再以暫存檔加重新命名的方式原子寫入
+"""
+
+import os
+import uuid
+import codecs
+import shutil
+
+try:
+    import chardet
+except ImportError:
+    chardet = None
+
+
+# 無法以原始編碼表示的字元，CJK編碼以字元參照保留，其餘以替代字元取代
+CJK_ENCODINGS = ('shift_jis', 'cp932', 'big5', 'cp950', 'gbk')
+# chardet 無法判斷時依序嘗試的編碼（ANSI Big5 優先），最後以 latin-1 解讀
+TRIAL_ENCODINGS = ('cp950', 'cp932', 'gbk', 'euc-jp')
+# 西歐語系譜面的編碼（只在 chardet 排名第一時採用，否則 CJK 編碼優先）
+LATIN_ENCODINGS = ('windows-1252', 'iso-8859-1')
+# chardet 每次餵入的大小與最多檢查的位元組數
+CHARDET_CHUNK = 2048
+CHARDET_LIMIT = 32 * 1024
+# 高於此信心度時直接採用 chardet 的結果（仍以整份內容嚴格解碼驗證）；
+# 在 encoding_corpus 的完整、無歌詞與只有標題的譜面中，錯誤結果的信心度都低於0.06，
+# 含歌詞的 GBK、EUC-JP 正確結果則常在0.4到0.6之間
+CHARDET_MIN_CONFIDENCE = 0.3
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+
+def normalize_encoding(name):
+    """將 chardet 的編碼名稱統一為 ANSI 編碼（cp950、cp932、gbk）"""
+    name = name.lower()
+    if 'big5' in name or 'cp950' in name:
+        return 'cp950'
+    if name.startswith('gb') or name == 'hz-gb-2312':
+        return 'gbk'
+    if 'shift' in name or 'sjis' in name or 'cp932' in name:
+        return 'cp932'
+    return name
+
+
+def _decodes(data, encoding):
+    try:
+        data.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return False
+    return True
+
+
+def _chardet_guesses(data, trials=TRIAL_ENCODINGS):
+    """以 UniversalDetector 逐段偵測，確定後提早結束，返回依序嘗試的編碼
+
+    譜面的音符與指令都是ASCII，只把含有非ASCII字元的行（標題、歌詞等）交給 chardet。
+    只有短標題時信心度很低（常低於0.1）但排名仍可靠：改用 detect_all 的排名，
+    只考慮譜面常見的編碼，避免 GBK 標題落到試解順序的 cp950 而變成亂碼
+    """
+    data = b'\n'.join(line for line in data.splitlines() if not line.isascii())[:CHARDET_LIMIT]
+    detector = chardet.UniversalDetector()
+    for start in range(0, len(data), CHARDET_CHUNK):
+        detector.feed(data[start:start + CHARDET_CHUNK])
+        if detector.done:
+            break
+    result = detector.close()
+    if result and result.get('encoding') and result.get('confidence', 0) >= CHARDET_MIN_CONFIDENCE:
+        return [normalize_encoding(result['encoding'])]
+    ranked = [normalize_encoding(candidate['encoding'])
+              for candidate in chardet.detect_all(data, ignore_threshold=True) if candidate.get('encoding')]
+    guesses = ranked[:1] if ranked and ranked[0] in trials + LATIN_ENCODINGS else []
+    return guesses + [name for name in ranked if name in trials]
+
+
+def detect_bytes_encoding(data, trials=TRIAL_ENCODINGS):
+    """偵測TJA內容的編碼
+
+    依序檢查：BOM、純ASCII、嚴格UTF-8解碼（大部分譜面在這裡就決定），
+    只有無法判斷的內容才交給 chardet（逐段、提早結束）並以整份內容驗證，最後依序嘗試 CJK 編碼
+    """
+    for bom, encoding in _BOMS:
+        if data.startswith(bom):
+            return encoding
+    if data.isascii():
+        return 'utf-8'
+    if _decodes(data, 'utf-8'):
+        return 'utf-8'
+    if chardet is not None:
+        for guess in _chardet_guesses(data, trials):
+            if _decodes(data, guess):
+                return guess
+    for encoding in trials:
+        if _decodes(data, encoding):
+            return encoding
+    return 'iso-8859-1'
+
+
+def detect_file_encoding(file_path):
+    """檢測檔案編碼（讀取失敗時返回 utf-8）"""
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return 'utf-8'
+    return detect_bytes_encoding(data)
+
+
+def encode_text(text, encoding):
+    """將文字編碼為位元組，返回 (位元組, 實際編碼, 錯誤處理策略)
+
+    先以嚴格模式編碼；失敗時只依編碼類型選一次錯誤處理策略，
+    編碼名稱無效時改用UTF-8
+    """
+    try:
+        return text.encode(encoding, 'strict'), encoding, 'strict'
+    except UnicodeEncodeError:
+        errors = 'xmlcharrefreplace' if encoding.lower() in CJK_ENCODINGS else 'replace'
+        return text.encode(encoding, errors), encoding, errors
+    except LookupError:
+        return text.encode('utf-8', 'replace'), 'utf-8', 'replace'
+
+
+def write_bytes_atomic(path, data):
+    """寫入暫存檔並 fsync 後以 os.replace 取代目標檔案，中斷時不會留下不完整的檔案"""
+    dir_name = os.path.dirname(os.path.abspath(path))
+    temp_path = os.path.join(dir_name, f'.{os.path.basename(path)}.{uuid.uuid4().hex[:8]}.tmp')
+    # 權限與一般 open() 相同（0o666 套用 umask）
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def copy_atomic(source, target):
+    """將 source 複製到暫存檔後以 os.replace 取代 target，中斷時不會留下不完整的檔案
+
+    不使用硬連結：FFmpeg以 -y 覆寫輸出時會就地截斷並重寫同一個inode，
+    共用inode的其他輸出會一起被破壞
+    """
+    dir_name = os.path.dirname(os.path.abspath(target))
+    temp_path = os.path.join(dir_name, f'.{os.path.basename(target)}.{uuid.uuid4().hex[:8]}.tmp')
+    try:
+        shutil.copy2(source, temp_path)
+        os.replace(temp_path, target)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def tja_bytes(lines, encoding):
+    """將TJA內容編碼為檔案內容，返回 (位元組, 實際編碼, 錯誤處理策略)
+
+    換行符號與文字模式寫入相同（使用平台的 os.linesep）
+    """
+    text = ''.join(lines)
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return encode_text(text, encoding)
+
+
+def write_tja_lines(path, lines, encoding):
+    """以指定編碼一次寫出TJA內容，返回 (實際編碼, 錯誤處理策略)"""
+    data, used_encoding, errors = tja_bytes(lines, encoding)
+    write_bytes_atomic(path, data)
+    return used_encoding, errors
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+TJA Variants
+變速輸出檔案的命名與來源記錄：<原檔名>_<速度>x.tja 與 <音源>_<速度>x.ogg，
+輸出的譜面第一行記錄原始譜面與相對原始譜面的速度。
+再次處理變速檔案時改為從原始譜面與音源以合成後的速度產生，不會疊加後綴，也不會再次變速已變速的音源
+"""
+
+import os
+import re
+import json
+import codecs
+
+
+# 變速輸出檔案的命名格式：<原檔名>_<速度>x.<副檔名>
+VARIANT_PATTERN = re.compile(r'^(?P<base>.+)_(?P<speed>\d+\.\d{2})x$')
+# 來源記錄（TJA註解，放在第一行）
+PROVENANCE_PREFIX = '//TJASpeedChanger:'
+# 追溯來源的最大層數（避免錯誤的記錄造成循環）
+MAX_DEPTH = 8
+
+
+def variant_suffix(speed):
+    return f'_{speed:.2f}x'
+
+
+def variant_tja_path(tja_path, speed):
+    """變速後的譜面路徑"""
+    base, ext = os.path.splitext(tja_path)
+    return f'{base}{variant_suffix(speed)}{ext}'
+
+
+def speed_wave_filename(wave_filename, speed):
+    """變速後的音源檔名（始終轉換為OGG格式）"""
+    file_root, _ = os.path.splitext(wave_filename)
+    return f'{file_root}{variant_suffix(speed)}.ogg'
+
+
+def parse_variant_name(file_name):
+    """若檔名為變速輸出，返回 (原始主檔名, 速度)，否則返回 None"""
+    stem = os.path.splitext(file_name)[0]
+    match = VARIANT_PATTERN.match(stem)
+    if not match:
+        return None
+    return match.group('base'), float(match.group('speed'))
+
+
+def provenance_line(source_path, speed):
+    """輸出譜面的第一行：原始譜面檔名與相對的速度（JSON只使用ASCII，任何編碼都能寫入）"""
+    data = json.dumps({'source': os.path.basename(source_path), 'speed': round(speed, 6)})
+    return f'{PROVENANCE_PREFIX} {data}\n'
+
+
+def is_provenance_line(line):
+    return line.lstrip('\ufeff').startswith(PROVENANCE_PREFIX)
+
+
+def read_provenance(tja_path):
+    """讀取譜面第一行的來源記錄，返回 (原始譜面檔名, 速度) 或 None（只讀取檔案開頭）"""
+    try:
+        with open(tja_path, 'rb') as f:
+            head = f.read(1024)
+    except OSError:
+        return None
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        line = head.decode('utf-16', errors='ignore')
+    else:
+        # 記錄只含ASCII，任何ASCII相容的編碼都可以直接比對
+        line = head.decode('latin-1')
+    line = line.lstrip('\ufeff').lstrip('\xef\xbb\xbf').splitlines()[0] if head else ''
+    if not line.startswith(PROVENANCE_PREFIX):
+        return None
+    try:
+        data = json.loads(line[len(PROVENANCE_PREFIX):])
+        return str(data['source']), float(data['speed'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def compose_speed(base_speed, speed):
+    return round(base_speed * speed, 6)
+
+
+def _direct_source(tja_path):
+    """此譜面的直接來源 (原始譜面路徑, 速度)：來源記錄優先，其次為檔名後綴；來源不存在時返回 None"""
+    dir_name = os.path.dirname(tja_path)
+    candidates = []
+    provenance = read_provenance(tja_path)
+    if provenance:
+        candidates.append((os.path.join(dir_name, provenance[0]), provenance[1]))
+    parsed = parse_variant_name(os.path.basename(tja_path))
+    if parsed:
+        candidates.append((os.path.join(dir_name, parsed[0] + os.path.splitext(tja_path)[1]), parsed[1]))
+    for source, speed in candidates:
+        if speed > 0 and os.path.isfile(source) and os.path.abspath(source) != os.path.abspath(tja_path):
+            return source, speed
+    return None
+
+
+def resolve_source(tja_path, speed):
+    """找出變速檔案的原始譜面，返回 (原始譜面路徑, 相對原始譜面的速度, 輸入譜面相對原始譜面的速度)
+
+    例如 song_1.20x.tja 以 0.9 倍處理時返回 (song.tja, 1.08, 1.2)；
+    不是變速檔案或找不到原始譜面時返回 (tja_path, speed, 1.0)
+    """
+    base_speed = 1.0
+    seen = {os.path.abspath(tja_path)}
+    for _ in range(MAX_DEPTH):
+        source = _direct_source(tja_path)
+        if source is None or os.path.abspath(source[0]) in seen:
+            break
+        tja_path = source[0]
+        base_speed = compose_speed(base_speed, source[1])
+        seen.add(os.path.abspath(tja_path))
+    return tja_path, compose_speed(base_speed, speed), base_speed
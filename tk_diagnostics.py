@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tk Diagnostics
+事件迴圈延遲監測：定期排程 after() 並量測實際執行時間與預定時間的差距，
+記錄最嚴重的卡頓與主執行緒上耗時最久的回呼；診斷面板即時顯示這些資料與排程器、快取、各階段耗時
+"""
+
+import time
+import heapq
+import threading
+import tkinter as tk
+from tkinter import scrolledtext
+from collections import deque
+from contextlib import contextmanager
+
+
+# 監測間隔（毫秒）
+MONITOR_INTERVAL_MS = 100
+# 超過此延遲（秒）視為卡頓
+STALL_SECONDS = 0.1
+# 面板更新間隔（毫秒）
+PANEL_REFRESH_MS = 500
+
+
+class EventLoopMonitor:
+    """量測 after() 回呼的延遲
+
+    root 只需要提供 after() 與 after_cancel()；clock 可替換以便測試
+    """
+
+    def __init__(self, root, interval_ms=MONITOR_INTERVAL_MS, keep=10, clock=time.perf_counter):
+        self.root = root
+        self.interval = interval_ms / 1000.0
+        self.interval_ms = interval_ms
+        self.keep = keep
+        self.clock = clock
+        self.recent = deque(maxlen=max(1, int(10.0 / self.interval)))  # 約最近10秒
+        self.samples = 0
+        self.stalls = 0
+        self.worst = []          # 最嚴重卡頓的 (延遲, 發生時間) min-heap
+        self.callbacks = {}      # 名稱 -> [次數, 總秒數, 最長秒數]
+        self._expected = None
+        self._after_id = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._after_id is None:
+            self._schedule()
+        return self
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _schedule(self):
+        self._expected = self.clock() + self.interval
+        self._after_id = self.root.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        self.record_lag(max(0.0, self.clock() - self._expected))
+        self._schedule()
+
+    def record_lag(self, lag):
+        with self._lock:
+            self.samples += 1
+            self.recent.append(lag)
+            if lag >= STALL_SECONDS:
+                self.stalls += 1
+            entry = (lag, time.strftime('%H:%M:%S'))
+            if len(self.worst) < self.keep:
+                heapq.heappush(self.worst, entry)
+            elif lag > self.worst[0][0]:
+                heapq.heapreplace(self.worst, entry)
+
+    @contextmanager
+    def measure(self, name):
+        """量測主執行緒上的一段程式（例如 log_message），找出造成卡頓的回呼"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            with self._lock:
+                entry = self.callbacks.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+
+    def stats(self):
+        with self._lock:
+            recent = list(self.recent)
+            return {
+                'samples': self.samples,
+                'last': recent[-1] if recent else 0.0,
+                'average': sum(recent) / len(recent) if recent else 0.0,
+                'max_recent': max(recent) if recent else 0.0,
+                'stalls': self.stalls,
+                'worst': sorted(self.worst, reverse=True),
+                'callbacks': {name: tuple(values) for name, values in self.callbacks.items()},
+            }
+
+
+def _hit_rate(stats):
+    total = stats.get('hits', 0) + stats.get('misses', 0)
+    return f"{stats.get('hits', 0)}/{total} ({stats.get('hits', 0) / total:.0%})" if total else '-'
+
+
+def format_diagnostics(loop_stats, scheduler=None, caches=None, timer=None):
+    """將診斷資料格式化為面板文字
+
+    scheduler 為 RenderScheduler.stats()，caches 為 {名稱: stats()}，timer 為最近一次的 StageTimer
+    """
+    ms = 1000.0
+    lines = [
+        '== Event loop ==',
+        f"lag last {loop_stats['last'] * ms:.1f}ms, avg {loop_stats['average'] * ms:.1f}ms, "
+        f"max(10s) {loop_stats['max_recent'] * ms:.1f}ms",
+        f"stalls >= {STALL_SECONDS * ms:.0f}ms: {loop_stats['stalls']} of {loop_stats['samples']} samples",
+    ]
+    for lag, when in loop_stats['worst']:
+        if lag >= STALL_SECONDS:
+            lines.append(f'  {when}  {lag * ms:.0f}ms')
+    if loop_stats['callbacks']:
+        lines.append('== UI callbacks (count, avg, max) ==')
+        ranked = sorted(loop_stats['callbacks'].items(), key=lambda item: item[1][2], reverse=True)
+        for name, (count, total, longest) in ranked:
+            lines.append(f'  {name:<18}{count:>6}{total / count * ms:>9.1f}ms{longest * ms:>9.1f}ms')
+    if scheduler:
+        lines.append('== Jobs ==')
+        lines.append(f"queued {scheduler['queued']}, running {scheduler['running']}/{scheduler['max_workers']}, "
+                     f"FFmpeg {scheduler['running_ffmpeg']}/{scheduler['max_ffmpeg']}, "
+                     f"done {scheduler['completed']}, failed {scheduler['failed']}")
+    if caches:
+        lines.append('== Cache hit rate ==')
+        for name, stats in caches.items():
+            lines.append(f'  {name:<18}{_hit_rate(stats)}')
+    if timer is not None:
+        lines.append('== Last run ==')
+        elapsed = f'{timer.elapsed:.2f}s' if timer.elapsed is not None else 'running'
+        lines.append(f'  {elapsed}: {timer.summary() or "-"}')
+    return '\n'.join(lines)
+
+
+class DiagnosticsPanel:
+    """即時診斷視窗（Toplevel），每 PANEL_REFRESH_MS 毫秒以 collect() 的結果更新"""
+
+    def __init__(self, root, title, collect):
+        self.root = root
+        self.collect = collect
+        self.window = tk.Toplevel(root)
+        self.window.title(title)
+        self.window.geometry('560x420')
+        self.text = scrolledtext.ScrolledText(self.window, font=('Courier', 9), wrap=tk.NONE)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.window.protocol('WM_DELETE_WINDOW', self.close)
+        self._after_id = None
+        self.refresh()
+
+    @property
+    def is_open(self):
+        return self.window is not None
+
+    def refresh(self):
+        text = self.collect()
+        self.text.config(state='normal')
+        self.text.delete('1.0', tk.END)
+        self.text.insert(tk.END, text)
+        self.text.config(state='disabled')
+        self._after_id = self.root.after(PANEL_REFRESH_MS, self.refresh)
+
+    def lift(self):
+        self.window.deiconify()
+        self.window.lift()
+
+    def close(self):
+        if self._after_id:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.window.destroy()
+        self.window = None
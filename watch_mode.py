@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Watch Mode
+監看資料夾，自動以設定的速度列表處理新增或變更的譜面與音源。
+Linux使用inotify，其他平台或inotify不可用時改用輪詢。
+"""
+
+import os
+import sys
+import time
+import struct
+import select
+import ctypes
+import ctypes.util
+
+from TJASpeedChanger import get_text, process_files, detect_file_encoding, referenced_audio
+from audio_lookup import DEFAULT_AUDIO_EXTENSIONS, default_audio_index
+from job_scheduler import RenderScheduler
+from library_index import parse_variant_name
+
+
+# inotify 事件旗標
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_watched_file(path):
+    """只處理原始譜面與音源，忽略本工具產生的變速檔案"""
+    name = os.path.basename(path)
+    ext = os.path.splitext(name)[1].lower()
+    if ext != '.tja' and ext not in DEFAULT_AUDIO_EXTENSIONS:
+        return False
+    return parse_variant_name(name) is None
+
+
+def iter_files(root):
+    """遞迴列出目錄下所有檔案 (路徑, stat)"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            yield entry.path, entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+class PollingWatcher:
+    """輪詢監看 - 比較 (mtime, size) 快照"""
+
+    name = 'polling'
+
+    def __init__(self, root, interval=1.0):
+        self.root = root
+        self.interval = interval
+        self._snapshot = self._take_snapshot()
+        self._next_poll = time.monotonic() + interval
+
+    def _take_snapshot(self):
+        return {path: (st.st_mtime_ns, st.st_size) for path, st in iter_files(self.root)}
+
+    def read_events(self, timeout):
+        """等待至多 timeout 秒，返回有變動的檔案路徑"""
+        wait = self._next_poll - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self._next_poll = time.monotonic() + self.interval
+        snapshot = self._take_snapshot()
+        changed = [path for path, state in snapshot.items() if self._snapshot.get(path) != state]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """inotify 監看（僅Linux），遞迴監看所有子目錄"""
+
+    name = 'inotify'
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.root = root
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_watch(self, dir_path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd >= 0:
+            self._dirs[wd] = dir_path
+
+    def _add_tree(self, root):
+        self._add_watch(root)
+        for dir_path, dir_names, _ in os.walk(root):
+            for name in dir_names:
+                self._add_watch(os.path.join(dir_path, name))
+
+    def read_events(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        changed = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # 事件佇列溢位，改為列出所有檔案
+                changed.extend(path for path, _ in iter_files(self.root))
+                continue
+            if mask & IN_IGNORED or wd not in self._dirs:
+                self._dirs.pop(wd, None)
+                continue
+            path = os.path.join(self._dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                # 新資料夾：加入監看並處理其中已存在的檔案
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                    changed.extend(p for p, _ in iter_files(path))
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def create_watcher(root, poll_interval=1.0):
+    """優先使用inotify，失敗時回退到輪詢"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(root, poll_interval)
+
+
+class WatchQueue:
+    """去抖動佇列：檔案在 debounce 秒內沒有新事件才送出處理"""
+
+    def __init__(self, speeds, scheduler, lang='en', debounce=2.0, profile='default', stretch='atempo'):
+        self.speeds = speeds
+        self.profile = profile
+        self.stretch = stretch
+        self.scheduler = scheduler
+        self.lang = lang
+        self.debounce = debounce
+        self._pending = {}
+        self._in_flight = {}
+
+    def note(self, path):
+        if is_watched_file(path):
+            self._pending[path] = time.monotonic()
+
+    def charts_for(self, path):
+        """變動的檔案對應到哪些譜面（音源變動時找出以 WAVE 或段位道場 #NEXTSONG 引用它的譜面）
+
+        去抖動期間被刪除或改名的檔案與資料夾略過並記錄，不會中止監看
+        """
+        if path.lower().endswith('.tja'):
+            return [path] if os.path.exists(path) else []
+        base_dir = os.path.dirname(path)
+        default_audio_index.invalidate(base_dir)
+        charts = []
+        try:
+            names = os.listdir(base_dir)
+        except OSError as e:
+            print(get_text('watch_skipped', self.lang).format(base_dir, e))
+            return charts
+        for name in names:
+            chart = os.path.join(base_dir, name)
+            if not name.lower().endswith('.tja') or parse_variant_name(name):
+                continue
+            try:
+                audio = [default_audio_index.find(base_dir, name)
+                         for name in referenced_audio(chart, detect_file_encoding(chart))]
+            except OSError as e:
+                print(get_text('watch_skipped', self.lang).format(chart, e))
+                continue
+            if any(found and os.path.normcase(found) == os.path.normcase(path) for found in audio):
+                charts.append(chart)
+        return charts
+
+    def flush(self):
+        """送出已穩定的檔案，返回本次排入的工作數"""
+        now = time.monotonic()
+        ready = [path for path, seen in self._pending.items() if now - seen >= self.debounce]
+        charts = []
+        for path in ready:
+            del self._pending[path]
+            for chart in self.charts_for(path):
+                if chart not in charts:
+                    charts.append(chart)
+
+        # 清除已完成的工作記錄
+        self._in_flight = {c: f for c, f in self._in_flight.items() if not f.done()}
+
+        queued = 0
+        for chart in charts:
+            future = self._in_flight.get(chart)
+            if future is not None and not future.done():
+                # 仍在處理中，稍後重新排入
+                self._pending[chart] = now
+                continue
+            default_audio_index.invalidate(os.path.dirname(chart))
+            self._in_flight[chart] = self.scheduler.submit(self._process_chart, chart)
+            for speed in self.speeds:
+                print(get_text('watch_queued', self.lang).format(chart, speed))
+            queued += 1
+        return queued
+
+    def _process_chart(self, chart):
+        for speed in self.speeds:
+            try:
+                process_files(chart, speed, self.lang, scheduler=self.scheduler, profile=self.profile,
+                              stretch=self.stretch)
+            except Exception as e:
+                print(get_text('error_occurred', self.lang).format(e))
+
+
+def watch_directory(root, speeds, lang='en', workers=None, debounce=2.0, poll_interval=1.0, profile='default',
+                    stretch='atempo'):
+    """長時間執行的監看迴圈，Ctrl+C 結束
+
+    debounce 必須大於0（為0時等待事件的逾時也是0，迴圈會空轉）
+    """
+    if debounce <= 0:
+        raise ValueError(f"debounce must be positive: {debounce}")
+    root = os.path.abspath(root)
+    scheduler = RenderScheduler(max_workers=workers)
+    watcher = create_watcher(root, poll_interval)
+    queue = WatchQueue(speeds, scheduler, lang, debounce, profile, stretch)
+    print(get_text('watch_started', lang).format(root, watcher.name, ', '.join(f'{s:.2f}x' for s in speeds)))
+    try:
+        while True:
+            for path in watcher.read_events(timeout=min(0.5, debounce)):
+                queue.note(path)
+            queue.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        scheduler.shutdown(wait=True)
+        print(get_text('watch_stopped', lang))
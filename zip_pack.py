@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Zip Pack
+直接從zip歌曲包讀取譜面與音源，不需先解壓縮到磁碟：
+譜面在記憶體中改寫，音源成員以管線（pipe:0）串流給FFmpeg，
+結果寫入資料夾或另一個zip（保留包內的資料夾結構，只寫出變速後的檔案）
+
+用法: python TJASpeedChanger.py --zip pack.zip --speeds 0.8,1.2 [--zip-output out.zip|資料夾]
+"""
+
+import os
+import io
+import ntpath
+import shutil
+import zipfile
+import tempfile
+import posixpath
+import threading
+import subprocess
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from TJASpeedChanger import get_text, rewrite_tja_lines, build_ffmpeg_command, AUDIO_PROFILES, STRETCH_MODES
+from audio_lookup import DirectoryListing, DEFAULT_AUDIO_EXTENSIONS
+from job_scheduler import default_ffmpeg_limit
+from tja_io import detect_bytes_encoding, tja_bytes, write_tja_lines
+from tja_variants import parse_variant_name, variant_tja_path
+
+# 容器需要隨機存取（moov 可能在檔尾），無法從管線讀取，先解壓縮到暫存檔
+SEEKABLE_EXTENSIONS = ('.m4a', '.mp4')
+# 寫入FFmpeg管線的區塊大小
+PIPE_CHUNK = 1024 * 1024
+
+
+class RenderError(Exception):
+    """FFmpeg處理音源成員失敗"""
+
+
+def safe_member_path(name):
+    """將成員名稱整理為歌曲包內的相對路徑（與 ZipFile.extract 相同）
+
+    去掉磁碟代號、開頭的斜線以及 . 與 .. ，避免 ../escape.tja 或 WAVE:..\\..\\x.ogg 寫到輸出資料夾之外
+    """
+    name = ntpath.splitdrive(name.replace('\\', '/'))[1]
+    return '/'.join(part for part in name.split('/') if part not in ('', '.', '..'))
+
+
+class ZipPack:
+    """zip歌曲包的唯讀檔案系統：譜面清單、編碼偵測與不分大小寫的音源查詢"""
+
+    def __init__(self, path, metadata_encoding=None):
+        self.path = path
+        # 未標記UTF-8的日文歌曲包檔名多為cp932（需要Python 3.11以上）
+        kwargs = {'metadata_encoding': metadata_encoding} if metadata_encoding else {}
+        self.zip = zipfile.ZipFile(path, **kwargs)
+        self.members = {info.filename: info for info in self.zip.infolist() if not info.is_dir()}
+        names = {}
+        for name in self.members:
+            dir_name, file_name = posixpath.split(name)
+            names.setdefault(dir_name, []).append(file_name)
+        # 每個資料夾一份檔名清單（與磁碟上的查詢規則相同）
+        self.listings = {dir_name: DirectoryListing(dir_name, files) for dir_name, files in names.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.zip.close()
+
+    def charts(self):
+        """包內的原始譜面（略過已產生的變速檔案）"""
+        return sorted(name for name in self.members
+                      if name.lower().endswith('.tja') and not parse_variant_name(posixpath.basename(name)))
+
+    def read_chart(self, member):
+        """讀取譜面，返回 (內容行列表, 編碼)；換行符號與文字模式讀取相同"""
+        data = self.zip.read(member)
+        encoding = detect_bytes_encoding(data)
+        return io.StringIO(data.decode(encoding, errors='ignore'), newline=None).readlines(), encoding
+
+    def find_audio(self, chart_member, wave_filename, extensions=DEFAULT_AUDIO_EXTENSIONS):
+        """尋找譜面引用的音源成員，返回成員名稱或 None"""
+        if not wave_filename:
+            return None
+        # WAVE可能包含子目錄（Windows譜面使用反斜線）
+        wave_path = posixpath.normpath(posixpath.join(posixpath.dirname(chart_member),
+                                                      wave_filename.replace('\\', '/')))
+        dir_name, file_name = posixpath.split(wave_path)
+        listing = self.listings.get(dir_name)
+        actual = listing.match(file_name, extensions) if listing else None
+        return posixpath.join(dir_name, actual) if actual else None
+
+    def open(self, member):
+        return self.zip.open(member)
+
+
+class DirectoryOutput:
+    """將結果寫入資料夾（依成員路徑建立子資料夾）"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def path(self, name):
+        path = os.path.join(self.root, *safe_member_path(name).split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def write_tja(self, name, lines):
+        write_tja_lines(self.path(name), lines, 'utf-8')
+
+    @contextmanager
+    def audio_target(self, name):
+        """返回FFmpeg的輸出路徑"""
+        yield self.path(name)
+
+
+class ZipOutput:
+    """將結果寫入zip：先寫入暫存檔，完成後才以 os.replace 取代目標，中斷時不會留下不完整的zip"""
+
+    def __init__(self, path):
+        self.path = path
+        dir_name = os.path.dirname(os.path.abspath(path))
+        fd, self.temp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=dir_name)
+        os.close(fd)
+        self.zip = zipfile.ZipFile(self.temp_path, 'w')
+        self.work_dir = tempfile.mkdtemp(prefix='tja_zip_')
+        # zipfile 同時只能寫入一個成員
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.zip.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        if exc_type is None:
+            os.replace(self.temp_path, self.path)
+        else:
+            os.unlink(self.temp_path)
+
+    def write_tja(self, name, lines):
+        data, _, _ = tja_bytes(lines, 'utf-8')
+        with self._lock:
+            self.zip.writestr(safe_member_path(name), data, compress_type=zipfile.ZIP_DEFLATED)
+
+    @contextmanager
+    def audio_target(self, name):
+        """FFmpeg輸出到暫存檔（可平行處理），成功後才加入zip（OGG已壓縮，不再壓縮）"""
+        fd, temp_path = tempfile.mkstemp(suffix='.ogg', dir=self.work_dir)
+        os.close(fd)
+        try:
+            yield temp_path
+            with self._lock:
+                self.zip.write(temp_path, safe_member_path(name), compress_type=zipfile.ZIP_STORED)
+        finally:
+            os.unlink(temp_path)
+
+
+def open_output(path):
+    """副檔名為 .zip 時輸出為zip，否則輸出到資料夾"""
+    if path.lower().endswith('.zip'):
+        return ZipOutput(path)
+    return DirectoryOutput(path)
+
+
+def default_output_path(archive):
+    return os.path.splitext(archive)[0] + '_variants'
+
+
+def _feed(source, stdin):
+    """將zip成員寫入FFmpeg的標準輸入（FFmpeg提早結束時停止）"""
+    try:
+        with source:
+            shutil.copyfileobj(source, stdin, PIPE_CHUNK)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def render_member(pack, member, output_path, speed, profile='default', stretch='atempo', ffmpeg='ffmpeg'):
+    """將音源成員變速輸出為OGG，失敗時拋出 RenderError（找不到FFmpeg時為 FileNotFoundError）"""
+    if member.lower().endswith(SEEKABLE_EXTENSIONS):
+        with tempfile.TemporaryDirectory(prefix='tja_zip_') as tmp:
+            input_path = pack.zip.extract(pack.members[member], tmp)
+            cmd = build_ffmpeg_command(input_path, output_path, speed, profile, ffmpeg, stretch=stretch)
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RenderError(result.stderr)
+        return
+    # 輸入格式由FFmpeg從串流內容偵測
+    cmd = build_ffmpeg_command('pipe:0', output_path, speed, profile, ffmpeg, stretch=stretch)
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    feeder = threading.Thread(target=_feed, args=(pack.open(member), proc.stdin), daemon=True)
+    feeder.start()
+    stderr = proc.stderr.read().decode('utf-8', errors='replace')
+    proc.wait()
+    feeder.join()
+    if proc.returncode != 0:
+        raise RenderError(stderr)
+
+
+def process_zip(archive, speeds, output=None, profile='default', stretch='atempo', workers=None, lang='en',
+                ffmpeg='ffmpeg', metadata_encoding=None):
+    """處理zip歌曲包的所有譜面，返回 {'charts': 寫出的譜面數, 'audio': 寫出的音源數, 'failed': [失敗的音源]}
+
+    同一個音源以同一速度被多個譜面引用時只處理一次
+    """
+    if profile not in AUDIO_PROFILES:
+        raise ValueError(f"unknown profile: {profile}")
+    if stretch not in STRETCH_MODES:
+        raise ValueError(f"unknown stretch mode: {stretch}")
+    output = output or default_output_path(archive)
+    summary = {'charts': 0, 'audio': 0, 'failed': []}
+    with ZipPack(archive, metadata_encoding) as pack, open_output(output) as sink:
+        # 譜面很小：先依序改寫並寫出，同時收集需要變速的音源
+        renders = {}
+        for member in pack.charts():
+            lines, _ = pack.read_chart(member)
+            for speed in speeds:
+                new_lines, wave, nextsongs = rewrite_tja_lines(lines, speed, member)
+                new_member = safe_member_path(variant_tja_path(member, speed))
+                sink.write_tja(new_member, new_lines)
+                summary['charts'] += 1
+                print(get_text('tja_processed', lang).format(new_member))
+                for wave_filename, new_wave_filename in ([wave] if wave else []) + nextsongs:
+                    audio_member = pack.find_audio(member, wave_filename)
+                    if not audio_member:
+                        print(get_text('warning_audio_not_found', lang).format(f'{member}: {wave_filename}'))
+                        continue
+                    target = safe_member_path(posixpath.normpath(posixpath.join(
+                        posixpath.dirname(member), new_wave_filename.replace('\\', '/'))))
+                    renders.setdefault(target, (audio_member, speed))
+        print(get_text('zip_plan', lang).format(summary['charts'], len(renders), archive))
+
+        def render(item):
+            target, (audio_member, speed) = item
+            try:
+                with sink.audio_target(target) as output_path:
+                    render_member(pack, audio_member, output_path, speed, profile, stretch, ffmpeg)
+            except FileNotFoundError:
+                print(get_text('ffmpeg_not_found', lang))
+                return target, False
+            except RenderError as e:
+                print(get_text('ffmpeg_error', lang).format(e))
+                return target, False
+            print(get_text('audio_processed', lang).format(target))
+            return target, True
+
+        with ThreadPoolExecutor(max_workers=workers or default_ffmpeg_limit()) as pool:
+            for target, ok in pool.map(render, renders.items()):
+                if ok:
+                    summary['audio'] += 1
+                else:
+                    summary['failed'].append(target)
+    print(get_text('zip_complete', lang).format(summary['charts'], summary['audio'], output, len(summary['failed'])))
+    return summary